@@ -0,0 +1,141 @@
+# SPDX-FileCopyrightText: 2018-2025 Joonas Rautiola <mail@joinemm.dev>
+# SPDX-License-Identifier: MPL-2.0
+# https://git.joinemm.dev/miso-bot
+
+"""Run the bot as several processes, each connecting its own range of shards.
+
+    python cluster.py [dev]
+
+CLUSTER_COUNT sets the number of processes (one per cpu core by default)
+and SHARD_COUNT the total number of shards (discord's recommendation by
+default). The clusters talk to each other through redis, so REDIS_URL has
+to be set when there is more than one.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import shutil
+import signal
+import sys
+import time
+
+import aiohttp
+import discord.http
+from loguru import logger
+from prometheus_client import multiprocess
+
+import main
+from modules.ipc import ClusterInfo
+
+RESTART_DELAY = 10
+PROMETHEUS_MULTIPROC_DIR = "cache/prometheus"
+
+
+async def fetch_gateway_info() -> tuple[int, int]:
+    """Recommended shard count and identify concurrency of the bot."""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(
+            f"{discord.http.Route.BASE}/gateway/bot",
+            headers={"Authorization": f"Bot {main.TOKEN}"},
+        ) as response:
+            response.raise_for_status()
+            data = await response.json()
+
+    return data["shards"], data["session_start_limit"]["max_concurrency"]
+
+
+def split_shards(shard_count: int, cluster_count: int) -> list[list[int]]:
+    """Contiguous shard ranges, as even in size as possible."""
+    size, remainder = divmod(shard_count, cluster_count)
+    ranges = []
+    start = 0
+    for i in range(cluster_count):
+        end = start + size + (1 if i < remainder else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+
+    return ranges
+
+
+def run_cluster(cluster: ClusterInfo):
+    signal.signal(signal.SIGTERM, main.handle_sigterm)
+    main.main(cluster)
+
+
+def start(cluster: ClusterInfo) -> multiprocessing.Process:
+    process = multiprocessing.get_context("spawn").Process(
+        target=run_cluster, args=(cluster,), name=f"cluster-{cluster.id}"
+    )
+    process.start()
+    logger.info(
+        f"Started cluster {cluster.id} (pid {process.pid}) with shards "
+        f"{cluster.shard_ids[0]}-{cluster.shard_ids[-1]}"  # type: ignore
+    )
+    return process
+
+
+def prepare_metrics_directory():
+    """Every process writes its metrics here, for the web server to combine."""
+    directory = os.environ.setdefault(
+        "PROMETHEUS_MULTIPROC_DIR", PROMETHEUS_MULTIPROC_DIR
+    )
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+
+def launch():
+    main.use_discord_proxy()
+    shard_count, max_concurrency = asyncio.run(fetch_gateway_info())
+    shard_count = int(os.environ.get("SHARD_COUNT", shard_count))
+    cluster_count = min(
+        int(os.environ.get("CLUSTER_COUNT", os.cpu_count() or 1)), shard_count
+    )
+    if cluster_count > 1 and "REDIS_URL" not in os.environ:
+        logger.error("Running more than one cluster requires REDIS_URL to be set")
+        sys.exit(1)
+
+    prepare_metrics_directory()
+    logger.info(f"Launching {shard_count} shards in {cluster_count} clusters")
+    clusters = [
+        ClusterInfo(
+            id=i,
+            count=cluster_count,
+            shard_ids=shard_ids,
+            shard_count=shard_count,
+            max_concurrency=max_concurrency,
+        )
+        for i, shard_ids in enumerate(split_shards(shard_count, cluster_count))
+    ]
+    processes = {cluster.id: start(cluster) for cluster in clusters}
+
+    try:
+        while True:
+            time.sleep(RESTART_DELAY)
+            for cluster in clusters:
+                process = processes[cluster.id]
+                if process.is_alive():
+                    continue
+
+                multiprocess.mark_process_dead(process.pid)
+                if process.exitcode == 0:
+                    # logged out on purpose
+                    raise KeyboardInterrupt
+
+                logger.warning(
+                    f"Cluster {cluster.id} exited with code {process.exitcode}, "
+                    "restarting"
+                )
+                processes[cluster.id] = start(cluster)
+    except KeyboardInterrupt:
+        logger.info("Shutting down all clusters")
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in processes.values():
+            process.join(timeout=10)
+
+
+if __name__ == "__main__":
+    signal.signal(signal.SIGTERM, main.handle_sigterm)
+    launch()
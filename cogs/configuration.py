@@ -52,17 +52,7 @@ class Configuration(commands.Cog):
             raise exceptions.CommandError("Unable to get current guild")
 
         prefix = prefix.lstrip()
-        await self.bot.db.execute(
-            """
-            INSERT INTO guild_prefix (guild_id, prefix)
-                VALUES (%s, %s)
-            ON DUPLICATE KEY UPDATE
-                prefix = VALUES(prefix)
-            """,
-            ctx.guild.id,
-            prefix,
-        )
-        self.bot.cache.prefixes[str(ctx.guild.id)] = prefix
+        await self.bot.cache.set_prefix(ctx.guild.id, prefix)
         await util.send_success(
             ctx,
             f"Command prefix for this server is now `{prefix}`. "
@@ -190,13 +180,10 @@ class Configuration(commands.Cog):
 
         Set to \"none\" to disable.
         """
-        await queries.update_setting(
-            ctx,
-            "logging_settings",
-            "member_log_channel_id",
-            channel.id if channel is not None else None,
+        await self.bot.cache.update_logging_settings(
+            ctx.guild.id,
+            member_log_channel_id=channel.id if channel is not None else None,
         )
-        await self.bot.cache.cache_logging_settings()
         if channel is None:
             await util.send_success(ctx, "Members logging **disabled**")
         else:
@@ -216,13 +203,10 @@ class Configuration(commands.Cog):
 
         Set to \"none\" to disable.
         """
-        await queries.update_setting(
-            ctx,
-            "logging_settings",
-            "ban_log_channel_id",
-            channel.id if channel is not None else None,
+        await self.bot.cache.update_logging_settings(
+            ctx.guild.id,
+            ban_log_channel_id=channel.id if channel is not None else None,
         )
-        await self.bot.cache.cache_logging_settings()
         if channel is None:
             await util.send_success(ctx, "Bans logging **disabled**")
         else:
@@ -247,13 +231,10 @@ class Configuration(commands.Cog):
 
         Set to \"none\" to disable.
         """
-        await queries.update_setting(
-            ctx,
-            "logging_settings",
-            "message_log_channel_id",
-            channel.id if channel is not None else None,
+        await self.bot.cache.update_logging_settings(
+            ctx.guild.id,
+            message_log_channel_id=channel.id if channel is not None else None,
         )
-        await self.bot.cache.cache_logging_settings()
         if channel is None:
             await util.send_success(ctx, "Deleted message logging **disabled**")
         else:
@@ -308,11 +289,10 @@ class Configuration(commands.Cog):
         self, ctx: commands.Context, channel: discord.TextChannel
     ):
         """Set the starboard channel"""
-        await queries.update_setting(
-            ctx, "starboard_settings", "channel_id", channel.id
+        await self.bot.cache.update_starboard_settings(
+            ctx.guild.id, channel_id=channel.id
         )
         await util.send_success(ctx, f"Starboard channel is now {channel.mention}")
-        await self.bot.cache.cache_starboard_settings()
 
     @starboard.command(name="amount")
     async def starboard_amount(self, ctx: commands.Context, amount: int):
@@ -320,32 +300,32 @@ class Configuration(commands.Cog):
         if ctx.guild is None:
             raise exceptions.CommandError("Unable to get current guild")
 
-        await queries.update_setting(
-            ctx, "starboard_settings", "reaction_count", amount
+        await self.bot.cache.update_starboard_settings(
+            ctx.guild.id, reaction_count=amount
         )
-        emoji_name, emoji_id, emoji_type = await self.bot.db.fetch_row(
-            """
-            SELECT emoji_name, emoji_id, emoji_type
-            FROM starboard_settings WHERE guild_id = %s
-            """,
-            ctx.guild.id,
+        settings = await self.bot.cache.get_starboard_settings(ctx.guild.id)
+        assert settings is not None
+        emoji = (
+            self.bot.get_emoji(settings.emoji_id)
+            if settings.emoji_type == "custom"
+            else settings.emoji_name
         )
-        emoji = self.bot.get_emoji(emoji_id) if emoji_type == "custom" else emoji_name
         await util.send_success(
             ctx,
             f"Messages now need **{amount}** {emoji} reactions to get into the starboard.",
         )
-        await self.bot.cache.cache_starboard_settings()
 
     @starboard.command(name="toggle", aliases=["enabled"])
     async def starboard_toggle(self, ctx: commands.Context, value: bool):
         """Enable or disable the starboard"""
-        await queries.update_setting(ctx, "starboard_settings", "is_enabled", value)
+        if ctx.guild is None:
+            raise exceptions.CommandError("Unable to get current guild")
+
+        await self.bot.cache.update_starboard_settings(ctx.guild.id, is_enabled=value)
         if value:
             await util.send_success(ctx, "Starboard is now **enabled**")
         else:
             await util.send_success(ctx, "Starboard is now **disabled**")
-        await self.bot.cache.cache_starboard_settings()
 
     @starboard.command(name="emoji")
     async def starboard_emoji(self, ctx: commands.Context, emoji):
@@ -364,19 +344,11 @@ class Configuration(commands.Cog):
             if emoji_obj is None:
                 raise exceptions.CommandWarning("I don't know this emoji!")
 
-            await self.bot.db.execute(
-                """
-                INSERT INTO starboard_settings (guild_id, emoji_name, emoji_id, emoji_type)
-                    VALUES (%s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                    emoji_name = VALUES(emoji_name),
-                    emoji_id = VALUES(emoji_id),
-                    emoji_type = VALUES(emoji_type)
-                """,
+            await self.bot.cache.update_starboard_settings(
                 ctx.guild.id,
-                None,
-                emoji_obj.id,
-                "custom",
+                emoji_name=None,
+                emoji_id=emoji_obj.id,
+                emoji_type="custom",
             )
             await util.send_success(
                 ctx, f"Starboard emoji is now {emoji} (emoji id `{emoji_obj.id}`)"
@@ -387,22 +359,13 @@ class Configuration(commands.Cog):
             if emoji_name is None:
                 raise exceptions.CommandWarning("I don't know this emoji!")
 
-            await self.bot.db.execute(
-                """
-                INSERT INTO starboard_settings (guild_id, emoji_name, emoji_id, emoji_type)
-                    VALUES (%s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                    emoji_name = VALUES(emoji_name),
-                    emoji_id = VALUES(emoji_id),
-                    emoji_type = VALUES(emoji_type)
-                """,
+            await self.bot.cache.update_starboard_settings(
                 ctx.guild.id,
-                emoji_name,
-                None,
-                "unicode",
+                emoji_name=emoji_name,
+                emoji_id=None,
+                emoji_type="unicode",
             )
             await util.send_success(ctx, f"Starboard emoji is now {emoji}")
-        await self.bot.cache.cache_starboard_settings()
 
     @starboard.command(name="log", usage="<channel | none>")
     async def starboard_log(
@@ -411,19 +374,18 @@ class Configuration(commands.Cog):
         channel: Annotated[discord.TextChannel, ChannelSetting],
     ):
         """Set starboard logging channel to log starring events"""
+        if ctx.guild is None:
+            raise exceptions.CommandError("Unable to get current guild")
+
+        await self.bot.cache.update_starboard_settings(
+            ctx.guild.id, log_channel_id=channel.id if channel is not None else None
+        )
         if channel is None:
-            await queries.update_setting(
-                ctx, "starboard_settings", "log_channel_id", None
-            )
             await util.send_success(ctx, "Starboard log is now disabled")
         else:
-            await queries.update_setting(
-                ctx, "starboard_settings", "log_channel_id", channel.id
-            )
             await util.send_success(
                 ctx, f"Starboard log channel is now {channel.mention}"
             )
-        await self.bot.cache.cache_starboard_settings()
 
     @starboard.command(name="blacklist")
     async def starboard_blacklist(
@@ -433,20 +395,10 @@ class Configuration(commands.Cog):
         if ctx.guild is None:
             raise exceptions.CommandError("Unable to get current guild")
 
-        await self.bot.db.execute(
-            """
-            INSERT INTO starboard_blacklist (guild_id, channel_id)
-                VALUES (%s, %s)
-            ON DUPLICATE KEY UPDATE
-                channel_id = channel_id
-            """,
-            ctx.guild.id,
-            channel.id,
-        )
+        await self.bot.cache.blacklist_starboard_channel(ctx.guild.id, channel.id)
         await util.send_success(
             ctx, f"Stars are no longer counted in {channel.mention}"
         )
-        await self.bot.cache.cache_starboard_settings()
 
     @starboard.command(name="unblacklist")
     async def starboard_unblacklist(
@@ -456,17 +408,10 @@ class Configuration(commands.Cog):
         if ctx.guild is None:
             raise exceptions.CommandError("Unable to get current guild")
 
-        await self.bot.db.execute(
-            """
-            DELETE FROM starboard_blacklist WHERE guild_id = %s AND channel_id = %s
-            """,
-            ctx.guild.id,
-            channel.id,
-        )
+        await self.bot.cache.unblacklist_starboard_channel(ctx.guild.id, channel.id)
         await util.send_success(
             ctx, f"Stars are now again counted in {channel.mention}"
         )
-        await self.bot.cache.cache_starboard_settings()
 
     @starboard.command(name="current")
     async def starboard_current(self, ctx: commands.Context):
@@ -474,7 +419,7 @@ class Configuration(commands.Cog):
         if ctx.guild is None:
             raise exceptions.CommandError("Unable to get current guild")
 
-        starboard_settings = self.bot.cache.starboard_settings.get(str(ctx.guild.id))
+        starboard_settings = await self.bot.cache.get_starboard_settings(ctx.guild.id)
         if not starboard_settings:
             raise exceptions.CommandWarning(
                 "Nothing has been configured on this server yet!"
@@ -549,11 +494,7 @@ class Configuration(commands.Cog):
         if ctx.guild is None:
             raise exceptions.CommandError("Unable to get current guild")
 
-        await self.bot.db.execute(
-            "INSERT IGNORE autorole (guild_id, role_id) VALUES (%s, %s)",
-            ctx.guild.id,
-            role.id,
-        )
+        await self.bot.cache.add_autorole(ctx.guild.id, role.id)
         await util.send_success(
             ctx, f"New members will now automatically get {role.mention}"
         )
@@ -566,12 +507,7 @@ class Configuration(commands.Cog):
 
         existing_role = await util.get_role(ctx, role)
         role_id = int(role) if existing_role is None else existing_role.id
-        await self.bot.db.execute(
-            "DELETE FROM autorole WHERE guild_id = %s AND role_id = %s",
-            ctx.guild.id,
-            role_id,
-        )
-        await self.bot.cache.cache_autoroles()
+        await self.bot.cache.remove_autorole(ctx.guild.id, role_id)
         await util.send_success(ctx, f"No longer giving new members <@&{role_id}>")
 
     @autorole.command(name="list")
@@ -601,8 +537,7 @@ class Configuration(commands.Cog):
         if ctx.guild is None:
             raise exceptions.CommandError("Unable to get current guild")
 
-        await queries.update_setting(ctx, "guild_settings", "autoresponses", value)
-        self.bot.cache.autoresponse[str(ctx.guild.id)] = value
+        await self.bot.cache.set_autoresponses(ctx.guild.id, value)
         if value:
             await util.send_success(ctx, "Automatic responses are now **enabled**")
         else:
@@ -711,17 +646,7 @@ class Configuration(commands.Cog):
             except commands.errors.BadArgument:
                 fails.append(f"Cannot find channel {channel_arg}")
             else:
-                await self.bot.db.execute(
-                    """
-                    INSERT INTO blacklisted_channel (channel_id, guild_id)
-                        VALUES (%s, %s)
-                    ON DUPLICATE KEY UPDATE
-                        channel_id = VALUES(channel_id)
-                    """,
-                    channel.id,
-                    ctx.guild.id,
-                )
-                self.bot.cache.blacklist["global"]["channel"].add(channel.id)
+                await self.bot.cache.blacklist_channel(ctx.guild.id, channel.id)
                 successes.append(f"Blacklisted {channel.mention}")
 
         await util.send_tasks_result_list(ctx, successes, fails)
@@ -745,23 +670,7 @@ class Configuration(commands.Cog):
                     fails.append("You cannot blacklist yourself!")
                     continue
 
-                await self.bot.db.execute(
-                    """
-                    INSERT INTO blacklisted_member (user_id, guild_id)
-                        VALUES (%s, %s)
-                    ON DUPLICATE KEY UPDATE
-                        user_id = VALUES(user_id)
-                    """,
-                    member.id,
-                    ctx.guild.id,
-                )
-                try:
-                    self.bot.cache.blacklist[str(ctx.guild.id)]["member"].add(member.id)
-                except KeyError:
-                    self.bot.cache.blacklist[str(ctx.guild.id)] = {
-                        "member": {member.id},
-                        "command": set(),
-                    }
+                await self.bot.cache.blacklist_member(ctx.guild.id, member.id)
                 successes.append(f"Blacklisted {member.mention}")
 
         await util.send_tasks_result_list(ctx, successes, fails)
@@ -779,20 +688,7 @@ class Configuration(commands.Cog):
                 f"Command `{ctx.prefix}{command}` not found."
             )
 
-        await self.bot.db.execute(
-            "INSERT IGNORE blacklisted_command VALUES (%s, %s)",
-            cmd.qualified_name,
-            ctx.guild.id,
-        )
-        try:
-            self.bot.cache.blacklist[str(ctx.guild.id)]["command"].add(
-                cmd.qualified_name.lower()
-            )
-        except KeyError:
-            self.bot.cache.blacklist[str(ctx.guild.id)] = {
-                "member": set(),
-                "command": {cmd.qualified_name.lower()},
-            }
+        await self.bot.cache.blacklist_command(ctx.guild.id, cmd.qualified_name)
         await util.send_success(
             ctx, f"`{ctx.prefix}{cmd}` is now a blacklisted command on this server."
         )
@@ -803,10 +699,7 @@ class Configuration(commands.Cog):
         self, ctx: commands.Context, user: discord.User, *, reason
     ):
         """Blacklist someone globally from Miso Bot"""
-        await self.bot.db.execute(
-            "INSERT IGNORE blacklisted_user VALUES (%s, %s)", user.id, reason
-        )
-        self.bot.cache.blacklist["global"]["user"].add(user.id)
+        await self.bot.cache.blacklist_user(user.id, reason)
         await util.send_success(ctx, f"**{user}** can no longer use Miso Bot!")
 
     @blacklist.command(name="guild", hidden=True)
@@ -817,10 +710,7 @@ class Configuration(commands.Cog):
         if guild is None:
             raise exceptions.CommandWarning(f"Cannot find guild with id `{guild_id}`")
 
-        await self.bot.db.execute(
-            "INSERT IGNORE blacklisted_guild VALUES (%s, %s)", guild.id, reason
-        )
-        self.bot.cache.blacklist["global"]["guild"].add(guild_id)
+        await self.bot.cache.blacklist_guild(guild.id, reason)
         await guild.leave()
         await util.send_success(ctx, f"**{guild}** can no longer use Miso Bot!")
 
@@ -846,12 +736,7 @@ class Configuration(commands.Cog):
             except commands.errors.BadArgument:
                 fails.append(f"Cannot find channel {channel_arg}")
             else:
-                await self.bot.db.execute(
-                    "DELETE FROM blacklisted_channel WHERE guild_id = %s AND channel_id = %s",
-                    ctx.guild.id,
-                    channel.id,
-                )
-                self.bot.cache.blacklist["global"]["channel"].discard(channel.id)
+                await self.bot.cache.unblacklist_channel(ctx.guild.id, channel.id)
                 successes.append(f"Unblacklisted {channel.mention}")
 
         await util.send_tasks_result_list(ctx, successes, fails)
@@ -871,12 +756,7 @@ class Configuration(commands.Cog):
             except commands.errors.BadArgument:
                 fails.append(f"Cannot find member {member_arg}")
             else:
-                await self.bot.db.execute(
-                    "DELETE FROM blacklisted_member WHERE guild_id = %s AND user_id = %s",
-                    ctx.guild.id,
-                    member.id,
-                )
-                self.bot.cache.blacklist[str(ctx.guild.id)]["member"].discard(member.id)
+                await self.bot.cache.unblacklist_member(ctx.guild.id, member.id)
                 successes.append(f"Unblacklisted {member.mention}")
 
         await util.send_tasks_result_list(ctx, successes, fails)
@@ -894,42 +774,21 @@ class Configuration(commands.Cog):
                 f"Command `{ctx.prefix}{command}` not found."
             )
 
-        await self.bot.db.execute(
-            """
-            DELETE FROM blacklisted_command WHERE guild_id = %s AND command_name = %s
-            """,
-            ctx.guild.id,
-            cmd.qualified_name,
-        )
-        self.bot.cache.blacklist[str(ctx.guild.id)]["command"].discard(
-            cmd.qualified_name.lower()
-        )
+        await self.bot.cache.unblacklist_command(ctx.guild.id, cmd.qualified_name)
         await util.send_success(ctx, f"`{ctx.prefix}{cmd}` is no longer blacklisted.")
 
     @unblacklist.command(name="global", hidden=True)
     @commands.is_owner()
     async def unblacklist_global(self, ctx: commands.Context, *, user: discord.User):
         """Unblacklist someone globally"""
-        await self.bot.db.execute(
-            """
-            DELETE FROM blacklisted_user WHERE user_id = %s
-            """,
-            user.id,
-        )
-        self.bot.cache.blacklist["global"]["user"].discard(user.id)
+        await self.bot.cache.unblacklist_user(user.id)
         await util.send_success(ctx, f"**{user}** can now use Miso Bot again!")
 
     @unblacklist.command(name="guild", hidden=True)
     @commands.is_owner()
     async def unblacklist_guild(self, ctx: commands.Context, guild_id: int):
         """unblacklist a guild"""
-        await self.bot.db.execute(
-            """
-            DELETE FROM blacklisted_guild WHERE guild_id = %s
-            """,
-            guild_id,
-        )
-        self.bot.cache.blacklist["global"]["guild"].discard(guild_id)
+        await self.bot.cache.unblacklist_guild(guild_id)
         await util.send_success(
             ctx, f"Guild with id `{guild_id}` can use Miso Bot again!"
         )
@@ -11,6 +11,7 @@ from discord.ext import commands, tasks
 from loguru import logger
 
 from modules import emoji_literals, exceptions, queries, util
+from modules.cache import MediaAutoEmbed
 from modules.media_embedders import (
     BaseEmbedder,
     InstagramEmbedder,
@@ -28,13 +29,16 @@ class Events(commands.Cog):
         self.bot: MisoBot = bot
         self.statuses = cycle(
             [
-                ("watching", lambda: f"{self.bot.guild_count:,} servers"),
-                ("listening", lambda: f"{self.bot.member_count:,} members"),
+                ("watching", lambda: f"{self.guild_count:,} servers"),
+                ("listening", lambda: f"{self.member_count:,} members"),
                 ("playing", lambda: "misobot.xyz"),
             ]
         )
         self.activity_id = {"playing": 0, "streaming": 1, "listening": 2, "watching": 3}
         self.guildlog = 652916681299066900
+        # of every cluster, refreshed with the status
+        self.guild_count = 0
+        self.member_count = 0
 
     async def cog_load(self):
         self.status_loop.start()
@@ -44,6 +48,7 @@ class Events(commands.Cog):
 
     @tasks.loop(minutes=3.0)
     async def status_loop(self):
+        self.guild_count, self.member_count = await self.bot.cluster_counts()
         await self.next_status()
 
     @status_loop.before_loop
@@ -97,10 +102,8 @@ class Events(commands.Cog):
         """Called when a new member joins a guild"""
         await self.bot.wait_until_ready()
         logging_channel_id = None
-        if logging_settings := self.bot.cache.logging_settings.get(
-            str(member.guild.id)
-        ):
-            logging_channel_id = logging_settings.get("member_log_channel_id")
+        if logging_settings := self.bot.cache.logging_settings.get(member.guild.id):
+            logging_channel_id = logging_settings.member_log_channel_id
 
         if logging_channel_id:
             logging_channel = member.guild.get_channel(logging_channel_id)
@@ -113,7 +116,7 @@ class Events(commands.Cog):
                     pass
 
         # add autoroles
-        roles = self.bot.cache.autoroles.get(str(member.guild.id), [])
+        roles = await self.bot.cache.get_autoroles(member.guild.id)
         for role_id in roles:
             role = member.guild.get_role(role_id)
             if role is None:
@@ -150,8 +153,8 @@ class Events(commands.Cog):
         """Called when user gets banned from a server"""
         await self.bot.wait_until_ready()
         logging_channel_id = None
-        if logging_settings := self.bot.cache.logging_settings.get(str(guild.id)):
-            logging_channel_id = logging_settings.get("ban_log_channel_id")
+        if logging_settings := self.bot.cache.logging_settings.get(guild.id):
+            logging_channel_id = logging_settings.ban_log_channel_id
 
         if logging_channel_id:
             channel = guild.get_channel(logging_channel_id)
@@ -172,10 +175,8 @@ class Events(commands.Cog):
         """Called when member leaves a guild"""
         await self.bot.wait_until_ready()
         logging_channel_id = None
-        if logging_settings := self.bot.cache.logging_settings.get(
-            str(member.guild.id)
-        ):
-            logging_channel_id = logging_settings.get("member_log_channel_id")
+        if logging_settings := self.bot.cache.logging_settings.get(member.guild.id):
+            logging_channel_id = logging_settings.member_log_channel_id
 
         if logging_channel_id:
             logging_channel = member.guild.get_channel(logging_channel_id)
@@ -230,7 +231,7 @@ class Events(commands.Cog):
         if message.guild is None:
             return
 
-        logging_settings = self.bot.cache.logging_settings.get(str(message.guild.id))
+        logging_settings = self.bot.cache.logging_settings.get(message.guild.id)
         if not logging_settings:
             return
 
@@ -238,7 +239,7 @@ class Events(commands.Cog):
         if len(message.content) == 0 and len(message.attachments) == 0:
             return
 
-        channel_id = logging_settings.get("message_log_channel_id")
+        channel_id = logging_settings.message_log_channel_id
         if channel_id:
             log_channel = message.guild.get_channel(channel_id)
             if log_channel is not None and message.channel != log_channel:
@@ -275,8 +276,8 @@ class Events(commands.Cog):
             # a command will be run
             return
 
-        media_settings = self.bot.cache.media_auto_embed.get(str(message.guild.id), {})
-        if True in media_settings.values():
+        media_settings = self.bot.cache.media_auto_embed.get(message.guild.id)
+        if media_settings is not None and any(media_settings):
             # chunk the guild if it's not chunked yet, like commands do
             # this ensures user information is available
             await util.require_chunked(ctx.guild)
@@ -286,7 +287,7 @@ class Events(commands.Cog):
             except Exception as e:
                 await self.bot.get_cog("ErrorHandler").on_command_error(ctx, e)
 
-        if self.bot.cache.autoresponse.get(str(message.guild.id), True):
+        if self.bot.cache.autoresponse.get(message.guild.id, True):
             await self.easter_eggs(message)
 
     async def get_autoembed_options(
@@ -323,9 +324,9 @@ class Events(commands.Cog):
         await util.suppress(message)
 
     async def parse_media_auto_embed(
-        self, message: discord.Message, media_settings: dict
+        self, message: discord.Message, media_settings: MediaAutoEmbed
     ):
-        if media_settings["instagram"]:
+        if media_settings.instagram:
             embedder = InstagramEmbedder(self.bot)
             posts = embedder.extract_links(message.content, include_shortcodes=False)
             if posts:
@@ -342,19 +343,19 @@ class Events(commands.Cog):
                         "Only [donators](https://misobot.xyz/donate) can use autoembeds! (unless premium server)"
                     )
 
-        if media_settings["tiktok"]:
+        if media_settings.tiktok:
             embedder = TikTokEmbedder(self.bot)
             posts = embedder.extract_links(message.content)
             if posts:
                 await self.embed_posts(posts, message, embedder)
 
-        if media_settings["reddit"]:
+        if media_settings.reddit:
             embedder = RedditEmbedder(self.bot)
             posts = embedder.extract_links(message.content)
             if posts:
                 await self.embed_posts(posts, message, embedder)
 
-        if media_settings["twitter"]:
+        if media_settings.twitter:
             embedder = TwitterEmbedder(self.bot)
             posts = embedder.extract_links(message.content, include_id_only=False)
             if posts:
@@ -415,11 +416,11 @@ class Events(commands.Cog):
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload):
         """Starboard event handler"""
-        if not self.bot.is_ready():
+        if not self.bot.is_ready() or payload.guild_id is None:
             return
 
-        starboard_settings = self.bot.cache.starboard_settings.get(
-            str(payload.guild_id)
+        starboard_settings = await self.bot.cache.get_starboard_settings(
+            payload.guild_id
         )
         if not starboard_settings:
             return
@@ -138,13 +138,14 @@ class Information(commands.Cog):
             colour=int("E46A92", 16),
         )
         owner = await self.bot.fetch_user(self.bot.owner_id)
+        guild_count, member_count = await self.bot.cluster_counts()
         content.description = (
             f"Created by **{owner}** {owner.mention} \n"
             f"using *discord.py* {discord.__version__}\n\n"
             f"Use `{ctx.prefix}help` to get help on any commands, \n"
             f"or visit the website for more detailed instructions.\n\n"
-            f"Currently in **{self.bot.guild_count}** servers "
-            f"with a total member count of **{self.bot.member_count}**."
+            f"Currently in **{guild_count}** servers "
+            f"with a total member count of **{member_count}**."
         )
         content.set_thumbnail(url=self.bot.user.display_avatar.url)
         content.add_field(name="Website", value="https://misobot.xyz", inline=False)
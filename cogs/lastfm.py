@@ -3,6 +3,7 @@
 # https://git.joinemm.dev/miso-bot
 
 import asyncio
+import hashlib
 import io
 import math
 import random
@@ -11,21 +12,39 @@ import sys
 import urllib.parse
 from dataclasses import dataclass
 from enum import Enum, auto
-from itertools import batched
+from time import monotonic
 from typing import TYPE_CHECKING, Annotated, Any, Callable, Literal, Optional, Union
 
 import aiohttp
 import arrow
 import discord
-import kdtree
 import orjson
 from discord.ext import commands, tasks
 from discord.utils import escape_markdown
 from loguru import logger
 
-from modules import emojis, exceptions, util
-from modules.lastfm import LastFmApi, LastFmImage, Period
+from modules import collage, colorpool, emojis, exceptions, util
+from modules.aggregation import (
+    AggregateKind,
+    AggregationEngine,
+    ServerAggregate,
+    parse_top_items,
+)
+from modules.albums import AlbumMetadataStore
+from modules.colors import ColorIndex, ImageColorCache
+from modules.covers import CoverCache
+from modules.crowns import CrownEngine
+from modules.lastfm import (
+    LastFmApi,
+    LastFmImage,
+    Period,
+    ResponseCache,
+    background_priority,
+)
+from modules.lru import LRUCache
 from modules.misobot import LastFmContext, MisoBot, MisoContext
+from modules.playcounts import IndexKind, PlaycountIndex
+from modules.scrobbles import ScrobbleStore
 from modules.ui import RowPaginator
 
 
@@ -50,24 +69,6 @@ def is_small_server():
     return commands.check(predicate)
 
 
-class AlbumColorNode:
-    def __init__(self, rgb, image_url):
-        self.rgb = rgb
-        self.data = image_url
-
-    def __len__(self):
-        return len(self.rgb)
-
-    def __getitem__(self, i):
-        return self.rgb[i]
-
-    def __str__(self):
-        return f"rgb{self.rgb}"
-
-    def __repr__(self):
-        return f"AlbumColorNode({self.rgb}, {self.data})"
-
-
 class PeriodArgument(commands.Converter):
     @staticmethod
     async def convert(_ctx: MisoContext, argument: str):
@@ -188,6 +189,79 @@ class ServerRankingArgument(commands.Converter):
         return cls.ALIASES[key]
 
 
+class ServerFanout:
+    """Runs an api task for every linked member of the guild,
+    iterating over (result, lastfm username) pairs as they complete.
+
+    A progress message is kept updated while waiting, and members
+    that haven't responded by the deadline are left out.
+    """
+
+    DEADLINE = 30
+    PROGRESS_INTERVAL = 2
+
+    def __init__(self, ctx: MisoContext, task: Callable, *args, **kwargs):
+        assert isinstance(ctx.cog, LastFm)
+        self.ctx = ctx
+        self.cog: LastFm = ctx.cog
+        self.task = task
+        self.args = args
+        self.kwargs = kwargs
+        self.total = 0
+        self.completed = 0
+
+    async def __aiter__(self):
+        if self.ctx.guild is None:
+            raise exceptions.CommandError("Unable to get current guild")
+
+        members = []
+        for user_id, lastfm_username in await self.cog.server_lastfm_usernames(
+            self.ctx.guild
+        ):
+            member = self.ctx.guild.get_member(user_id)
+            if member is not None:
+                members.append((lastfm_username, member))
+
+        if not members:
+            raise exceptions.CommandInfo(
+                "Nobody on this server has connected their Last.fm account yet!"
+            )
+
+        async def fetch(item: tuple[str, discord.Member]):
+            # set inside each task, so the consumer of the results isn't affected
+            with background_priority():
+                return await self.task(item[0], *self.args, **self.kwargs)
+
+        self.total = len(members)
+        progress_message = None
+        last_update = monotonic()
+        try:
+            async for (lastfm_username, _), result in self.cog.api.map_users(
+                fetch, members, deadline=self.DEADLINE
+            ):
+                self.completed += 1
+                yield result, lastfm_username
+
+                if monotonic() - last_update > self.PROGRESS_INTERVAL:
+                    last_update = monotonic()
+                    progress_message = await self.show_progress(progress_message)
+        finally:
+            if progress_message is not None:
+                await progress_message.delete()
+
+    async def show_progress(self, message: discord.Message | None):
+        text = (
+            f"{emojis.LOADING} Fetching data from server members "
+            f"`{self.completed}/{self.total}`"
+        )
+        try:
+            if message is None:
+                return await self.ctx.send(text)
+            return await message.edit(content=text)
+        except discord.HTTPException:
+            return message
+
+
 class StrOrNp:
     def extract(self, data: dict):
         raise NotImplementedError
@@ -258,11 +332,29 @@ class LastFm(commands.Cog):
 
     LASTFM_RED = "e31c23"
     LASTFM_ICON_URL = "https://i.imgur.com/dMeDkPH.jpg"
+    SCROBBLE_SYNC_BATCH = 10
+    PLAYCOUNT_INDEX_BATCH = 10
+    # more unindexed members than this are not looked up one by one
+    LIVE_RANKING_LIMIT = 150
+    SERVER_TOP_LIMIT = 100
+    COLOR_INDEX_CACHE_SIZE = 256
+    RENDERED_CHART_CACHE_SIZE = 64
+    RENDERED_CHART_LIFETIME = 3600
 
     def __init__(self, bot):
         self.icon = "🎵"
         self.bot: MisoBot = bot
         self.api = LastFmApi(bot)
+        self.scrobbles = ScrobbleStore(bot, self.api)
+        self.playcounts = PlaycountIndex(bot, self.api)
+        self.crowns = CrownEngine(bot)
+        self.aggregates = AggregationEngine()
+        self.albums = AlbumMetadataStore(bot, self.api)
+        self.colors = ImageColorCache(bot)
+        self.covers = CoverCache(bot)
+        # lastfm username -> (album image hashes, their ColorIndex)
+        self.color_indexes = LRUCache(self.COLOR_INDEX_CACHE_SIZE)
+        self.rendered_charts = ResponseCache(bot, self.RENDERED_CHART_CACHE_SIZE)
 
     @tasks.loop(minutes=1)
     async def lastfm_login_task(self):
@@ -279,11 +371,102 @@ class LastFm(commands.Cog):
                 self.lastfm_login_task.cancel()
                 logger.info("Lastfm login successfull, canceling task")
 
+    @tasks.loop(minutes=1)
+    async def scrobble_sync_task(self):
+        try:
+            await self.scrobbles.flush_activity()
+            # the other clusters only save which users were active
+            if not self.bot.cluster.is_primary:
+                return
+            users = await self.scrobbles.users_to_sync(self.SCROBBLE_SYNC_BATCH)
+        except Exception as e:
+            return logger.error(f"Scrobble sync error: {e}")
+
+        for username, synced_until in users:
+            try:
+                await self.scrobbles.sync(username, synced_until)
+            except (exceptions.LastFMError, aiohttp.ClientError) as e:
+                logger.warning(f"Could not sync scrobbles of {username}: {e}")
+
+    @tasks.loop(minutes=1)
+    async def playcount_index_task(self):
+        try:
+            usernames = await self.playcounts.users_to_refresh(
+                self.PLAYCOUNT_INDEX_BATCH
+            )
+        except Exception as e:
+            return logger.error(f"Playcount index error: {e}")
+
+        for username in usernames:
+            try:
+                artist_playcounts = await self.playcounts.refresh(username)
+            except (exceptions.LastFMError, aiohttp.ClientError) as e:
+                logger.warning(f"Could not index playcounts of {username}: {e}")
+                # private or deleted profiles are counted as empty
+                await self.playcounts.mark_indexed(username)
+            else:
+                self.crowns.submit(username, artist_playcounts)
+                # the index pages are ordered like the top 100 the aggregates use
+                self.aggregates.update_member(
+                    username,
+                    Period.OVERALL,
+                    "artist",
+                    [
+                        (name, playcount, None)
+                        for name, playcount in artist_playcounts[
+                            : self.SERVER_TOP_LIMIT
+                        ]
+                    ],
+                )
+
+        try:
+            await self.crowns.flush()
+        except Exception as e:
+            logger.error(f"Crown update error: {e}")
+
+    @tasks.loop(minutes=1)
+    async def album_metadata_task(self):
+        try:
+            await self.albums.refresh_stale()
+        except Exception as e:
+            logger.error(f"Album metadata refresh error: {e}")
+
+        try:
+            await self.colors.flush_usage()
+        except Exception as e:
+            logger.error(f"Image color usage flush error: {e}")
+
+    @scrobble_sync_task.before_loop
+    @playcount_index_task.before_loop
+    @album_metadata_task.before_loop
+    async def task_waiter(self):
+        await self.bot.wait_until_ready()
+
     async def cog_load(self):
+        self.bot.ipc.handle("mutual_guilds", self.crowns.local_mutual_guilds)
+        try:
+            await self.colors.warm()
+        except Exception as e:
+            logger.error(f"Could not warm up image colors: {e}")
+
+        try:
+            await self.covers.load()
+        except OSError as e:
+            logger.error(f"Could not load the cover cache: {e}")
+
         self.lastfm_login_task.start()
+        self.scrobble_sync_task.start()
+        self.album_metadata_task.start()
+        # indexing works through every user, so only one cluster does it
+        if self.bot.cluster.is_primary:
+            self.playcount_index_task.start()
 
     async def cog_unload(self):
+        self.bot.ipc.remove_handler("mutual_guilds")
         self.lastfm_login_task.cancel()
+        self.scrobble_sync_task.cancel()
+        self.playcount_index_task.cancel()
+        self.album_metadata_task.cancel()
 
     @commands.group(aliases=["lastfm", "lfm", "lf"])
     async def fm(self, ctx: MisoContext):
@@ -464,6 +647,14 @@ class LastFm(commands.Cog):
             raise exceptions.CommandWarning(
                 "Please give a number between 1 and your total amount of listened tracks."
             )
+
+        stored = await self.scrobbles.nth_scrobble(ctx.lfm.username, n)
+        if stored is not None:
+            track_name, artist_name = stored
+            return await ctx.send(
+                f"Your {util.ordinal(n)} scrobble was ***{track_name}*** by **{artist_name}**"
+            )
+
         PER_PAGE = 100
         pre_data = await self.api.user_get_recent_tracks(
             ctx.lfm.username,
@@ -514,31 +705,33 @@ class LastFm(commands.Cog):
         if image.is_missing() and track["album"].get("image") is not None:
             image = LastFmImage.from_url(track["album"]["image"][-1]["#text"])
 
-        metadata = None
-        try:
-            metadata = await self.api.scrape_album_metadata(artist_name, album_name)
-        except aiohttp.ClientError as e:
-            logger.error(f"Error fetching metadata: {e}")
+        async def get_track_info():
+            try:
+                return await self.api.track_get_info(
+                    artist_name, track_name, ctx.lfm.username
+                )
+            except exceptions.LastFMError:
+                return None
+
+        metadata, track_info, color = await asyncio.gather(
+            self.albums.get(artist_name, album_name),
+            get_track_info(),
+            self.image_color(image),
+        )
 
         content = discord.Embed(
-            color=await self.image_color(image),
+            color=color,
             description=f":cd: **{escape_markdown(album_name)}**",
             title=f"**{escape_markdown(artist_name)} — *{escape_markdown(track_name)}***",
         )
         content.set_thumbnail(url=image.as_full())
 
-        if metadata and metadata["release_date"]:
+        if metadata and metadata.release_date:
             content.description = (
-                f"{content.description} [{metadata['release_date'].format('YYYY')}]"
+                f"{content.description} [{metadata.release_date.format('YYYY')}]"
             )
 
         # tags and playcount
-        try:
-            track_info = await self.api.track_get_info(
-                artist_name, track_name, ctx.lfm.username
-            )
-        except exceptions.LastFMError:
-            track_info = None
         if track_info is not None:
             play_count = int(track_info["userplaycount"])
             if play_count > 0:
@@ -571,6 +764,13 @@ class LastFm(commands.Cog):
 
         message = await ctx.send(embed=content)
 
+        if (
+            metadata is not None
+            and metadata.image_hash != image.hash
+            and not image.is_missing()
+        ):
+            await self.albums.set_cover(artist_name, album_name, image.hash, color)
+
         voting_settings = await self.bot.db.fetch_row(
             """
             SELECT is_enabled, upvote_emoji, downvote_emoji
@@ -788,25 +988,19 @@ class LastFm(commands.Cog):
             f"https://last.fm/user/{ctx.lfm.username}/library/music/"
             f"{artist_url_format}?date_preset={timeframe.web_format()}"
         )
-        soup = await self.api.scrape_page(url)
+        page = await self.api.scrape_library_page(url)
 
         try:
-            chartlists = soup.select(".chartlist")
             # there are "ghost" chartlists that mess up web scraping
-            albumsdiv = chartlists[1]
-            tracksdiv = chartlists[3]
+            albums = page.chartlists[1]
+            tracks = page.chartlists[3]
         except IndexError:
             return raise_no_artist_plays(artist, timeframe)
 
-        albums = self.api.get_library_playcounts(albumsdiv)
-        tracks = self.api.get_library_playcounts(tracksdiv)
-
-        img = soup.select_one("span.library-header-image img")
-
         content = discord.Embed()
 
-        if img:
-            image = LastFmImage.from_url(img.attrs["src"])
+        if page.header_image:
+            image = LastFmImage.from_url(page.header_image)
             content.set_thumbnail(url=image.as_full())
             content.colour = await self.image_color(image)
 
@@ -823,8 +1017,8 @@ class LastFm(commands.Cog):
         )
 
         metadata = []
-        for metadata_item in soup.select(".metadata-display"):
-            metadata.append(parse_playcount(metadata_item.text))
+        for metadata_item in page.metadata:
+            metadata.append(parse_playcount(metadata_item))
 
         scrobbles, albums_count, tracks_count = metadata
 
@@ -927,18 +1121,25 @@ class LastFm(commands.Cog):
             f"https://last.fm/user/{ctx.lfm.username}/library/music/"
             f"{artist_url_format}/+{data_type}?date_preset={timeframe.web_format()}"
         )
-        soup = await self.api.scrape_page(url)
+        page = await self.api.scrape_library_page(url)
 
         formatted_name = artistinfo["name"]
-        row_items = self.api.get_library_playcounts(soup)
+        # copied, since the scraped page is cached
+        row_items = list(page.rows)
         if not row_items:
             return raise_no_artist_plays(artist, timeframe)
 
-        row_items += await self.api.get_additional_library_pages(soup, url)
+        more_items, failed_pages = await self.api.get_additional_library_pages(
+            page, url
+        )
+        row_items += more_items
 
-        img_tag = soup.select_one(".chartlist-image .cover-art img")
-        image = LastFmImage.from_url(img_tag.attrs["src"]) if img_tag else None
+        image = LastFmImage.from_url(page.cover_image) if page.cover_image else None
         total = artistinfo["stats"]["userplaycount"]
+        footer = f"Total {total} plays across {len(row_items)} {data_type}"
+        if failed_pages:
+            # the list is missing everything on these pages
+            footer += f" ({failed_pages} pages failed to load)"
 
         await self.paginated_user_stat_embed(
             ctx,
@@ -950,7 +1151,7 @@ class LastFm(commands.Cog):
                 else f"Top {data_type}"
             ),
             image,
-            footer=f"Total {total} plays across {len(row_items)} {data_type}",
+            footer=footer,
         )
 
     @fm.command(name="album")
@@ -995,14 +1196,13 @@ class LastFm(commands.Cog):
         album_name = albuminfo["name"]
         artist_name = albuminfo["artist"]
 
-        row_items = self.api.get_library_playcounts(
-            await self.api.scrape_page(
-                f"https://www.last.fm/user/{ctx.lfm.username}/library/music/"
-                f"{urllib.parse.quote_plus(artist_name)}/"
-                f"{urllib.parse.quote_plus(album_name)}"
-                f"?date_preset={timeframe.web_format()}"
-            )
+        page = await self.api.scrape_library_page(
+            f"https://www.last.fm/user/{ctx.lfm.username}/library/music/"
+            f"{urllib.parse.quote_plus(artist_name)}/"
+            f"{urllib.parse.quote_plus(album_name)}"
+            f"?date_preset={timeframe.web_format()}"
         )
+        row_items = page.rows
 
         if not row_items:
             return raise_no_album_plays(artist_name, album_name, timeframe)
@@ -1034,29 +1234,25 @@ class LastFm(commands.Cog):
         except KeyError:
             tracks = []
 
-        library = {
-            name: playcount
-            for playcount, name in self.api.get_library_playcounts(
-                await self.api.scrape_page(
-                    f"https://www.last.fm/user/{ctx.lfm.username}/library/music/"
-                    f"{urllib.parse.quote_plus(artist_name)}/{urllib.parse.quote_plus(album_name)}"
-                )
-            )
-        }
+        page = await self.api.scrape_library_page(
+            f"https://www.last.fm/user/{ctx.lfm.username}/library/music/"
+            f"{urllib.parse.quote_plus(artist_name)}/{urllib.parse.quote_plus(album_name)}"
+        )
+        library = {name: playcount for playcount, name in page.rows}
 
         content = discord.Embed()
 
-        metadata = await self.api.scrape_album_metadata(artist_name, album_name)
+        metadata = await self.albums.get(artist_name, album_name)
         if metadata:
-            if metadata["length"]:
+            if metadata.length:
                 content.add_field(
                     name="Length",
-                    value=f"{metadata['length']}",
+                    value=f"{metadata.length}",
                 )
-            if metadata["release_date"]:
+            if metadata.release_date:
                 content.add_field(
                     name="Release Date",
-                    value=f"{metadata['release_date'].format('MMM D YYYY')}",
+                    value=f"{metadata.release_date.format('MMM D YYYY')}",
                 )
 
         content.add_field(name="Total plays", value=albuminfo["userplaycount"])
@@ -1294,65 +1490,47 @@ class LastFm(commands.Cog):
                 continue
             albums.append(img)
 
-        to_fetch = []
-        albumcolors = await self.bot.db.fetch(
-            """
-            SELECT image_hash, r, g, b FROM image_color_cache WHERE image_hash IN %s
-            """,
-            tuple(a.hash for a in albums),
-        )
-
-        albumcolors_dict = {}
-        if albumcolors:
-            for image_hash, r, g, b in albumcolors:
-                albumcolors_dict[image_hash] = (r, g, b)
-
-        album_color_nodes = []
         warn = None
-        for image in albums:
-            color = albumcolors_dict.get(image.hash)
-            if color is None:
-                to_fetch.append(image)
-            else:
-                album_color_nodes.append(AlbumColorNode(color, image.hash))
-
-        if to_fetch:
-            to_cache = []
-
-            async def get_color(image):
-                color, hex_color = await self.get_hex(image)
-                if color is None:
-                    return None
-
-                return image.hash, color.r, color.g, color.b, hex_color
+        album_hashes = tuple(a.hash for a in albums)
+        cached = self.color_indexes.get(ctx.lfm.username)
+        if cached is not None and cached[0] == album_hashes:
+            color_index = cached[1]
+        else:
+            album_colors = await self.colors.get_many(list(album_hashes))
+            to_fetch = [image for image in albums if image.hash not in album_colors]
+            if to_fetch:
+                to_cache = {}
+
+                async def get_color(image):
+                    color = await self.cover_color(image)
+                    if color is None:
+                        return None
+
+                    return image.hash, color
+
+                futures = [get_color(image) for image in to_fetch]
+                if len(futures) > 500:
+                    warn = await ctx.send(
+                        ":exclamation:Your library includes over 500 uncached album colours, "
+                        f"this might take a while {emojis.LOADING}"
+                    )
 
-            futures = [get_color(image) for image in to_fetch]
-            if len(futures) > 500:
-                warn = await ctx.send(
-                    ":exclamation:Your library includes over 500 uncached album colours, "
-                    f"this might take a while {emojis.LOADING}"
-                )
+                colordata = await asyncio.gather(*futures)
+                for colortuple in colordata:
+                    if colortuple is None:
+                        continue
+                    image_hash, color = colortuple
+                    to_cache[image_hash] = color
 
-            colordata = await asyncio.gather(*futures)
-            for colortuple in colordata:
-                if colortuple is None:
-                    continue
-                image_hash, r, g, b, hexcolor = colortuple
-                to_cache.append((image_hash, r, g, b, hexcolor))
-                album_color_nodes.append(AlbumColorNode((r, g, b), image_hash))
+                await self.colors.store(to_cache)
+                album_colors |= to_cache
 
-            await self.bot.db.executemany(
-                """
-                INSERT IGNORE image_color_cache (image_hash, r, g, b, hex)
-                VALUES (%s, %s, %s, %s, %s)
-                """,
-                to_cache,
-            )
+            color_index = ColorIndex(album_colors)
+            self.color_indexes.set(ctx.lfm.username, (album_hashes, color_index))
 
-        if not album_color_nodes:
+        if not color_index:
             raise exceptions.CommandError("Failed at getting album data")
 
-        tree = kdtree.create(point_list=album_color_nodes)
         if rainbow:
             rainbow_colors = (
                 [
@@ -1381,7 +1559,7 @@ class LastFm(commands.Cog):
                 ]
             )
             chunks = [
-                list(tree.search_knn(rgb, size.width + size.height))
+                color_index.nearest(rgb, size.width + size.height)
                 for rgb in rainbow_colors
             ]
             random_offset = random.randint(0, 6)
@@ -1400,19 +1578,19 @@ class LastFm(commands.Cog):
 
                 chart_nodes.append(
                     (
-                        LastFmImage(choice[0].data.data),
+                        LastFmImage(choice),
                         "",
                     )
                 )
 
         else:
-            nearest = tree.search_knn(query_color.to_rgb(), size.count)
+            nearest = color_index.nearest(query_color.to_rgb(), size.count)
             chart_nodes = [
                 (
-                    LastFmImage(a[0].data.data),
+                    LastFmImage(image_hash),
                     "",
                 )
-                for a in nearest
+                for image_hash in nearest
             ]
 
         buffer = await self.chart_factory(
@@ -1475,11 +1653,31 @@ class LastFm(commands.Cog):
             "WRAP_CLASSES": "with-gaps" if use_padding else "",
         }
 
-        return await util.render_html_template(
-            self.bot,
-            {"template": "fm_collage"},
-            context,
+        # the context is everything that goes into the image, so it identifies it
+        serialized = orjson.dumps(context, option=orjson.OPT_SORT_KEYS)
+        key = "chart:" + hashlib.sha256(serialized).hexdigest()
+        cached = await self.rendered_charts.get(key)
+        if cached is not None:
+            return io.BytesIO(cached)
+
+        try:
+            buffer = await collage.render(
+                self.covers,
+                [(album["image_url"], album["label"]) for album in albums],
+                size.width,
+                size.height,
+                [label["text"] for label in context["TOPSTER_LABELS"]],
+                topster_font_size,
+                use_padding,
+            )
+        except collage.UnsupportedLayout as e:
+            logger.info(f"Rendering chart with the html renderer: {e}")
+            buffer = await self.bot.renderer.render("fm_collage", context)
+
+        await self.rendered_charts.set(
+            key, buffer.getvalue(), self.RENDERED_CHART_LIFETIME
         )
+        return buffer
 
     async def server_lastfm_usernames(
         self, guild: discord.Guild, filter_blacklisted=False
@@ -1519,25 +1717,66 @@ class LastFm(commands.Cog):
         return data
 
     async def task_for_each_server_member(
-        self, guild: discord.Guild, task: asyncio.Future, *args, **kwargs
-    ):
-        futures = []
+        self, guild: discord.Guild, task: Callable, *args, **kwargs
+    ) -> list[tuple[Any, discord.Member]] | None:
+        members = []
         for user_id, lastfm_username in await self.server_lastfm_usernames(guild):
             member = guild.get_member(user_id)
             if member is None:
                 continue
 
-            futures.append(
-                task_wrapper(
-                    task(lastfm_username, *args, **kwargs),
-                    member,
-                )
-            )
+            members.append((lastfm_username, member))
 
-        if not futures:
+        if not members:
             return None
 
-        return await asyncio.gather(*futures)
+        with background_priority():
+            return [
+                (result, member)
+                async for (_, member), result in self.api.map_users(
+                    lambda item: task(item[0], *args, **kwargs), members
+                )
+            ]
+
+    async def server_aggregate(
+        self, ctx: MisoContext, kind: AggregateKind, period: Period
+    ) -> ServerAggregate:
+        """Combined top list of the server members, cached for the next callers."""
+        if ctx.guild is None:
+            raise exceptions.CommandError("Unable to get current guild")
+
+        aggregate = self.aggregates.get(ctx.guild.id, period, kind)
+        if aggregate is not None:
+            return aggregate
+
+        api_method = {
+            "artist": self.api.user_get_top_artists,
+            "album": self.api.user_get_top_albums,
+            "track": self.api.user_get_top_tracks,
+        }[kind]
+        fanout = ServerFanout(
+            ctx, api_method, limit=self.SERVER_TOP_LIMIT, period=period
+        )
+        aggregate = ServerAggregate()
+        failed = 0
+        async for member_data, lastfm_username in fanout:
+            if member_data is None:
+                failed += 1
+            else:
+                aggregate.update_member(
+                    lastfm_username, parse_top_items(kind, member_data)
+                )
+
+        aggregate.missing = fanout.total - fanout.completed
+        # a partial aggregate is only kept for long enough to page through it
+        self.aggregates.set(
+            ctx.guild.id,
+            period,
+            kind,
+            aggregate,
+            partial=bool(failed or aggregate.missing),
+        )
+        return aggregate
 
     @fm.group(aliases=["s"])
     @commands.guild_only()
@@ -1660,7 +1899,6 @@ class LastFm(commands.Cog):
         """Combined top artists of server members"""
         timeframe = Period.OVERALL
         mode = "score"
-        contributors = 0
 
         for arg in args:
             if isinstance(arg, Period):
@@ -1668,67 +1906,22 @@ class LastFm(commands.Cog):
             else:
                 mode = arg
 
-        data = await self.task_for_each_server_member(
-            ctx.guild, self.api.user_get_top_artists, limit=100, period=timeframe
-        )
-
-        if data is None:
-            return await ctx.send(
-                "Nobody on this server has connected their Last.fm account yet!"
-            )
-
-        artist_map = {}
-        for member_data, _member in data:
-            if member_data is None:
-                continue
-
-            artists = member_data["artist"]
-            if len(artists) == 0:
-                continue
-
-            contributors += 1
-
-            lowest_playcount = int(artists[-1]["playcount"])
-            highest_playcount = int(artists[0]["playcount"])
-            for artist in artists:
-                playcount = int(artist["playcount"])
-                score = playcount_mapped(
-                    playcount,
-                    input_start=lowest_playcount,
-                    input_end=highest_playcount,
-                )
-
-                name = artist["name"]
-
-                try:
-                    artist_map[name]["score"] += score
-                    artist_map[name]["playcount"] += playcount
-                except KeyError:
-                    artist_map[name] = {"score": score, "playcount": playcount}
-
-        if mode == "score":
-            sort_key = "score"
-        else:
-            sort_key = "playcount"
-
-        top_artists = sorted(
-            artist_map.items(), key=lambda x: x[1][sort_key], reverse=True
-        )[:100]
+        aggregate = await self.server_aggregate(ctx, "artist", timeframe)
+        contributors = aggregate.contributors
+        top_artists = aggregate.top(100, by="score" if mode == "score" else "playcount")
 
         if not top_artists:
             return await ctx.send("Nobody on this server has listened to anything!")
 
         rows = []
-        for i, (artist, artist_data) in enumerate(top_artists, start=1):
+        for i, (artist, score, playcount, _) in enumerate(top_artists, start=1):
             if mode == "score":
                 rows.append(
-                    f"`#{i:2}` **{artist_data['score'] / contributors:.2f}%** /"
-                    f" **{artist_data['playcount']}** plays • **{artist}**"
+                    f"`#{i:2}` **{score / contributors:.2f}%** /"
+                    f" **{playcount}** plays • **{artist}**"
                 )
             else:
-                rows.append(
-                    f"`#{i:2}` **{artist_data['playcount']}** plays • **{artist}**"
-                )
+                rows.append(f"`#{i:2}` **{playcount}** plays • **{artist}**")
 
         if mode == "score":
             footer = f"Score calculated from top 100 artists of {contributors} members"
@@ -1736,6 +1929,7 @@ class LastFm(commands.Cog):
             footer = (
                 f"Ranked by scrobbles from top 100 artists of {contributors} members"
             )
+        footer += missing_members_note(aggregate.missing)
 
         await self.paginated_user_stat_embed(
             ctx,
@@ -1760,7 +1954,6 @@ class LastFm(commands.Cog):
         """Combined top tracks of server members"""
         timeframe = Period.OVERALL
         mode = "score"
-        contributors = 0
 
         for arg in args:
             if isinstance(arg, Period):
@@ -1768,71 +1961,23 @@ class LastFm(commands.Cog):
             else:
                 mode = arg
 
-        data = await self.task_for_each_server_member(
-            ctx.guild, self.api.user_get_top_tracks, limit=100, period=timeframe
-        )
-
-        if data is None:
-            return await ctx.send(
-                "Nobody on this server has connected their Last.fm account yet!"
-            )
-
-        track_map = {}
-        for member_data, _member in data:
-            if member_data is None:
-                continue
-
-            tracks = member_data["track"]
-            if len(tracks) == 0:
-                continue
-
-            contributors += 1
-
-            lowest_playcount = int(tracks[-1]["playcount"])
-            highest_playcount = int(tracks[0]["playcount"])
-            for track in tracks:
-                playcount = int(track["playcount"])
-                score = playcount_mapped(
-                    playcount,
-                    input_start=lowest_playcount,
-                    input_end=highest_playcount,
-                )
-
-                name = (
-                    f"**{escape_markdown(track['artist']['name'])}** — "
-                    f"***{escape_markdown(track['name'])}***"
-                )
-                try:
-                    track_map[name]["score"] += score
-                    track_map[name]["playcount"] += playcount
-                except KeyError:
-                    track_map[name] = {
-                        "score": score,
-                        "playcount": playcount,
-                        "url": track["url"],
-                    }
-
-        if mode == "score":
-            sort_key = "score"
-        else:
-            sort_key = "playcount"
-
-        top_tracks = sorted(
-            track_map.items(), key=lambda x: x[1][sort_key], reverse=True
-        )[:100]
+        aggregate = await self.server_aggregate(ctx, "track", timeframe)
+        contributors = aggregate.contributors
+        top_tracks = aggregate.top(100, by="score" if mode == "score" else "playcount")
 
         if not top_tracks:
             return await ctx.send("Nobody on this server has listened to anything!")
 
         rows = []
-        for i, (track, track_data) in enumerate(top_tracks, start=1):
+        for i, ((artist, track), score, playcount, _) in enumerate(top_tracks, start=1):
+            name = f"**{escape_markdown(artist)}** — ***{escape_markdown(track)}***"
             if mode == "score":
                 rows.append(
-                    f"`#{i:2}` **{track_data['score'] / contributors:.2f}%** /"
-                    f" **{track_data['playcount']}** plays • {track}"
+                    f"`#{i:2}` **{score / contributors:.2f}%** /"
+                    f" **{playcount}** plays • {name}"
                 )
             else:
-                rows.append(f"`#{i:2}` **{track_data['playcount']}** plays • {track}")
+                rows.append(f"`#{i:2}` **{playcount}** plays • {name}")
 
         if mode == "score":
             footer = f"Score calculated from top 100 tracks of {contributors} members"
@@ -1840,12 +1985,13 @@ class LastFm(commands.Cog):
             footer = (
                 f"Ranked by scrobbles from top 100 tracks of {contributors} members"
             )
+        footer += missing_members_note(aggregate.missing)
 
         await self.paginated_user_stat_embed(
             ctx,
             rows,
             f"Top 100 Tracks ({timeframe.display()})",
-            image=await self.api.scrape_track_image(top_tracks[0][1]["url"]),
+            image=await self.api.scrape_track_image(top_tracks[0][3]),
             footer=footer,
             server_target=True,
         )
@@ -1864,7 +2010,6 @@ class LastFm(commands.Cog):
         """Combined top albums of server members"""
         timeframe = Period.OVERALL
         mode = "score"
-        contributors = 0
 
         for arg in args:
             if isinstance(arg, Period):
@@ -1872,71 +2017,23 @@ class LastFm(commands.Cog):
             else:
                 mode = arg
 
-        data = await self.task_for_each_server_member(
-            ctx.guild, self.api.user_get_top_albums, limit=100, period=timeframe
-        )
-
-        if data is None:
-            return await ctx.send(
-                "Nobody on this server has connected their Last.fm account yet!"
-            )
-
-        album_map = {}
-        for member_data, _member in data:
-            if member_data is None:
-                continue
-
-            albums = member_data["album"]
-            if len(albums) == 0:
-                continue
-
-            contributors += 1
-
-            lowest_playcount = int(albums[-1]["playcount"])
-            highest_playcount = int(albums[0]["playcount"])
-            for album in albums:
-                playcount = int(album["playcount"])
-                score = playcount_mapped(
-                    playcount,
-                    input_start=lowest_playcount,
-                    input_end=highest_playcount,
-                )
-
-                name = (
-                    f"**{escape_markdown(album['artist']['name'])}** — "
-                    f"***{escape_markdown(album['name'])}***"
-                )
-                try:
-                    album_map[name]["score"] += score
-                    album_map[name]["playcount"] += playcount
-                except KeyError:
-                    album_map[name] = {
-                        "score": score,
-                        "playcount": playcount,
-                        "image": album["image"][0]["#text"],
-                    }
-
-        if mode == "score":
-            sort_key = "score"
-        else:
-            sort_key = "playcount"
-
-        top_albums = sorted(
-            album_map.items(), key=lambda x: x[1][sort_key], reverse=True
-        )[:100]
+        aggregate = await self.server_aggregate(ctx, "album", timeframe)
+        contributors = aggregate.contributors
+        top_albums = aggregate.top(100, by="score" if mode == "score" else "playcount")
 
         if not top_albums:
             return await ctx.send("Nobody on this server has listened to anything!")
 
         rows = []
-        for i, (album, album_data) in enumerate(top_albums, start=1):
+        for i, ((artist, album), score, playcount, _) in enumerate(top_albums, start=1):
+            name = f"**{escape_markdown(artist)}** — ***{escape_markdown(album)}***"
             if mode == "score":
                 rows.append(
-                    f"`#{i:2}` **{album_data['score'] / contributors:.2f}%** /"
-                    f" **{album_data['playcount']}** plays • {album}"
+                    f"`#{i:2}` **{score / contributors:.2f}%** /"
+                    f" **{playcount}** plays • {name}"
                 )
             else:
-                rows.append(f"`#{i:2}` **{album_data['playcount']}** plays • {album}")
+                rows.append(f"`#{i:2}` **{playcount}** plays • {name}")
 
         if mode == "score":
             footer = f"Score calculated from top 100 albums of {contributors} members"
@@ -1944,12 +2041,13 @@ class LastFm(commands.Cog):
             footer = (
                 f"Ranked by scrobbles from top 100 albums of {contributors} members"
             )
+        footer += missing_members_note(aggregate.missing)
 
         await self.paginated_user_stat_embed(
             ctx,
             rows,
             f"Top 100 Albums ({timeframe.display()})",
-            image=LastFmImage.from_url(top_albums[0][1]["image"]),
+            image=LastFmImage.from_url(top_albums[0][3]),
             footer=footer,
             server_target=True,
         )
@@ -1999,55 +2097,15 @@ class LastFm(commands.Cog):
         topster = "topster" in args
         if "artist" in args:
             chart_title = "top artist"
-            data = await self.task_for_each_server_member(
-                ctx.guild,
-                self.api.user_get_top_artists,
-                limit=size.count,
-                period=timeframe,
-            )
-
-            if data is None:
-                return await ctx.send(
-                    "Nobody on this server has connected their Last.fm account yet!"
-                )
-
-            artist_map = {}
-            for member_data, _member in data:
-                if member_data is None:
-                    continue
-
-                artists = member_data["artist"]
-                if len(artists) == 0:
-                    continue
-
-                contributors += 1
-
-                lowest_playcount = int(artists[-1]["playcount"])
-                highest_playcount = int(artists[0]["playcount"])
-                for artist in artists:
-                    playcount = int(artist["playcount"])
-                    score = playcount_mapped(
-                        playcount,
-                        input_start=lowest_playcount,
-                        input_end=highest_playcount,
-                    )
-
-                    name = artist["name"]
-
-                    try:
-                        artist_map[name]["score"] += score
-                        artist_map[name]["playcount"] += playcount
-                    except KeyError:
-                        artist_map[name] = {"score": score, "playcount": playcount}
-
-            top_artists = sorted(
-                artist_map.items(), key=lambda x: x[1]["score"], reverse=True
-            )[: size.count]
+            aggregate = await self.server_aggregate(ctx, "artist", timeframe)
+            contributors = aggregate.contributors
+            missing = aggregate.missing
+            top_artists = aggregate.top(size.count)
 
             if not top_artists:
                 return await ctx.send("Nobody on this server has listened to anything!")
 
-            for i, (name, artist_data) in enumerate(top_artists):
+            for i, (name, score, _, _) in enumerate(top_artists):
                 image = await self.api.get_artist_image(name)
                 if image is None:
                     image = LastFmImage(LastFmImage.MISSING_IMAGE_HASH)
@@ -2055,7 +2113,7 @@ class LastFm(commands.Cog):
                 chart_nodes.append(
                     (
                         image,
-                        f"<p class='label'>{name}<p><p class='playcount'>{artist_data['score'] / contributors:.2f}%<p>",
+                        f"<p class='label'>{name}<p><p class='playcount'>{score / contributors:.2f}%<p>",
                     )
                 )
                 if topster:
@@ -2066,17 +2124,12 @@ class LastFm(commands.Cog):
         elif "recent" in args or "recents" in args:
             chart_title = "recent tracks"
 
-            data = await self.task_for_each_server_member(
-                ctx.guild, self.api.user_get_recent_tracks, limit=size.count
+            fanout = ServerFanout(
+                ctx, self.api.user_get_recent_tracks, limit=size.count
             )
 
-            if data is None:
-                return await ctx.send(
-                    "Nobody on this server has connected their Last.fm account yet!"
-                )
-
             track_list = []
-            for member_data, _member in data:
+            async for member_data, _username in fanout:
                 if member_data is None:
                     continue
 
@@ -2084,6 +2137,8 @@ class LastFm(commands.Cog):
                 if len(tracks) == 0:
                     continue
 
+                contributors += 1
+
                 for track in tracks:
                     artist_name = track["artist"]["#text"]
                     track_name = track["name"]
@@ -2094,6 +2149,8 @@ class LastFm(commands.Cog):
                         when = sys.maxsize
                     track_list.append([when, artist_name, track_name, image])
 
+            missing = fanout.total - fanout.completed
+
             for i, (when, artist_name, track_name, image) in enumerate(
                 sorted(track_list, key=lambda x: x[0], reverse=True)[: size.count]
             ):
@@ -2113,59 +2170,20 @@ class LastFm(commands.Cog):
         else:
             chart_title = "top album"
 
-            data = await self.task_for_each_server_member(
-                ctx.guild, self.api.user_get_top_albums, limit=100, period=timeframe
-            )
-
-            if data is None:
-                return await ctx.send(
-                    "Nobody on this server has connected their Last.fm account yet!"
-                )
-
-            album_map = {}
-            for member_data, _member in data:
-                if member_data is None:
-                    continue
-
-                albums = member_data["album"]
-                if len(albums) == 0:
-                    continue
-
-                contributors += 1
-
-                lowest_playcount = int(albums[-1]["playcount"])
-                highest_playcount = int(albums[0]["playcount"])
-                for album in albums:
-                    playcount = int(album["playcount"])
-                    score = playcount_mapped(
-                        playcount,
-                        input_start=lowest_playcount,
-                        input_end=highest_playcount,
-                    )
-
-                    name = f"{album['artist']['name']} — {album['name']}"
-                    try:
-                        album_map[name]["score"] += score
-                        album_map[name]["playcount"] += playcount
-                    except KeyError:
-                        album_map[name] = {
-                            "score": score,
-                            "playcount": playcount,
-                            "image": album["image"][0]["#text"],
-                        }
-
-            top_albums = sorted(
-                album_map.items(), key=lambda x: x[1]["score"], reverse=True
-            )[: size.count]
+            aggregate = await self.server_aggregate(ctx, "album", timeframe)
+            contributors = aggregate.contributors
+            missing = aggregate.missing
+            top_albums = aggregate.top(size.count)
 
             if not top_albums:
                 return await ctx.send("Nobody on this server has listened to anything!")
 
-            for i, (name, album_data) in enumerate(top_albums):
+            for i, ((artist, album), score, _, image) in enumerate(top_albums):
+                name = f"{artist} — {album}"
                 chart_nodes.append(
                     (
-                        LastFmImage.from_url(album_data["image"]),
-                        f"<p class='label'>{name}</p><p class='playcount'>{album_data['score'] / contributors:.2f}%</p>",
+                        LastFmImage.from_url(image),
+                        f"<p class='label'>{name}</p><p class='playcount'>{score / contributors:.2f}%</p>",
                     )
                 )
                 if topster:
@@ -2184,7 +2202,8 @@ class LastFm(commands.Cog):
         caption = (
             f"**{ctx.guild.name} | "
             f"{f'{timeframe.display().lower()} ' if 'recent' not in args else ''}"
-            f"{size} {chart_title} collage**"
+            f"{size} {chart_title} collage**\n"
+            f"-# Combined from {contributors} members{missing_members_note(missing)}"
         )
         filename = (
             f"miso_collage_{ctx.guild.name}_{timeframe}_{arrow.now().int_timestamp}.jpg"
@@ -2193,7 +2212,12 @@ class LastFm(commands.Cog):
         await ctx.send(caption, file=discord.File(fp=buffer, filename=filename))
 
     async def user_ranking(
-        self, ctx: MisoContext, playcount_fn: Callable, ranking_of: str
+        self,
+        ctx: MisoContext,
+        playcount_fn: Callable,
+        ranking_of: str,
+        index_kind: IndexKind,
+        index_key: tuple[str, ...],
     ):
         if ctx.guild is None:
             raise exceptions.CommandError("Unable to get current guild")
@@ -2206,16 +2230,67 @@ class LastFm(commands.Cog):
                 "Nobody on this server has connected their Last.fm account yet!"
             )
 
+        # indexed members are ranked with a single query,
+        # the rest have to be looked up from the api one by one
+        cutoffs = await self.playcounts.cutoffs(
+            index_kind, [lastfm_username for _, lastfm_username in fm_members]
+        )
+        index_data = await self.playcounts.lookup(
+            index_kind,
+            index_key,
+            [
+                lastfm_username
+                for _, lastfm_username in fm_members
+                if lastfm_username.casefold() in cutoffs
+            ],
+        )
+
         data = []
-        for member_chunk in batched(fm_members, 30):
-            tasks = []
-            async with asyncio.TaskGroup() as tg:
-                for user_id, lastfm_username in member_chunk:
-                    task = tg.create_task(playcount_fn(lastfm_username, user_id))
-                    tasks.append(task)
-
-            chunkdata = [task.result() for task in tasks]
-            data += chunkdata
+        unindexed = []
+        # indexed members whose top list was cut off before reaching this entity
+        out_of_range = []
+        for user_id, lastfm_username in fm_members:
+            name = lastfm_username.casefold()
+            if name not in cutoffs:
+                unindexed.append((user_id, lastfm_username))
+            elif index_data.get(name, 0) >= cutoffs[name]:
+                # anything played more than the cutoff is fresh from the index
+                data.append((index_data.get(name, 0), user_id))
+            else:
+                out_of_range.append((user_id, lastfm_username))
+
+        await self.playcounts.request(
+            [lastfm_username for _, lastfm_username in unindexed]
+        )
+
+        pending = 0
+        if len(unindexed) > self.LIVE_RANKING_LIMIT:
+            # they will be included once the background indexing gets to them
+            pending = len(unindexed)
+            unindexed = []
+
+        live_members = (out_of_range + unindexed)[: self.LIVE_RANKING_LIMIT]
+        pending += len(out_of_range) + len(unindexed) - len(live_members)
+
+        live_data = []
+        with background_priority():
+            async for (user_id, _), result in self.api.map_users(
+                lambda item: playcount_fn(item[1], item[0]), live_members
+            ):
+                live_data.append(result or (0, user_id))
+
+        usernames = dict(live_members)
+        await self.playcounts.store_entity(
+            index_kind,
+            index_key,
+            [
+                (usernames[user_id], playcount)
+                for playcount, user_id in live_data
+                if playcount > 0
+            ],
+        )
+        data += live_data
+
         crown_holder = None
         crown_playcount = 0
         total = 0
@@ -2248,12 +2323,14 @@ class LastFm(commands.Cog):
 
         content = discord.Embed(title=f"Who knows **{ranking_of}**?")
 
-        content.set_footer(text=f"Collective plays: {total}")
+        footer = f"Collective plays: {total}"
+        if pending:
+            footer += f" • {pending} members could not be checked yet"
+        content.set_footer(text=footer)
 
         return content, rows, crown_holder, crown_playcount
 
     @commands.command()
-    @is_small_server()
     @commands.guild_only()
     async def crowns(self, ctx: MisoContext, *, user: discord.Member = None):
         """See your current artist crowns on this server"""
@@ -2283,7 +2360,6 @@ class LastFm(commands.Cog):
 
     @commands.command(aliases=["wk", "whomstknows"], usage="<artist> 'np'")
     @commands.guild_only()
-    @is_small_server()
     @commands.cooldown(2, 60, type=commands.BucketType.user)
     async def whoknows(
         self, ctx: MisoContext, *, artist: Annotated[str, ArtistArgument]
@@ -2315,7 +2391,7 @@ class LastFm(commands.Cog):
 
         # get whoknows ranking
         content, rows, crown_holder, crown_playcount = await self.user_ranking(
-            ctx, user_playcount, artist_name
+            ctx, user_playcount, artist_name, "artist", (artist_name,)
         )
 
         # get artist image
@@ -2329,30 +2405,15 @@ class LastFm(commands.Cog):
 
         # if crown was stolen, send that as a separate message
         if crown_holder:
-            previous_crown_holder_id = await self.bot.db.fetch_value(
-                "SELECT user_id FROM artist_crown WHERE artist_name = %s AND guild_id = %s",
-                artist_name,
-                ctx.guild.id,
+            transfers = await self.crowns.update(
+                [(ctx.guild.id, crown_holder.id, artist_name, crown_playcount)],
+                authoritative=True,
             )
-            await self.bot.db.execute(
-                """
-                INSERT INTO artist_crown (guild_id, user_id, artist_name, cached_playcount)
-                    VALUES (%s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                    cached_playcount = VALUES(cached_playcount),
-                    user_id = VALUES(user_id)
-                """,
-                ctx.guild.id,
-                crown_holder.id,
-                artist_name,
-                crown_playcount,
-            )
-            if previous_crown_holder_id:
-                previous_crown_holder = ctx.guild.get_member(previous_crown_holder_id)
-                if previous_crown_holder is None:
-                    previous_crown_holder = self.bot.get_user(previous_crown_holder_id)
-
-                if previous_crown_holder and (previous_crown_holder != crown_holder):
+            for transfer in transfers:
+                previous_crown_holder = ctx.guild.get_member(
+                    transfer.previous_user_id
+                ) or self.bot.get_user(transfer.previous_user_id)
+                if previous_crown_holder:
                     await ctx.send(
                         f"> **{util.displayname(crown_holder)}** just stole the "
                         f"**{artist_name}** crown from "
@@ -2363,7 +2424,6 @@ class LastFm(commands.Cog):
         aliases=["wkt", "whomstknowstrack"], usage="<track> | <artist> 'np'"
     )
     @commands.guild_only()
-    @is_small_server()
     @commands.cooldown(2, 60, type=commands.BucketType.user)
     async def whoknowstrack(
         self, ctx: MisoContext, *, track: Annotated[tuple, TrackArgument]
@@ -2400,7 +2460,11 @@ class LastFm(commands.Cog):
 
         # get whoknows ranking
         content, rows, _, _ = await self.user_ranking(
-            ctx, user_playcount, f"{track_name}** by **{artist_name}"
+            ctx,
+            user_playcount,
+            f"{track_name}** by **{artist_name}",
+            "track",
+            (artist_name, track_name),
         )
 
         # get album image
@@ -2416,7 +2480,6 @@ class LastFm(commands.Cog):
         aliases=["wka", "wkalb", "whomstknowsalbum"], usage="<album> | <artist> 'np'"
     )
     @commands.guild_only()
-    @is_small_server()
     @commands.cooldown(2, 60, type=commands.BucketType.user)
     async def whoknowsalbum(
         self, ctx: MisoContext, *, album: Annotated[tuple, AlbumArgument]
@@ -2453,7 +2516,11 @@ class LastFm(commands.Cog):
 
         # get whoknows ranking
         content, rows, _, _ = await self.user_ranking(
-            ctx, user_playcount, f"{album_name}** by **{artist_name}"
+            ctx,
+            user_playcount,
+            f"{album_name}** by **{artist_name}",
+            "album",
+            (artist_name, album_name),
         )
 
         # get album image
@@ -2542,43 +2609,26 @@ class LastFm(commands.Cog):
 
         return content
 
-    async def get_hex(self, image: LastFmImage):
-        """Get the dominan color of lastfm image."""
-        color = await util.rgb_from_image_url(
-            self.bot.session,
-            image.as_64s(),
-        )
-        hex_color = util.rgb_to_hex(color) if color is not None else None
-        return color, hex_color
-
     async def image_color(self, image: LastFmImage) -> int | None:
         """Get the dominant color of lastfm image, cache if new."""
-        cached_color = await self.bot.db.fetch_value(
-            "SELECT hex FROM image_color_cache WHERE image_hash = %s",
-            image.hash,
-        )
-        if cached_color:
-            return int(cached_color, 16)
+        color = await self.colors.get(image.hash)
+        if color is None:
+            # color not cached yet, compute and store
+            color = await self.cover_color(image)
+            if color is None:
+                return None
 
-        # color not cached yet, compute and store
+            await self.colors.store({image.hash: color})
 
-        color, hex_color = await self.get_hex(image)
-        if color is None or hex_color is None:
-            return None
+        return int(util.rgb_to_hex(color), 16)
 
-        await self.bot.db.execute(
-            """
-            INSERT IGNORE image_color_cache (image_hash, r, g, b, hex)
-                VALUES (%s, %s, %s, %s, %s)
-            """,
-            image.hash,
-            color.r,
-            color.g,
-            color.b,
-            hex_color,
-        )
+    async def cover_color(self, image: LastFmImage) -> util.Rgb | None:
+        """Compute the dominant color of the image, from the cover cache."""
+        data = await self.covers.read(image.as_64s())
+        if data is None:
+            return None
 
-        return int(hex_color, 16)
+        return util.Rgb(*await colorpool.pool.extract(data))
 
     async def get_all_albums(self, username: str):
         data = await self.api.user_get_top_albums(
@@ -2613,6 +2663,8 @@ async def create_lastfm_context(ctx: MisoContext):
 
     data = await get_lastfm_username(ctx)
     ctx.lfm = LastFmContext(*data)
+    if isinstance(ctx.cog, LastFm):
+        ctx.cog.scrobbles.mark_active(ctx.lfm.username)
 
 
 async def get_lastfm_username(ctx: MisoContext):
@@ -2673,14 +2725,6 @@ def raise_no_album_plays(artist: str, album: str, timeframe: Period):
     )
 
 
-async def task_wrapper(task: asyncio.Future, ref: Any):
-    try:
-        result = await task
-    except exceptions.LastFMError:
-        result = None
-    return result, ref
-
-
 def filter_tags(tags: list[str]):
     """get rid of useless tags"""
     clean_tags = []
@@ -2694,20 +2738,6 @@ def filter_tags(tags: list[str]):
     return clean_tags
 
 
-def playcount_mapped(
-    x: int,
-    input_start: int,
-    input_end: int,
-    output_start: int = 1,
-    output_end: int = 100,
-):
-    # if everything has the same playcount, give max points
-    # or else we will run into ZeroDivisionError
-    if input_start == input_end:
-        return output_end
-
-    score = (x - input_start) / (input_end - input_start) * (
-        output_end - output_start
-    ) + output_start
-
-    return score
+def missing_members_note(missing: int) -> str:
+    """Footer addition telling how many members were left out, if any."""
+    return f" ({missing} didn't respond in time)" if missing else ""
@@ -135,30 +135,12 @@ class Media(commands.Cog):
     @autoembedder.command(name="toggle")
     async def autoembedder_toggle(self, ctx: commands.Context):
         """Toggle the autoembedder on or off for given media provider"""
-        data = await self.bot.db.fetch_value(
-            f"""
-            SELECT {ctx.provider} FROM media_auto_embed_enabled WHERE guild_id = %s
-            """,
-            ctx.guild.id,
-        )
-        await self.bot.db.execute(
-            f"""
-            INSERT INTO media_auto_embed_enabled (guild_id, {ctx.provider})
-                VALUES (%s, %s)
-            ON DUPLICATE KEY UPDATE
-                {ctx.provider} = %s
-            """,
-            ctx.guild.id,
-            not data,
-            not data,
-        )
-
-        await self.bot.cache.cache_auto_embedders()
+        enabled = await self.bot.cache.toggle_auto_embedder(ctx.guild.id, ctx.provider)
 
         await util.send_success(
             ctx,
             f"{ctx.provider.capitalize()} automatic embeds are now "
-            f"**{'OFF' if data else 'ON'}** for this server",
+            f"**{'ON' if enabled else 'OFF'}** for this server",
         )
 
     @autoembedder.command(name="options")
@@ -60,6 +60,9 @@ class Mod(commands.Cog):
             if unmute_ts > now_ts:
                 continue
 
+            if not self.bot.owns_guild(guild_id):
+                continue
+
             await self.bot.db.execute(
                 """
                 DELETE FROM muted_user
@@ -22,27 +22,6 @@ class Notifications(commands.Cog):
         self.bot: MisoBot = bot
         self.icon = "📨"
         self.keyword_regex = r"(?:^|\s|[\~\"\'\+\*\`\_\/])(\L<words>)(?:$|\W|\s|s)"
-        self.notifications_cache: dict[int, dict[str, set]] = {}
-
-    async def cog_load(self):
-        await self.create_cache()
-
-    async def create_cache(self):
-        self.notifications_cache = {}
-        keywords = await self.bot.db.fetch(
-            "SELECT guild_id, user_id, keyword FROM notification",
-        )
-        if not keywords:
-            return
-
-        for guild_id, user_id, keyword in keywords:
-            if self.notifications_cache.get(guild_id) is None:
-                self.notifications_cache[guild_id] = {}
-
-            if self.notifications_cache[guild_id].get(keyword) is None:
-                self.notifications_cache[guild_id][keyword] = set()
-
-            self.notifications_cache[guild_id][keyword].add(user_id)
 
     async def send_notification(
         self,
@@ -106,7 +85,7 @@ class Notifications(commands.Cog):
         if message.author.bot:
             return
 
-        keywords = self.notifications_cache.get(message.guild.id)
+        keywords = self.bot.cache.notifications.get(message.guild.id)
         if keywords is None:
             return
 
@@ -140,18 +119,9 @@ class Notifications(commands.Cog):
                 logger.warning(
                     f"User {user_id} not found, deleting their notification for {users_words}"
                 )
-                await self.bot.db.execute(
-                    """
-                    DELETE FROM notification
-                        WHERE guild_id = %s
-                        AND user_id = %s
-                        AND keyword IN %s
-                    """,
-                    message.guild.id,
-                    user_id,
-                    users_words,
+                await self.bot.cache.remove_notifications(
+                    user_id, message.guild.id, users_words
                 )
-                await self.create_cache()
                 continue
 
             if (
@@ -215,18 +185,7 @@ class Notifications(commands.Cog):
                 "I was unable to send you a DM! Please change your settings."
             )
 
-        await self.bot.db.execute(
-            """
-            INSERT INTO notification (guild_id, user_id, keyword)
-                VALUES (%s, %s, %s)
-            """,
-            guild_id,
-            ctx.author.id,
-            keyword,
-        )
-
-        # remake notification cache
-        await self.create_cache()
+        await self.bot.cache.add_notification(guild_id, ctx.author.id, keyword)
         await util.send_success(
             ctx, f"New notification set! Check your DM {emojis.VIVISMIRK}"
         )
@@ -268,17 +227,7 @@ class Notifications(commands.Cog):
                 "I was unable to send you a DM! Please change your settings."
             )
 
-        await self.bot.db.execute(
-            """
-            DELETE FROM notification WHERE guild_id = %s AND user_id = %s AND keyword = %s
-            """,
-            guild_id,
-            ctx.author.id,
-            keyword,
-        )
-
-        # remake notification cache
-        await self.create_cache()
+        await self.bot.cache.remove_notifications(ctx.author.id, guild_id, {keyword})
         await util.send_success(
             ctx, f"Removed a notification! Check your DM {emojis.VIVISMIRK}"
         )
@@ -333,30 +282,16 @@ class Notifications(commands.Cog):
         Use in DMs to clear every server.
         """
         if ctx.guild is None:
-            await self.bot.db.execute(
-                """
-                DELETE FROM notification WHERE user_id = %s
-                """,
-                ctx.author.id,
-            )
+            await self.bot.cache.remove_notifications(ctx.author.id)
             await util.send_success(
                 ctx, "Cleared all of your notifications in all servers!"
             )
         else:
-            await self.bot.db.execute(
-                """
-                DELETE FROM notification WHERE user_id = %s AND guild_id = %s
-                """,
-                ctx.author.id,
-                ctx.guild.id,
-            )
+            await self.bot.cache.remove_notifications(ctx.author.id, ctx.guild.id)
             await util.send_success(
                 ctx, "Cleared all of your notifications in this server!"
             )
 
-        # remake notification cache
-        await self.create_cache()
-
     @notification.command(name="test")
     async def notification_test(
         self, ctx: commands.Context, message: Optional[discord.Message] = None
@@ -21,6 +21,37 @@ class Owner(commands.Cog):
         self.bot: MisoBot = bot
         self.icon = "👑"
 
+    async def cog_load(self):
+        self.bot.ipc.handle("guilds", self.local_guilds)
+
+    async def cog_unload(self):
+        self.bot.ipc.remove_handler("guilds")
+
+    async def local_guilds(
+        self, search_term: str | None = None, user_id: int | None = None
+    ) -> list[tuple[int, int, str]]:
+        """(id, member count, name) of the guilds of this cluster that match."""
+        return [
+            (guild.id, guild.member_count or 0, guild.name)
+            for guild in self.bot.guilds
+            if (search_term is None or search_term.lower() in guild.name.lower())
+            and (user_id is None or guild.get_member(user_id) is not None)
+        ]
+
+    async def guild_rows(self, **filters) -> list[str]:
+        """Matching guilds of every cluster, the biggest first."""
+        guilds = [
+            guild
+            for cluster_guilds in await self.bot.ipc.gather("guilds", **filters)
+            for guild in cluster_guilds
+        ]
+        return [
+            f"[`{guild_id}`] **{member_count}** members : **{name}**"
+            for guild_id, member_count, name in sorted(
+                guilds, key=lambda guild: guild[1], reverse=True
+            )
+        ]
+
     async def cog_check(self, ctx: commands.Context) -> bool:
         """Check if command author is Owner"""
         am_i = await self.bot.is_owner(ctx.author)
@@ -65,28 +96,18 @@ class Owner(commands.Cog):
     @commands.command()
     async def guilds(self, ctx: commands.Context):
         """Show all connected guilds"""
+        guild_count, member_count = await self.bot.cluster_counts()
         content = discord.Embed(
-            title=f"Total **{self.bot.guild_count}** guilds, **{self.bot.member_count}** members"
+            title=f"Total **{guild_count}** guilds, **{member_count}** members"
         )
 
-        rows = [
-            f"[`{guild.id}`] **{guild.member_count}** members : **{guild.name}**"
-            for guild in sorted(
-                self.bot.guilds, key=lambda x: x.member_count or 0, reverse=True
-            )
-        ]
+        rows = await self.guild_rows()
         await RowPaginator(content, rows).run(ctx)
 
     @commands.command()
     async def findguild(self, ctx: commands.Context, *, search_term):
         """Find a guild by name"""
-        rows = [
-            f"[`{guild.id}`] **{guild.member_count}** members : **{guild.name}**"
-            for guild in sorted(
-                self.bot.guilds, key=lambda x: x.member_count or 0, reverse=True
-            )
-            if search_term.lower() in guild.name.lower()
-        ]
+        rows = await self.guild_rows(search_term=search_term)
         content = discord.Embed(
             title=f"Found **{len(rows)}** guilds matching search term"
         )
@@ -95,18 +116,11 @@ class Owner(commands.Cog):
     @commands.command()
     async def userguilds(self, ctx: commands.Context, user: discord.User):
         """Get all guilds user is part of"""
-        rows = []
-        for guild in sorted(
-            self.bot.guilds, key=lambda x: x.member_count or 0, reverse=True
-        ):
-            guildmember = guild.get_member(user.id)
-            if guildmember is not None:
-                rows.append(
-                    f"[`{guild.id}`] **{guild.member_count}** members : **{guild.name}**"
-                )
-
+        rows = await self.guild_rows(user_id=user.id)
         if not rows:
-            exceptions.CommandWarning("User not found in any currently loaded guilds!")
+            raise exceptions.CommandWarning(
+                "User not found in any currently loaded guilds!"
+            )
 
         content = discord.Embed(
             title=f"User **{user}** found in **{len(rows)}** guilds"
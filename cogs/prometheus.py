@@ -5,8 +5,10 @@
 import statistics
 
 from discord.ext import commands, tasks
-from prometheus_client import Counter, Gauge
+from prometheus_client import Counter, Gauge, Histogram
 
+from modules import colorpool
+from modules.lastfm import Priority
 from modules.misobot import MisoBot
 
 
@@ -15,6 +17,8 @@ class Prometheus(commands.Cog):
 
     def __init__(self, bot):
         self.bot: MisoBot = bot
+        # multiprocess_mode is how the gauges of every cluster are combined,
+        # the median member count can't be so it's kept per process
         self.event_counter = Counter(
             "miso_gateway_events_total",
             "Total number of gateway events.",
@@ -29,33 +33,77 @@ class Prometheus(commands.Cog):
             "miso_shard_latency",
             "Latency of a shard in seconds.",
             ["shard"],
+            multiprocess_mode="livesum",
+        )
+        self.ping = Gauge(
+            "miso_ping",
+            "Bot's average latency.",
+            multiprocess_mode="livemax",
         )
-        self.ping = Gauge("miso_ping", "Bot's average latency.")
         self.guilds_total = Gauge(
             "miso_guilds_total",
             "Total amount of guilds.",
+            multiprocess_mode="livesum",
         )
         self.guilds_cached = Gauge(
             "miso_guilds_cached",
             "Total amount of guilds cached.",
+            multiprocess_mode="livesum",
         )
         self.users_total = Gauge(
             "miso_users_total",
             "Sum of all guilds' member counts",
+            multiprocess_mode="livesum",
         )
         self.users_cached = Gauge(
             "miso_users_cached",
             "Total amount of users cached",
+            multiprocess_mode="livesum",
         )
         self.median_member_count = Gauge(
             "miso_median_member_count",
             "Median guild size.",
+            multiprocess_mode="liveall",
         )
         self.outgoing_requests = Counter(
             "miso_outgoing_requests",
             "Aiohttp clientsession total requests per domain.",
             ["host", "status_code"],
         )
+        self.lastfm_cache_lookups = Counter(
+            "miso_lastfm_cache_lookups",
+            "Last.fm api response and scraped page cache lookups.",
+            ["method", "result"],
+        )
+        self.lastfm_queue_depth = Gauge(
+            "miso_lastfm_queue_depth",
+            "Last.fm api requests waiting for the rate limiter.",
+            ["priority"],
+            multiprocess_mode="livesum",
+        )
+        self.lastfm_queue_wait = Histogram(
+            "miso_lastfm_queue_wait_seconds",
+            "Time Last.fm api requests spent waiting for the rate limiter.",
+            ["priority"],
+            buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60),
+        )
+        self.color_extraction_jobs = Gauge(
+            "miso_color_extraction_jobs",
+            "Color extraction jobs waiting for or running in the process pool.",
+            ["state"],
+            multiprocess_mode="livesum",
+        )
+        self.render_jobs = Gauge(
+            "miso_render_jobs",
+            "Html render requests waiting for or running in the rendering server.",
+            ["state"],
+            multiprocess_mode="livesum",
+        )
+        self.render_queue_wait = Histogram(
+            "miso_render_queue_wait_seconds",
+            "Time html render requests spent waiting for a free renderer.",
+            buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60),
+        )
 
     async def cog_load(self):
         self.log_shard_latencies.start()
@@ -75,6 +123,17 @@ class Prometheus(commands.Cog):
         for shard in self.bot.shards.values():
             self.shard_latency_summary.labels(shard.id).set(shard.latency)
 
+        if lastfm := self.bot.get_cog("LastFm"):
+            for priority in Priority:
+                self.lastfm_queue_depth.labels(priority.name.lower()).set(
+                    lastfm.api.limiter.queue_depth(priority)  # type: ignore
+                )
+
+        self.color_extraction_jobs.labels("waiting").set(colorpool.pool.waiting)
+        self.color_extraction_jobs.labels("running").set(colorpool.pool.running)
+        self.render_jobs.labels("waiting").set(self.bot.renderer.waiting)
+        self.render_jobs.labels("running").set(self.bot.renderer.running)
+
     @tasks.loop(minutes=1)
     async def log_member_data(self):
         guilds_total = len(self.bot.guilds)
@@ -351,10 +351,7 @@ class Roles(commands.Cog):
         self, ctx: commands.Context, channel: discord.TextChannel
     ):
         """Set the channel you want to add and remove roles in"""
-        await queries.update_setting(
-            ctx, "rolepicker_settings", "channel_id", channel.id
-        )
-        self.bot.cache.rolepickers.add(channel.id)
+        await self.bot.cache.set_rolepicker_channel(ctx.guild.id, channel.id)
         await util.send_success(
             ctx,
             f"Rolepicker channel set to {channel.mention}\n"
@@ -405,7 +402,7 @@ class Roles(commands.Cog):
         if message.guild is None or not isinstance(message.author, discord.Member):
             return
 
-        if message.channel.id not in self.bot.cache.rolepickers:
+        if self.bot.cache.rolepickers.get(message.guild.id) != message.channel.id:
             return
 
         is_enabled = await self.bot.db.fetch_value(
@@ -720,13 +720,7 @@ class User(commands.Cog):
                 )
 
         if (user.id, ctx.author.id) in self.proposals:
-            await self.bot.db.execute(
-                "INSERT INTO marriage VALUES (%s, %s, %s)",
-                user.id,
-                ctx.author.id,
-                arrow.now().datetime,
-            )
-            self.bot.cache.marriages.append({user.id, ctx.author.id})
+            await self.bot.cache.marry(user.id, ctx.author.id, arrow.now().datetime)
             await ctx.send(
                 embed=discord.Embed(
                     color=int("dd2e44", 16),
@@ -756,10 +750,8 @@ class User(commands.Cog):
             raise exceptions.CommandError("Unable to get current guild")
 
         partner = None
-        to_remove = []
         for el in self.bot.cache.marriages:
             if ctx.author.id in el:
-                to_remove.append(el)
                 pair = list(el)
                 if ctx.author.id == pair[0]:
                     partner = pair[1]
@@ -781,13 +773,7 @@ class User(commands.Cog):
         msg = await ctx.send(embed=content)
 
         async def confirm():
-            for x in to_remove:
-                self.bot.cache.marriages.remove(x)
-            await self.bot.db.execute(
-                "DELETE FROM marriage WHERE first_user_id = %s OR second_user_id = %s",
-                ctx.author.id,
-                ctx.author.id,
-            )
+            await self.bot.cache.divorce(ctx.author.id)
             await ctx.send(
                 embed=discord.Embed(
                     color=int("ffcc4d", 16),
@@ -95,6 +95,10 @@ class Utility(commands.Cog):
             if reminder_ts > now_ts:
                 continue
 
+            # the user is looked up from the cache of the cluster the guild is on
+            if not self.bot.owns_guild(guild_id):
+                continue
+
             user = self.bot.get_user(user_id)
             if user is not None:
                 guild = self.bot.get_guild(guild_id)
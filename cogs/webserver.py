@@ -9,6 +9,12 @@ from aiohttp import web
 from discord.ext import commands, tasks
 from loguru import logger
 from prometheus_async import aio
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    generate_latest,
+    multiprocess,
+)
 
 from modules.misobot import MisoBot
 
@@ -34,7 +40,7 @@ class WebServer(commands.Cog):
         self.app.router.add_get("/stats", self.website_statistics)
         self.app.router.add_get("/documentation", self.command_list)
         self.app.router.add_get("/donators", self.donator_list)
-        self.app.router.add_get("/metrics", aio.web.server_stats)
+        self.app.router.add_get("/metrics", self.metrics)
         self.app.router.add_post("/webhook", self.webhook)
 
     async def cog_load(self):
@@ -53,8 +59,7 @@ class WebServer(commands.Cog):
             await self.bot.db.fetch_value("SELECT SUM(uses) FROM command_usage") or 0
         )
         self.cached["commands"] = int(command_count)
-        self.cached["guilds"] = self.bot.guild_count
-        self.cached["users"] = self.bot.member_count
+        self.cached["guilds"], self.cached["users"] = await self.bot.cluster_counts()
         self.cached["donators"] = await self.update_donator_list()
 
     @cache_stats.before_loop
@@ -120,6 +125,19 @@ class WebServer(commands.Cog):
     async def donator_list(self, request):
         return web.json_response(self.cached["donators"])
 
+    @staticmethod
+    async def metrics(request):
+        if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+            return await aio.web.server_stats(request)
+
+        # combined from the files every cluster writes its metrics to
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return web.Response(
+            body=await asyncio.to_thread(generate_latest, registry),
+            headers={"Content-Type": CONTENT_TYPE_LATEST},
+        )
+
     async def ping_handler(self, request):
         return web.Response(text=f"{self.bot.latency * 1000}")
 
@@ -16,6 +16,7 @@ from loguru import logger
 # dotenv has to be loaded before importing MisoBot
 load_dotenv()
 
+from modules.ipc import ClusterInfo  # noqa: E402
 from modules.misobot import MisoBot  # noqa: E402
 
 
@@ -80,15 +81,26 @@ infrastructure_extensions = [
 ]
 
 
-def main():
+def use_discord_proxy():
     if "DISCORD_PROXY" in os.environ:
         discord.http.Route.BASE = (
             f"{os.environ['DISCORD_PROXY']}/api/v{discord.http.INTERNAL_API_VERSION}"
         )
 
+
+def main(cluster: ClusterInfo | None = None):
+    use_discord_proxy()
+
+    # the web server binds a port, so only one cluster can run it
+    if developer_mode or (cluster is not None and not cluster.is_primary):
+        extensions_to_load = extensions
+    else:
+        extensions_to_load = extensions + infrastructure_extensions
+
     bot: MisoBot = MisoBot(
-        extensions=extensions + ([] if developer_mode else infrastructure_extensions),
+        extensions=extensions_to_load,
         default_prefix=prefix,
+        cluster=cluster,
     )
     if developer_mode:
         bot.debug = True
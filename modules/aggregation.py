@@ -0,0 +1,204 @@
+# SPDX-FileCopyrightText: 2018-2025 Joonas Rautiola <mail@joinemm.dev>
+# SPDX-License-Identifier: MPL-2.0
+# https://git.joinemm.dev/miso-bot
+
+import heapq
+from array import array
+from typing import Any, Hashable, Literal
+
+from modules.lastfm import Period
+from modules.lru import LRUCache
+
+AggregateKind = Literal["artist", "album", "track"]
+
+
+def playcount_mapped(
+    x: int,
+    input_start: int,
+    input_end: int,
+    output_start: int = 1,
+    output_end: int = 100,
+):
+    # if everything has the same playcount, give max points
+    # or else we will run into ZeroDivisionError
+    if input_start == input_end:
+        return output_end
+
+    score = (x - input_start) / (input_end - input_start) * (
+        output_end - output_start
+    ) + output_start
+
+    return score
+
+
+def parse_top_items(kind: AggregateKind, data: dict) -> list[tuple[Hashable, int, Any]]:
+    """(key, playcount, extra) of every entity in a user.getTop* response.
+
+    Artists are keyed by name, albums and tracks by (artist name, name).
+    Extra is the album image or track url, used for displaying the results.
+    """
+    items = []
+    for entity in data[kind]:
+        playcount = int(entity["playcount"])
+        match kind:
+            case "artist":
+                items.append((entity["name"], playcount, None))
+            case "album":
+                items.append(
+                    (
+                        (entity["artist"]["name"], entity["name"]),
+                        playcount,
+                        entity["image"][0]["#text"],
+                    )
+                )
+            case "track":
+                items.append(
+                    (
+                        (entity["artist"]["name"], entity["name"]),
+                        playcount,
+                        entity["url"],
+                    )
+                )
+    return items
+
+
+class ServerAggregate:
+    """Combined top list of one guild, period and entity kind.
+
+    Every distinct entity gets an index into flat score and playcount arrays.
+    Each member's contribution is remembered as arrays of those indices,
+    so a single member can be replaced without recomputing the others.
+    """
+
+    def __init__(self):
+        self.index: dict[Hashable, int] = {}
+        self.keys: list[Hashable] = []
+        self.extra: list[Any] = []
+        self.scores = array("d")
+        self.playcounts = array("q")
+        self.listeners = array("l")
+        # lastfm username -> (entity indices, scores, playcounts)
+        self.members: dict[str, tuple[array, array, array]] = {}
+        self.missing = 0
+
+    @property
+    def contributors(self) -> int:
+        return len(self.members)
+
+    def entity_index(self, key: Hashable, extra: Any) -> int:
+        i = self.index.get(key)
+        if i is None:
+            i = len(self.keys)
+            self.index[key] = i
+            self.keys.append(key)
+            self.extra.append(extra)
+            self.scores.append(0.0)
+            self.playcounts.append(0)
+            self.listeners.append(0)
+        elif self.extra[i] is None:
+            self.extra[i] = extra
+
+        return i
+
+    def update_member(self, username: str, items: list[tuple[Hashable, int, Any]]):
+        """Replace the contribution of one member with their new top list.
+        The items must be ordered by playcount, highest first."""
+        self.remove_member(username)
+        if not items:
+            return
+
+        lowest_playcount = items[-1][1]
+        highest_playcount = items[0][1]
+        indices = array("l")
+        scores = array("d")
+        playcounts = array("q")
+        for key, playcount, extra in items:
+            i = self.entity_index(key, extra)
+            score = playcount_mapped(
+                playcount,
+                input_start=lowest_playcount,
+                input_end=highest_playcount,
+            )
+            self.scores[i] += score
+            self.playcounts[i] += playcount
+            self.listeners[i] += 1
+            indices.append(i)
+            scores.append(score)
+            playcounts.append(playcount)
+
+        self.members[username.casefold()] = (indices, scores, playcounts)
+
+    def remove_member(self, username: str):
+        contribution = self.members.pop(username.casefold(), None)
+        if contribution is None:
+            return
+
+        for i, score, playcount in zip(*contribution):
+            self.scores[i] -= score
+            self.playcounts[i] -= playcount
+            self.listeners[i] -= 1
+
+    def top(
+        self, amount: int, by: Literal["score", "playcount"] = "score"
+    ) -> list[tuple[Hashable, float, int, Any]]:
+        """(key, score, playcount, extra) of the highest ranking entities."""
+        values = self.scores if by == "score" else self.playcounts
+        best = heapq.nlargest(
+            amount,
+            (i for i in range(len(self.keys)) if self.listeners[i] > 0),
+            key=values.__getitem__,
+        )
+        return [
+            (self.keys[i], self.scores[i], self.playcounts[i], self.extra[i])
+            for i in best
+        ]
+
+
+class AggregationEngine:
+    """Cache of server aggregates, shared by the server top lists and charts.
+
+    Aggregates expire after `TTL` seconds, but while cached they are kept fresh
+    by feeding them any new top list of a member seen elsewhere in the bot.
+    Ones missing members whose fetch failed expire after `PARTIAL_TTL` instead.
+    """
+
+    TTL = 600
+    PARTIAL_TTL = 30
+
+    def __init__(self, maxsize: int = 256):
+        self.cache = LRUCache(maxsize)
+
+    def get(
+        self, guild_id: int, period: Period, kind: AggregateKind
+    ) -> ServerAggregate | None:
+        return self.cache.get((guild_id, period, kind))
+
+    def set(
+        self,
+        guild_id: int,
+        period: Period,
+        kind: AggregateKind,
+        aggregate: ServerAggregate,
+        partial: bool = False,
+    ):
+        ttl = self.PARTIAL_TTL if partial else self.TTL
+        self.cache.set((guild_id, period, kind), aggregate, ttl)
+
+    def update_member(
+        self,
+        username: str,
+        period: Period,
+        kind: AggregateKind,
+        items: list[tuple[Hashable, int, Any]],
+    ):
+        """Apply a member's new top list to every cached aggregate they are part of."""
+        username = username.casefold()
+        for (_, cached_period, cached_kind), (_, aggregate) in list(
+            self.cache.data.items()
+        ):
+            if (
+                cached_period == period
+                and cached_kind == kind
+                and username in aggregate.members
+            ):
+                aggregate.update_member(username, items)
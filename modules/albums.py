@@ -0,0 +1,121 @@
+# SPDX-FileCopyrightText: 2018-2025 Joonas Rautiola <mail@joinemm.dev>
+# SPDX-License-Identifier: MPL-2.0
+# https://git.joinemm.dev/miso-bot
+
+from dataclasses import dataclass
+
+import aiohttp
+import arrow
+from loguru import logger
+
+from modules.lastfm import LastFmApi
+from modules.misobot import MisoBot
+
+
+@dataclass
+class AlbumMetadata:
+    release_date: arrow.Arrow | None
+    length: str | None
+    image_hash: str | None = None
+    color: int | None = None
+
+
+class AlbumMetadataStore:
+    """Album metadata scraped from Last.fm, kept in the database.
+
+    Albums are scraped the first time they are seen. After that the stored row
+    is always used as is, and rows older than `LIFETIME_DAYS` are re-scraped
+    in the background, by the cluster that saw them. At most `MAX_STALE` are
+    remembered at once, the rest wait until they are seen again.
+    """
+
+    LIFETIME_DAYS = 30
+    REFRESH_BATCH = 20
+    MAX_STALE = 1000
+
+    def __init__(self, bot: MisoBot, api: LastFmApi):
+        self.bot = bot
+        self.api = api
+        self.stale: set[tuple[str, str]] = set()
+
+    async def get(self, artist_name: str, album_name: str) -> AlbumMetadata | None:
+        if not album_name:
+            return None
+
+        row = await self.bot.db.fetch_row(
+            """
+            SELECT release_date, length, image_hash, hex, scrape_date
+            FROM album_metadata
+            WHERE artist_name = %s AND album_name = %s
+            """,
+            artist_name,
+            album_name,
+        )
+        if not row:
+            try:
+                return await self.scrape(artist_name, album_name)
+            except aiohttp.ClientError as e:
+                logger.error(f"Error fetching metadata: {e}")
+                return None
+
+        release_date, length, image_hash, hex_color, scrape_date = row
+        outdated = arrow.utcnow().shift(days=-self.LIFETIME_DAYS)
+        if arrow.get(scrape_date) < outdated and len(self.stale) < self.MAX_STALE:
+            self.stale.add((artist_name, album_name))
+
+        return AlbumMetadata(
+            arrow.get(release_date) if release_date else None,
+            length,
+            image_hash,
+            int(hex_color, 16) if hex_color else None,
+        )
+
+    async def scrape(self, artist_name: str, album_name: str) -> AlbumMetadata:
+        scraped = await self.api.scrape_album_metadata(artist_name, album_name)
+        metadata = AlbumMetadata(
+            scraped["release_date"] if scraped else None,
+            scraped["length"] if scraped else None,
+        )
+        # albums without metadata are stored too, so they are not scraped every time
+        await self.bot.db.execute(
+            """
+            INSERT INTO album_metadata
+                (artist_name, album_name, release_date, length, scrape_date)
+                VALUES (%s, %s, %s, %s, UTC_TIMESTAMP())
+            ON DUPLICATE KEY UPDATE
+                release_date = VALUES(release_date),
+                length = VALUES(length),
+                scrape_date = VALUES(scrape_date)
+            """,
+            artist_name,
+            album_name,
+            metadata.release_date.date() if metadata.release_date else None,
+            metadata.length,
+        )
+        return metadata
+
+    async def set_cover(
+        self, artist_name: str, album_name: str, image_hash: str, color: int | None
+    ):
+        """Remember the cover art of the album and its dominant color."""
+        await self.bot.db.execute(
+            """
+            UPDATE album_metadata SET image_hash = %s, hex = %s
+            WHERE artist_name = %s AND album_name = %s
+            """,
+            image_hash,
+            f"{color:06x}" if color is not None else None,
+            artist_name,
+            album_name,
+        )
+
+    async def refresh_stale(self):
+        """Re-scrape some of the outdated albums seen since the last refresh."""
+        for _ in range(min(self.REFRESH_BATCH, len(self.stale))):
+            artist_name, album_name = self.stale.pop()
+            try:
+                await self.scrape(artist_name, album_name)
+            except aiohttp.ClientError as e:
+                logger.warning(
+                    f"Could not refresh metadata of {artist_name} - {album_name}: {e}"
+                )
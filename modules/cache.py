@@ -2,178 +2,676 @@
 # SPDX-License-Identifier: MPL-2.0
 # https://git.joinemm.dev/miso-bot
 
-from typing import TYPE_CHECKING
+import asyncio
+import uuid
+import weakref
+from dataclasses import dataclass, field
+from datetime import datetime
+from time import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, NamedTuple
 
+import orjson
 from loguru import logger
 
 if TYPE_CHECKING:
     from modules.misobot import MisoBot
 
 
+class StarboardSettings(NamedTuple):
+    is_enabled: bool
+    channel_id: int | None
+    reaction_count: int
+    emoji_name: str | None
+    emoji_id: int | None
+    emoji_type: str
+    log_channel_id: int | None
+
+
+class LoggingSettings(NamedTuple):
+    member_log_channel_id: int | None
+    ban_log_channel_id: int | None
+    message_log_channel_id: int | None
+
+
+class MediaAutoEmbed(NamedTuple):
+    instagram: bool
+    twitter: bool
+    tiktok: bool
+    reddit: bool
+
+
+@dataclass(slots=True)
+class GuildBlacklist:
+    members: set[int] = field(default_factory=set)
+    commands: set[str] = field(default_factory=set)
+
+
+INVALIDATION_CHANNEL = "miso:cache-invalidation"
+
+
 class Cache:
+    """Guild settings kept in memory.
+
+    Settings needed for most messages are loaded at startup, the rest
+    (starboard settings and autoroles) per guild when they are first needed.
+    After that, settings are changed through the methods here, which write
+    to the database and then update the cached entry of that guild only.
+
+    Every change is also published as `[instance, table, key]` to the other
+    instances sharing the database, which reload that key from the database.
+    """
+
+    RESUBSCRIBE_DELAY = 5
+
     def __init__(self, bot):
         self.bot: MisoBot = bot
         self.log_emoji = False
-        self.prefixes = {}
-        self.rolepickers = set()
-        self.autoresponse = {}
-        self.blacklist = {}
-        self.logging_settings = {}
-        self.autoroles = {}
-        self.marriages = []
-        self.starboard_settings = {}
-        self.starboard_blacklisted_channels = set()
-        self.media_auto_embed = {}
-
-    async def cache_starboard_settings(self):
-        data = await self.bot.db.fetch(
+        self.prefixes: dict[int, str] = {}
+        # guild id -> rolepicker channel id
+        self.rolepickers: dict[int, int] = {}
+        self.autoresponse: dict[int, bool] = {}
+        self.blacklisted_users: set[int] = set()
+        self.blacklisted_guilds: set[int] = set()
+        self.blacklisted_channels: set[int] = set()
+        self.guild_blacklists: dict[int, GuildBlacklist] = {}
+        self.logging_settings: dict[int, LoggingSettings] = {}
+        # loaded lazily, a guild missing from these has not been looked up yet
+        self.autoroles: dict[int, set[int]] = {}
+        self.starboard_settings: dict[int, StarboardSettings | None] = {}
+        self.marriages: list[set[int]] = []
+        # guild id -> keyword -> ids of the users notified of it
+        self.notifications: dict[int, dict[str, set[int]]] = {}
+        self.starboard_blacklisted_channels: set[int] = set()
+        self.media_auto_embed: dict[int, MediaAutoEmbed] = {}
+        # only the locks someone is holding or waiting for are kept
+        self.locks: weakref.WeakValueDictionary[tuple[str, int], asyncio.Lock] = (
+            weakref.WeakValueDictionary()
+        )
+        self.instance_id = uuid.uuid4().hex[:12]
+        self.listener: asyncio.Task | None = None
+        # table -> how to reload a single key of it
+        self.reloaders: dict[str, Callable[[int], Awaitable[None]]] = {
+            "guild_prefix": self.reload_prefix,
+            "guild_settings": self.reload_autoresponses,
+            "logging_settings": self.load_logging_settings,
+            "starboard_settings": self.forget_starboard_settings,
+            "media_auto_embed_enabled": self.load_auto_embedders,
+            "autorole": self.forget_autoroles,
+            "rolepicker_settings": self.reload_rolepicker,
+            "marriage": self.reload_marriage,
+            "notification": self.reload_notifications,
+            "blacklisted_member": self.reload_blacklisted_members,
+            "blacklisted_command": self.reload_blacklisted_commands,
+            "starboard_blacklist": self.membership_reloader(
+                "starboard_blacklisted_channels", "starboard_blacklist", "channel_id"
+            ),
+            "blacklisted_channel": self.membership_reloader(
+                "blacklisted_channels", "blacklisted_channel", "channel_id"
+            ),
+            "blacklisted_user": self.membership_reloader(
+                "blacklisted_users", "blacklisted_user", "user_id"
+            ),
+            "blacklisted_guild": self.membership_reloader(
+                "blacklisted_guilds", "blacklisted_guild", "guild_id"
+            ),
+        }
+
+    def lock(self, table: str, guild_id: int) -> asyncio.Lock:
+        """Serializes the writes and reloads of a single settings row."""
+        lock = self.locks.get((table, guild_id))
+        if lock is None:
+            lock = self.locks[(table, guild_id)] = asyncio.Lock()
+        return lock
+
+    async def update_row(self, table: str, guild_id: int, values: dict[str, Any]):
+        """Upsert the given columns of a guild's settings row."""
+        columns = ", ".join(values)
+        placeholders = ", ".join(["%s"] * len(values))
+        updates = ", ".join(f"{column} = VALUES({column})" for column in values)
+        await self.bot.db.execute(
+            f"""
+            INSERT INTO {table} (guild_id, {columns})
+                VALUES (%s, {placeholders})
+            ON DUPLICATE KEY UPDATE
+                {updates}
+            """,
+            guild_id,
+            *values.values(),
+        )
+
+    # loaders, for every guild at startup or for one guild after it changes
+
+    async def load_starboard_settings(self, guild_id: int):
+        row = await self.bot.db.fetch_row(
             """
-            SELECT guild_id, is_enabled, channel_id, reaction_count,
+            SELECT is_enabled, channel_id, reaction_count,
                 emoji_name, emoji_id, emoji_type, log_channel_id
             FROM starboard_settings
+            WHERE guild_id = %s
+            """,
+            guild_id,
+        )
+        self.starboard_settings[guild_id] = StarboardSettings(*row) if row else None
+
+    async def get_starboard_settings(self, guild_id: int) -> StarboardSettings | None:
+        if guild_id not in self.starboard_settings:
+            async with self.lock("starboard_settings", guild_id):
+                if guild_id not in self.starboard_settings:
+                    await self.load_starboard_settings(guild_id)
+
+        return self.starboard_settings[guild_id]
+
+    async def load_logging_settings(self, guild_id: int | None = None):
+        data = await self.bot.db.fetch(
             """
+            SELECT guild_id, member_log_channel_id, ban_log_channel_id, message_log_channel_id
+            FROM logging_settings
+            WHERE %s IS NULL OR guild_id = %s
+            """,
+            guild_id,
+            guild_id,
         )
-        if not data:
-            return
-        for (
+        if guild_id is not None:
+            self.logging_settings.pop(guild_id, None)
+        for row_guild_id, *settings in data or []:
+            self.logging_settings[row_guild_id] = LoggingSettings(*settings)
+
+    async def load_auto_embedders(self, guild_id: int | None = None):
+        data = await self.bot.db.fetch(
+            """
+            SELECT guild_id, instagram, twitter, tiktok, reddit
+            FROM media_auto_embed_enabled
+            WHERE %s IS NULL OR guild_id = %s
+            """,
             guild_id,
-            is_enabled,
-            channel_id,
-            reaction_count,
-            emoji_name,
-            emoji_id,
-            emoji_type,
-            log_channel_id,
-        ) in data:
-            self.starboard_settings[str(guild_id)] = [
-                is_enabled,
-                channel_id,
-                reaction_count,
-                emoji_name,
-                emoji_id,
-                emoji_type,
-                log_channel_id,
-            ]
+            guild_id,
+        )
+        if guild_id is not None:
+            self.media_auto_embed.pop(guild_id, None)
+        for row_guild_id, *settings in data or []:
+            self.media_auto_embed[row_guild_id] = MediaAutoEmbed(
+                *(bool(value) for value in settings)
+            )
+
+    async def get_autoroles(self, guild_id: int) -> set[int]:
+        if guild_id not in self.autoroles:
+            async with self.lock("autorole", guild_id):
+                if guild_id not in self.autoroles:
+                    self.autoroles[guild_id] = set(
+                        await self.bot.db.fetch_flattened(
+                            "SELECT role_id FROM autorole WHERE guild_id = %s",
+                            guild_id,
+                        )
+                    )
+
+        return self.autoroles[guild_id]
+
+    async def load_prefixes(self):
+        prefixes = await self.bot.db.fetch("SELECT guild_id, prefix FROM guild_prefix")
+        for guild_id, prefix in prefixes or []:
+            self.prefixes[guild_id] = prefix
+
+    async def load_rolepickers(self):
+        rolepickers = await self.bot.db.fetch(
+            "SELECT guild_id, channel_id FROM rolepicker_settings "
+            "WHERE channel_id IS NOT NULL"
+        )
+        for guild_id, channel_id in rolepickers or []:
+            self.rolepickers[guild_id] = channel_id
+
+    async def load_autoresponses(self):
+        guild_settings = await self.bot.db.fetch(
+            "SELECT guild_id, autoresponses FROM guild_settings"
+        )
+        for guild_id, autoresponses in guild_settings or []:
+            self.autoresponse[guild_id] = autoresponses
+
+    async def load_marriages(self):
+        pairs = await self.bot.db.fetch(
+            "SELECT first_user_id, second_user_id FROM marriage"
+        )
+        self.marriages = [set(pair) for pair in pairs] if pairs else []
 
+    async def load_notifications(self):
+        keywords = await self.bot.db.fetch(
+            "SELECT guild_id, user_id, keyword FROM notification"
+        )
+        self.notifications = {}
+        for guild_id, user_id, keyword in keywords or []:
+            self.cache_notification(guild_id, user_id, keyword)
+
+    async def load_starboard_blacklist(self):
         self.starboard_blacklisted_channels = set(
             await self.bot.db.fetch_flattened(
                 "SELECT channel_id FROM starboard_blacklist",
             )
         )
 
-    async def cache_logging_settings(self):
-        logging_settings = await self.bot.db.fetch(
-            """
-            SELECT guild_id, member_log_channel_id, ban_log_channel_id, message_log_channel_id
-            FROM logging_settings
-            """
+    async def load_global_blacklists(self):
+        users, guilds, channels = await asyncio.gather(
+            self.bot.db.fetch_flattened("SELECT user_id FROM blacklisted_user"),
+            self.bot.db.fetch_flattened("SELECT guild_id FROM blacklisted_guild"),
+            self.bot.db.fetch_flattened("SELECT channel_id FROM blacklisted_channel"),
         )
-        if logging_settings:
-            for (
-                guild_id,
-                member_log_channel_id,
-                ban_log_channel_id,
-                message_log_channel_id,
-            ) in logging_settings:
-                self.logging_settings[str(guild_id)] = {
-                    "member_log_channel_id": member_log_channel_id,
-                    "ban_log_channel_id": ban_log_channel_id,
-                    "message_log_channel_id": message_log_channel_id,
-                }
-
-    async def cache_autoroles(self):
-        data = await self.bot.db.fetch("SELECT guild_id, role_id FROM autorole")
-        if data:
-            for guild_id, role_id in data:
-                try:
-                    self.autoroles[str(guild_id)].add(role_id)
-                except KeyError:
-                    self.autoroles[str(guild_id)] = {role_id}
-
-    async def cache_auto_embedders(self):
-        media_embed_settings = await self.bot.db.fetch(
-            "SELECT guild_id, instagram, twitter, tiktok, reddit FROM media_auto_embed_enabled"
-        )
-        if media_embed_settings:
-            for guild_id, instagram, twitter, tiktok, reddit in media_embed_settings:
-                self.media_auto_embed[str(guild_id)] = {
-                    "instagram": instagram,
-                    "twitter": twitter,
-                    "tiktok": tiktok,
-                    "reddit": reddit,
-                }
+        self.blacklisted_users = set(users)
+        self.blacklisted_guilds = set(guilds)
+        self.blacklisted_channels = set(channels)
+
+    async def load_guild_blacklists(self):
+        blacklisted_members, blacklisted_commands = await asyncio.gather(
+            self.bot.db.fetch("SELECT guild_id, user_id FROM blacklisted_member"),
+            self.bot.db.fetch("SELECT guild_id, command_name FROM blacklisted_command"),
+        )
+        for guild_id, user_id in blacklisted_members or []:
+            self.guild_blacklist(guild_id).members.add(user_id)
+        for guild_id, command_name in blacklisted_commands or []:
+            self.guild_blacklist(guild_id).commands.add(command_name.lower())
 
     async def initialize_settings_cache(self):
+        """Run every loader concurrently, logging how long each one took."""
         logger.info("Caching settings...")
-        prefixes = await self.bot.db.fetch("SELECT guild_id, prefix FROM guild_prefix")
-        if prefixes:
-            for guild_id, prefix in prefixes:
-                self.prefixes[str(guild_id)] = prefix
+        loaders = {
+            "prefixes": self.load_prefixes,
+            "rolepickers": self.load_rolepickers,
+            "autoresponses": self.load_autoresponses,
+            "marriages": self.load_marriages,
+            "notifications": self.load_notifications,
+            "starboard blacklist": self.load_starboard_blacklist,
+            "global blacklists": self.load_global_blacklists,
+            "guild blacklists": self.load_guild_blacklists,
+            "logging settings": self.load_logging_settings,
+            "auto embedders": self.load_auto_embedders,
+        }
 
-        self.rolepickers = set(
-            await self.bot.db.fetch_flattened(
-                "SELECT channel_id FROM rolepicker_settings"
+        async def timed(loader) -> float:
+            start = time()
+            await loader()
+            return time() - start
+
+        start = time()
+        durations = await asyncio.gather(
+            *(timed(loader) for loader in loaders.values())
+        )
+        breakdown = ", ".join(
+            f"{name} {duration:.2f}s"
+            for name, duration in sorted(
+                zip(loaders, durations), key=lambda item: item[1], reverse=True
             )
         )
+        logger.info(f"Cached settings in {time() - start:.2f}s ({breakdown})")
 
-        guild_settings = await self.bot.db.fetch(
-            "SELECT guild_id, autoresponses FROM guild_settings"
+    # write-through setters
+
+    async def set_prefix(self, guild_id: int, prefix: str):
+        async with self.lock("guild_prefix", guild_id):
+            await self.update_row("guild_prefix", guild_id, {"prefix": prefix})
+            self.prefixes[guild_id] = prefix
+            await self.invalidate("guild_prefix", guild_id)
+
+    async def set_rolepicker_channel(self, guild_id: int, channel_id: int):
+        async with self.lock("rolepicker_settings", guild_id):
+            await self.update_row(
+                "rolepicker_settings", guild_id, {"channel_id": channel_id}
+            )
+            self.rolepickers[guild_id] = channel_id
+            await self.invalidate("rolepicker_settings", guild_id)
+
+    async def set_autoresponses(self, guild_id: int, enabled: bool):
+        async with self.lock("guild_settings", guild_id):
+            await self.update_row(
+                "guild_settings", guild_id, {"autoresponses": enabled}
+            )
+            self.autoresponse[guild_id] = enabled
+            await self.invalidate("guild_settings", guild_id)
+
+    async def update_logging_settings(self, guild_id: int, **values):
+        async with self.lock("logging_settings", guild_id):
+            await self.update_row("logging_settings", guild_id, values)
+            await self.load_logging_settings(guild_id)
+            await self.invalidate("logging_settings", guild_id)
+
+    async def update_starboard_settings(self, guild_id: int, **values):
+        async with self.lock("starboard_settings", guild_id):
+            await self.update_row("starboard_settings", guild_id, values)
+            await self.load_starboard_settings(guild_id)
+            await self.invalidate("starboard_settings", guild_id)
+
+    async def toggle_auto_embedder(self, guild_id: int, provider: str) -> bool:
+        """Flip the provider's auto embedding on or off, returning the new state."""
+        async with self.lock("media_auto_embed_enabled", guild_id):
+            current = self.media_auto_embed.get(guild_id)
+            enabled = not (current is not None and getattr(current, provider))
+            await self.update_row(
+                "media_auto_embed_enabled", guild_id, {provider: enabled}
+            )
+            await self.load_auto_embedders(guild_id)
+            await self.invalidate("media_auto_embed_enabled", guild_id)
+            return enabled
+
+    async def blacklist_starboard_channel(self, guild_id: int, channel_id: int):
+        await self.bot.db.execute(
+            "INSERT IGNORE starboard_blacklist (guild_id, channel_id) VALUES (%s, %s)",
+            guild_id,
+            channel_id,
         )
-        if guild_settings:
-            for guild_id, autoresponses in guild_settings:
-                self.autoresponse[str(guild_id)] = autoresponses
+        self.starboard_blacklisted_channels.add(channel_id)
+        await self.invalidate("starboard_blacklist", channel_id)
 
-        self.blacklist = {
-            "global": {
-                "user": set(
-                    await self.bot.db.fetch_flattened(
-                        "SELECT user_id FROM blacklisted_user"
-                    )
-                ),
-                "guild": set(
-                    await self.bot.db.fetch_flattened(
-                        "SELECT guild_id FROM blacklisted_guild"
-                    )
-                ),
-                "channel": set(
-                    await self.bot.db.fetch_flattened(
-                        "SELECT channel_id FROM blacklisted_channel"
-                    )
-                ),
-            }
-        }
+    async def unblacklist_starboard_channel(self, guild_id: int, channel_id: int):
+        await self.bot.db.execute(
+            "DELETE FROM starboard_blacklist WHERE guild_id = %s AND channel_id = %s",
+            guild_id,
+            channel_id,
+        )
+        self.starboard_blacklisted_channels.discard(channel_id)
+        await self.invalidate("starboard_blacklist", channel_id)
 
-        pairs = await self.bot.db.fetch(
-            "SELECT first_user_id, second_user_id FROM marriage"
+    async def add_autorole(self, guild_id: int, role_id: int):
+        await self.bot.db.execute(
+            "INSERT IGNORE autorole (guild_id, role_id) VALUES (%s, %s)",
+            guild_id,
+            role_id,
         )
-        self.marriages = [set(pair) for pair in pairs] if pairs else []
+        (await self.get_autoroles(guild_id)).add(role_id)
+        await self.invalidate("autorole", guild_id)
+
+    async def remove_autorole(self, guild_id: int, role_id: int):
+        await self.bot.db.execute(
+            "DELETE FROM autorole WHERE guild_id = %s AND role_id = %s",
+            guild_id,
+            role_id,
+        )
+        (await self.get_autoroles(guild_id)).discard(role_id)
+        await self.invalidate("autorole", guild_id)
+
+    async def marry(self, first_user_id: int, second_user_id: int, date: datetime):
+        await self.bot.db.execute(
+            "INSERT INTO marriage VALUES (%s, %s, %s)",
+            first_user_id,
+            second_user_id,
+            date,
+        )
+        self.marriages.append({first_user_id, second_user_id})
+        await self.invalidate("marriage", first_user_id)
+
+    async def divorce(self, user_id: int):
+        await self.bot.db.execute(
+            "DELETE FROM marriage WHERE first_user_id = %s OR second_user_id = %s",
+            user_id,
+            user_id,
+        )
+        self.marriages = [pair for pair in self.marriages if user_id not in pair]
+        await self.invalidate("marriage", user_id)
+
+    # keyword notifications
+
+    def cache_notification(self, guild_id: int, user_id: int, keyword: str):
+        self.notifications.setdefault(guild_id, {}).setdefault(keyword, set()).add(
+            user_id
+        )
+
+    def uncache_notifications(
+        self,
+        user_id: int,
+        guild_id: int | None = None,
+        keywords: set[str] | None = None,
+    ):
+        guild_ids = list(self.notifications) if guild_id is None else [guild_id]
+        for guild_id in guild_ids:
+            guild_keywords = self.notifications.get(guild_id, {})
+            for keyword, user_ids in list(guild_keywords.items()):
+                if keywords is None or keyword in keywords:
+                    user_ids.discard(user_id)
+                    if not user_ids:
+                        del guild_keywords[keyword]
+
+            if not guild_keywords:
+                self.notifications.pop(guild_id, None)
+
+    async def add_notification(self, guild_id: int, user_id: int, keyword: str):
+        await self.bot.db.execute(
+            "INSERT INTO notification (guild_id, user_id, keyword) VALUES (%s, %s, %s)",
+            guild_id,
+            user_id,
+            keyword,
+        )
+        self.cache_notification(guild_id, user_id, keyword)
+        await self.invalidate("notification", user_id)
+
+    async def remove_notifications(
+        self,
+        user_id: int,
+        guild_id: int | None = None,
+        keywords: set[str] | None = None,
+    ):
+        """Remove the user's notifications, in one guild or all of them,
+        for the given keywords or all of them."""
+        conditions = ["user_id = %s"]
+        params: list[Any] = [user_id]
+        if guild_id is not None:
+            conditions.append("guild_id = %s")
+            params.append(guild_id)
+        if keywords is not None:
+            conditions.append("keyword IN %s")
+            params.append(list(keywords))
+
+        await self.bot.db.execute(
+            f"DELETE FROM notification WHERE {' AND '.join(conditions)}", *params
+        )
+        self.uncache_notifications(user_id, guild_id, keywords)
+        await self.invalidate("notification", user_id)
+
+    # blacklists
+
+    def guild_blacklist(self, guild_id: int) -> GuildBlacklist:
+        return self.guild_blacklists.setdefault(guild_id, GuildBlacklist())
+
+    async def blacklist_channel(self, guild_id: int, channel_id: int):
+        await self.bot.db.execute(
+            "INSERT IGNORE blacklisted_channel (channel_id, guild_id) VALUES (%s, %s)",
+            channel_id,
+            guild_id,
+        )
+        self.blacklisted_channels.add(channel_id)
+        await self.invalidate("blacklisted_channel", channel_id)
+
+    async def unblacklist_channel(self, guild_id: int, channel_id: int):
+        await self.bot.db.execute(
+            "DELETE FROM blacklisted_channel WHERE guild_id = %s AND channel_id = %s",
+            guild_id,
+            channel_id,
+        )
+        self.blacklisted_channels.discard(channel_id)
+        await self.invalidate("blacklisted_channel", channel_id)
+
+    async def blacklist_member(self, guild_id: int, user_id: int):
+        await self.bot.db.execute(
+            "INSERT IGNORE blacklisted_member (user_id, guild_id) VALUES (%s, %s)",
+            user_id,
+            guild_id,
+        )
+        self.guild_blacklist(guild_id).members.add(user_id)
+        await self.invalidate("blacklisted_member", guild_id)
+
+    async def unblacklist_member(self, guild_id: int, user_id: int):
+        await self.bot.db.execute(
+            "DELETE FROM blacklisted_member WHERE guild_id = %s AND user_id = %s",
+            guild_id,
+            user_id,
+        )
+        self.guild_blacklist(guild_id).members.discard(user_id)
+        await self.invalidate("blacklisted_member", guild_id)
+
+    async def blacklist_command(self, guild_id: int, command_name: str):
+        await self.bot.db.execute(
+            "INSERT IGNORE blacklisted_command VALUES (%s, %s)",
+            command_name,
+            guild_id,
+        )
+        self.guild_blacklist(guild_id).commands.add(command_name.lower())
+        await self.invalidate("blacklisted_command", guild_id)
+
+    async def unblacklist_command(self, guild_id: int, command_name: str):
+        await self.bot.db.execute(
+            "DELETE FROM blacklisted_command WHERE guild_id = %s AND command_name = %s",
+            guild_id,
+            command_name,
+        )
+        self.guild_blacklist(guild_id).commands.discard(command_name.lower())
+        await self.invalidate("blacklisted_command", guild_id)
+
+    async def blacklist_user(self, user_id: int, reason: str):
+        await self.bot.db.execute(
+            "INSERT IGNORE blacklisted_user VALUES (%s, %s)", user_id, reason
+        )
+        self.blacklisted_users.add(user_id)
+        await self.invalidate("blacklisted_user", user_id)
+
+    async def unblacklist_user(self, user_id: int):
+        await self.bot.db.execute(
+            "DELETE FROM blacklisted_user WHERE user_id = %s", user_id
+        )
+        self.blacklisted_users.discard(user_id)
+        await self.invalidate("blacklisted_user", user_id)
+
+    async def blacklist_guild(self, guild_id: int, reason: str):
+        await self.bot.db.execute(
+            "INSERT IGNORE blacklisted_guild VALUES (%s, %s)", guild_id, reason
+        )
+        self.blacklisted_guilds.add(guild_id)
+        await self.invalidate("blacklisted_guild", guild_id)
+
+    async def unblacklist_guild(self, guild_id: int):
+        await self.bot.db.execute(
+            "DELETE FROM blacklisted_guild WHERE guild_id = %s", guild_id
+        )
+        self.blacklisted_guilds.discard(guild_id)
+        await self.invalidate("blacklisted_guild", guild_id)
+
+    # coherence between instances sharing the database
+
+    async def invalidate(self, table: str, key: int):
+        """Tell the other instances to reload this key of the table."""
+        await self.bot.redis.publish(
+            INVALIDATION_CHANNEL, orjson.dumps([self.instance_id, table, key])
+        )
+
+    def start_listening(self):
+        self.listener = asyncio.create_task(self.listen())
+
+    def stop_listening(self):
+        if self.listener is not None:
+            self.listener.cancel()
+
+    async def listen(self):
+        while True:
+            try:
+                async for message in self.bot.redis.subscribe(INVALIDATION_CHANNEL):
+                    await self.apply_invalidation(message)
+            except Exception as e:
+                logger.warning(f"Lost the cache invalidation channel: {e}")
+
+            await asyncio.sleep(self.RESUBSCRIBE_DELAY)
+
+    async def apply_invalidation(self, message: bytes):
+        try:
+            instance_id, table, key = orjson.loads(message)
+            reload = self.reloaders[table]
+        except (ValueError, TypeError, KeyError):
+            logger.warning(f"Ignoring malformed cache invalidation {message!r}")
+            return
+
+        if instance_id == self.instance_id:
+            return
+
+        try:
+            async with self.lock(table, key):
+                await reload(key)
+        except Exception as e:
+            logger.error(f"Could not reload {table} {key}: {e}")
+
+    async def reload_prefix(self, guild_id: int):
+        prefix = await self.bot.db.fetch_value(
+            "SELECT prefix FROM guild_prefix WHERE guild_id = %s", guild_id
+        )
+        if prefix is None:
+            self.prefixes.pop(guild_id, None)
+        else:
+            self.prefixes[guild_id] = prefix
+
+    async def reload_autoresponses(self, guild_id: int):
+        autoresponses = await self.bot.db.fetch_value(
+            "SELECT autoresponses FROM guild_settings WHERE guild_id = %s", guild_id
+        )
+        if autoresponses is None:
+            self.autoresponse.pop(guild_id, None)
+        else:
+            self.autoresponse[guild_id] = autoresponses
+
+    async def forget_starboard_settings(self, guild_id: int):
+        self.starboard_settings.pop(guild_id, None)
+
+    async def forget_autoroles(self, guild_id: int):
+        self.autoroles.pop(guild_id, None)
+
+    async def reload_rolepicker(self, guild_id: int):
+        channel_id = await self.bot.db.fetch_value(
+            "SELECT channel_id FROM rolepicker_settings WHERE guild_id = %s", guild_id
+        )
+        if channel_id is None:
+            self.rolepickers.pop(guild_id, None)
+        else:
+            self.rolepickers[guild_id] = channel_id
+
+    async def reload_marriage(self, user_id: int):
+        pair = set(
+            await self.bot.db.fetch_row(
+                "SELECT first_user_id, second_user_id FROM marriage "
+                "WHERE first_user_id = %s OR second_user_id = %s",
+                user_id,
+                user_id,
+            )
+        )
+        users = pair | {user_id}
+        self.marriages = [married for married in self.marriages if not married & users]
+        if pair:
+            self.marriages.append(pair)
+
+    async def reload_notifications(self, user_id: int):
+        keywords = await self.bot.db.fetch(
+            "SELECT guild_id, keyword FROM notification WHERE user_id = %s", user_id
+        )
+        self.uncache_notifications(user_id)
+        for guild_id, keyword in keywords or []:
+            self.cache_notification(guild_id, user_id, keyword)
+
+    async def reload_blacklisted_members(self, guild_id: int):
+        self.guild_blacklist(guild_id).members = set(
+            await self.bot.db.fetch_flattened(
+                "SELECT user_id FROM blacklisted_member WHERE guild_id = %s", guild_id
+            )
+        )
+
+    async def reload_blacklisted_commands(self, guild_id: int):
+        self.guild_blacklist(guild_id).commands = {
+            command_name.lower()
+            for command_name in await self.bot.db.fetch_flattened(
+                "SELECT command_name FROM blacklisted_command WHERE guild_id = %s",
+                guild_id,
+            )
+        }
+
+    def membership_reloader(self, attribute: str, table: str, column: str):
+        """Reloader that adds or removes a single id from one of the sets."""
+
+        async def reload(key: int):
+            exists = await self.bot.db.fetch_value(
+                f"SELECT 1 FROM {table} WHERE {column} = %s LIMIT 1", key
+            )
+            members: set[int] = getattr(self, attribute)
+            if exists:
+                members.add(key)
+            else:
+                members.discard(key)
 
-        blacklisted_members = await self.bot.db.fetch(
-            "SELECT guild_id, user_id FROM blacklisted_member"
-        )
-        if blacklisted_members:
-            for guild_id, user_id in blacklisted_members:
-                try:
-                    self.blacklist[str(guild_id)]["member"].add(user_id)
-                except KeyError:
-                    self.blacklist[str(guild_id)] = {
-                        "member": {user_id},
-                        "command": set(),
-                    }
-        blacklisted_commands = await self.bot.db.fetch(
-            "SELECT guild_id, command_name FROM blacklisted_command"
-        )
-        if blacklisted_commands:
-            for guild_id, command_name in blacklisted_commands:
-                try:
-                    self.blacklist[str(guild_id)]["command"].add(command_name.lower())
-                except KeyError:
-                    self.blacklist[str(guild_id)] = {
-                        "member": set(),
-                        "command": {command_name.lower()},
-                    }
-
-        await self.cache_starboard_settings()
-        await self.cache_logging_settings()
-        await self.cache_autoroles()
-        await self.cache_auto_embedders()
+        return reload
@@ -0,0 +1,297 @@
+# SPDX-FileCopyrightText: 2018-2025 Joonas Rautiola <mail@joinemm.dev>
+# SPDX-License-Identifier: MPL-2.0
+# https://git.joinemm.dev/miso-bot
+
+import asyncio
+import io
+import mmap
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from html.parser import HTMLParser
+from typing import TYPE_CHECKING
+
+from PIL import Image, ImageDraw, ImageFont, ImageOps, UnidentifiedImageError
+
+if TYPE_CHECKING:
+    from modules.covers import CoverCache
+
+WORKERS = int(os.environ.get("COLLAGE_WORKERS", 2))
+# covers downloaded at the same time for a single collage
+FETCH_CONCURRENCY = 16
+
+# the same measurements as html/static/fm_collage.css
+CANVAS_SIZE = 1440
+GAP = 15
+PADDING = 35
+TOPSTER_MARGIN = 25
+LINE_HEIGHT = 1.175
+LABEL_INSET = 6
+SHADOW_OFFSET = 2
+FONT_PATH = "NanumGothic.ttf"
+# the labels don't set a size in the stylesheet, so the browser default is used
+LABEL_FONT_SIZE = 16
+
+
+class UnsupportedLayout(Exception):
+    """The chart can't be drawn locally and has to be rendered from html."""
+
+
+@dataclass
+class Label:
+    lines: list[str] = field(default_factory=list)
+    playcount: str | None = None
+
+
+class LabelMarkupParser(HTMLParser):
+    """Text of the few html elements that chart labels are made of."""
+
+    BLOCKS = {("p", "label"), ("p", "playcount"), ("li", None)}
+
+    def __init__(self):
+        super().__init__()
+        # (kind, lines) of every element, line breaks outside of them as "br"
+        self.blocks: list[tuple[str, list[str]]] = []
+        self.current: list[str] | None = None
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]):
+        if tag == "br":
+            return self.line_break()
+
+        if tag == "p" and not attrs:
+            # an unclosed paragraph, closed by the browser when the next one opens
+            self.current = None
+            return
+
+        css_class = dict(attrs).get("class")
+        if (tag, css_class) not in self.BLOCKS:
+            raise UnsupportedLayout(f"<{tag} class={css_class}>")
+
+        self.current = [""]
+        self.blocks.append((css_class or tag, self.current))
+
+    def handle_endtag(self, tag: str):
+        if tag == "br":
+            self.line_break()
+        else:
+            self.current = None
+
+    def handle_data(self, data: str):
+        if self.current is None:
+            if data.strip():
+                raise UnsupportedLayout(f"Text outside of a label: {data}")
+            return
+
+        self.current[-1] += data
+
+    def line_break(self):
+        if self.current is None:
+            self.blocks.append(("br", [""]))
+        else:
+            self.current.append("")
+
+
+def parse_markup(markup: str) -> list[tuple[str, list[str]]]:
+    parser = LabelMarkupParser()
+    parser.feed(markup)
+    parser.close()
+    return parser.blocks
+
+
+def parse_label(markup: str) -> Label | None:
+    label = Label()
+    for kind, lines in parse_markup(markup):
+        if kind == "label":
+            label.lines = lines
+        elif kind == "playcount":
+            label.playcount = " ".join(lines)
+        else:
+            raise UnsupportedLayout(f"<{kind}> in a chart label")
+
+    if not label.lines and label.playcount is None:
+        return None
+
+    return label
+
+
+def parse_topster(entries: list[str]) -> list[str]:
+    lines = []
+    for entry in entries:
+        for kind, text in parse_markup(entry):
+            if kind not in ["li", "br"]:
+                raise UnsupportedLayout(f"<{kind}> in the topster list")
+            lines.append(" ".join(text))
+
+    return lines
+
+
+@lru_cache(maxsize=16)
+def load_font(size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    try:
+        return ImageFont.truetype(FONT_PATH, size)
+    except OSError:
+        return ImageFont.load_default(size)
+
+
+def draw_text(
+    draw: ImageDraw.ImageDraw,
+    xy: tuple[int, int],
+    text: str,
+    font: ImageFont.FreeTypeFont | ImageFont.ImageFont,
+    anchor: str,
+):
+    x, y = xy
+    draw.multiline_text(
+        (x + SHADOW_OFFSET, y + SHADOW_OFFSET),
+        text,
+        fill="#000",
+        font=font,
+        anchor=anchor,
+    )
+    draw.multiline_text(xy, text, fill="#fff", font=font, anchor=anchor)
+
+
+def load_cover(path: str, size: int) -> Image.Image:
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        cover = Image.open(m)
+        cover.draft("RGB", (size, size))
+        return ImageOps.fit(cover.convert("RGB"), (size, size))
+
+
+def compose(
+    covers: list[str | None],
+    labels: list[Label | None],
+    columns: int,
+    rows: int,
+    topster: list[str],
+    topster_font_size: int,
+    padded: bool,
+) -> bytes:
+    """Runs in the worker processes.
+
+    Tiles are square, sized so that the longer side of the grid is `CANVAS_SIZE`.
+    """
+    padding = PADDING if padded else 0
+    gap = GAP if padded else 0
+    cells = max(columns, rows)
+    tile = (CANVAS_SIZE - 2 * padding - (cells - 1) * gap) // cells
+    grid_width = 2 * padding + columns * tile + (columns - 1) * gap
+    grid_height = 2 * padding + rows * tile + (rows - 1) * gap
+
+    width, height = grid_width, grid_height
+    topster_font = load_font(topster_font_size)
+    line_height = round(topster_font_size * LINE_HEIGHT)
+    if topster:
+        text_width = max(topster_font.getlength(line) for line in topster)
+        width += (padding or TOPSTER_MARGIN) + int(text_width) + padding
+        height = max(height, padding * 2 + line_height * len(topster))
+
+    canvas = Image.new("RGB", (width, height), "#000")
+    draw = ImageDraw.Draw(canvas)
+    font = load_font(LABEL_FONT_SIZE)
+
+    for i, (path, label) in enumerate(zip(covers, labels)):
+        if i >= columns * rows:
+            break
+
+        x = padding + (i % columns) * (tile + gap)
+        y = padding + (i // columns) * (tile + gap)
+        if path is not None:
+            try:
+                canvas.paste(load_cover(path, tile), (x, y))
+            except (UnidentifiedImageError, OSError, ValueError):
+                # ValueError is from mapping an empty file
+                pass
+
+        if label is None:
+            continue
+
+        bottom = y + tile - LABEL_INSET
+        if label.lines:
+            text = "\n".join(label.lines)
+            draw_text(draw, (x + LABEL_INSET, bottom), text, font, "ld")
+        if label.playcount:
+            draw_text(
+                draw, (x + tile - LABEL_INSET, bottom), label.playcount, font, "rd"
+            )
+
+    x = grid_width + (padding or TOPSTER_MARGIN)
+    for i, line in enumerate(topster):
+        if line:
+            draw_text(draw, (x, padding + i * line_height), line, topster_font, "la")
+
+    buffer = io.BytesIO()
+    canvas.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+class RenderPool:
+    """Process pool for compositing collages, started on first use."""
+
+    def __init__(self, workers: int = WORKERS):
+        self.workers = workers
+        self.executor: ProcessPoolExecutor | None = None
+
+    async def run(self, *args) -> bytes:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, compose, *args
+        )
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+pool = RenderPool()
+
+
+async def fetch_covers(covers: "CoverCache", urls: list[str]) -> list[str | None]:
+    """Paths of the cached covers, at most `FETCH_CONCURRENCY` downloaded at a time."""
+    semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+    async def fetch(url: str) -> str | None:
+        async with semaphore:
+            path = await covers.path(url)
+            return str(path) if path is not None else None
+
+    # the same image can appear more than once, like the placeholder for missing art
+    unique = list(dict.fromkeys(urls))
+    paths = dict(zip(unique, await asyncio.gather(*(fetch(url) for url in unique))))
+    return [paths[url] for url in urls]
+
+
+async def render(
+    covers: "CoverCache",
+    tiles: list[tuple[str, str]],
+    columns: int,
+    rows: int,
+    topster_labels: list[str],
+    topster_font_size: float,
+    padded: bool,
+) -> io.BytesIO:
+    """Render a chart from (image_url, label html) tiles.
+
+    Raises UnsupportedLayout before fetching anything if a label can't be drawn.
+    """
+    labels = [parse_label(label) for _, label in tiles]
+    topster = parse_topster(topster_labels)
+    paths = await fetch_covers(covers, [image_url for image_url, _ in tiles])
+    return io.BytesIO(
+        await pool.run(
+            paths,
+            labels,
+            columns,
+            rows,
+            topster,
+            max(1, round(topster_font_size)),
+            padded,
+        )
+    )
@@ -0,0 +1,119 @@
+# SPDX-FileCopyrightText: 2018-2025 Joonas Rautiola <mail@joinemm.dev>
+# SPDX-License-Identifier: MPL-2.0
+# https://git.joinemm.dev/miso-bot
+
+import asyncio
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageChops, ImageStat
+
+# only a rough picture of the image is needed to find the dominant color
+THUMBNAIL_SIZE = (100, 100)
+# relative luminance, as a matrix for Image.convert.
+# convert rounds the result while colorgram truncates it, hence the offset.
+# it is just short of a half so that whole numbers don't round down in float32
+LUMINANCE = (0.2126, 0.7152, 0.0722, -0.49995)
+
+
+def default_workers(processes: int = 1) -> int:
+    """COLOR_EXTRACTION_WORKERS, or the cpu cores split between the bot processes."""
+    if "COLOR_EXTRACTION_WORKERS" in os.environ:
+        return int(os.environ["COLOR_EXTRACTION_WORKERS"])
+
+    return max(1, (os.cpu_count() or 1) // processes)
+
+
+def dominant_color(data: bytes, size_limit: int | None = None) -> tuple[int, int, int]:
+    """Runs in the worker processes."""
+    image = Image.open(io.BytesIO(data))
+    if size_limit is not None and sum(image.size) > size_limit:
+        raise ValueError("Image is too large")
+
+    # let the jpeg decoder scale down while decoding, then shrink the rest
+    image.draft("RGB", THUMBNAIL_SIZE)
+    image.thumbnail(THUMBNAIL_SIZE)
+    return most_common_color(image.convert("RGB"))
+
+
+def most_common_color(image: Image.Image) -> tuple[int, int, int]:
+    """The algorithm of colorgram, using whole image operations of PIL.
+
+    Every pixel is put in a bucket by the top two bits of its luminance,
+    hue and lightness. The result is the average color of the fullest bucket.
+    """
+    r, g, b = image.split()
+    most = ImageChops.lighter(ImageChops.lighter(r, g), b)
+    least = ImageChops.darker(ImageChops.darker(r, g), b)
+    lightness = ImageChops.add(most, least, scale=2.0)
+    hue = image.convert("HSV").getchannel("H")
+    luminance = image.convert("L", LUMINANCE)
+
+    buckets = ImageChops.add(
+        ImageChops.add(
+            luminance.point(lambda v: (v >> 6) << 4),
+            hue.point(lambda v: (v >> 6) << 2),
+        ),
+        lightness.point(lambda v: v >> 6),
+    )
+    counts = buckets.histogram()
+    fullest = max(range(len(counts)), key=counts.__getitem__)
+    mask = buckets.point(lambda v: 255 if v == fullest else 0)
+    sum_r, sum_g, sum_b = ImageStat.Stat(image, mask).sum
+    count = counts[fullest]
+    return int(sum_r) // count, int(sum_g) // count, int(sum_b) // count
+
+
+class ColorPool:
+    """Process pool for dominant color extraction.
+
+    At most `max_in_flight` jobs are handed to the pool at once,
+    the rest wait their turn here so they can be counted.
+    """
+
+    def __init__(self, workers: int | None = None):
+        self.resize(workers or default_workers())
+        self.executor: ProcessPoolExecutor | None = None
+        self.semaphore: asyncio.Semaphore | None = None
+        self.waiting = 0
+        self.running = 0
+
+    def resize(self, workers: int):
+        """Only has an effect before the pool is first used."""
+        self.workers = workers
+        self.max_in_flight = workers * 2
+
+    async def extract(
+        self, data: bytes, size_limit: int | None = None
+    ) -> tuple[int, int, int]:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            self.semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        assert self.semaphore is not None
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, dominant_color, data, size_limit
+            )
+        finally:
+            self.running -= 1
+            self.semaphore.release()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+pool = ColorPool()
@@ -0,0 +1,172 @@
+# SPDX-FileCopyrightText: 2018-2025 Joonas Rautiola <mail@joinemm.dev>
+# SPDX-License-Identifier: MPL-2.0
+# https://git.joinemm.dev/miso-bot
+
+import asyncio
+import heapq
+from datetime import datetime
+
+import arrow
+
+from modules import util
+from modules.lru import LRUCache
+from modules.misobot import MisoBot
+from modules.util import Rgb
+
+
+class ImageColorCache:
+    """Dominant colors of Last.fm images, in memory in front of image_color_cache.
+
+    Lookups that miss the memory cache during the same event loop iteration
+    are combined into a single database query.
+    """
+
+    MAX_SIZE = 50000
+    WARM_SIZE = 10000
+    USAGE_RETENTION_DAYS = 30
+
+    def __init__(self, bot: MisoBot):
+        self.bot = bot
+        self.colors = LRUCache(self.MAX_SIZE)
+        self.pending: dict[str, asyncio.Future[Rgb | None]] = {}
+        self.used: dict[str, datetime] = {}
+
+    async def warm(self):
+        """Load the colors of the most recently used images."""
+        data = await self.bot.db.fetch(
+            """
+            SELECT image_hash, r, g, b FROM image_color_usage
+                JOIN image_color_cache USING (image_hash)
+            ORDER BY used_at DESC
+            LIMIT %s
+            """,
+            self.WARM_SIZE,
+        )
+        # oldest first, so the most recent ones end up as the least likely evicted
+        for image_hash, r, g, b in reversed(data or []):
+            self.colors.set(image_hash, Rgb(r, g, b))
+
+    async def get(self, image_hash: str) -> Rgb | None:
+        self.used[image_hash] = arrow.utcnow().datetime
+        color = self.colors.get(image_hash)
+        if color is not None:
+            return color
+
+        future = self.pending.get(image_hash)
+        if future is None:
+            if not self.pending:
+                asyncio.get_running_loop().call_soon(self.schedule_fetch)
+            future = asyncio.get_running_loop().create_future()
+            self.pending[image_hash] = future
+
+        return await asyncio.shield(future)
+
+    async def get_many(self, image_hashes: list[str]) -> dict[str, Rgb]:
+        """Colors of the given images that are cached, by image hash."""
+        colors = await asyncio.gather(*(self.get(h) for h in image_hashes))
+        return {
+            image_hash: color
+            for image_hash, color in zip(image_hashes, colors)
+            if color is not None
+        }
+
+    def schedule_fetch(self):
+        pending, self.pending = self.pending, {}
+        task = asyncio.create_task(self.fetch(list(pending)))
+
+        def resolve(task: asyncio.Task[dict[str, Rgb]]):
+            if task.cancelled():
+                for future in pending.values():
+                    future.cancel()
+                return
+
+            exception = task.exception()
+            for image_hash, future in pending.items():
+                if future.done():
+                    continue
+                if exception is not None:
+                    future.set_exception(exception)
+                else:
+                    future.set_result(task.result().get(image_hash))
+
+        task.add_done_callback(resolve)
+
+    async def fetch(self, image_hashes: list[str]) -> dict[str, Rgb]:
+        data = await self.bot.db.fetch(
+            "SELECT image_hash, r, g, b FROM image_color_cache WHERE image_hash IN %s",
+            image_hashes,
+        )
+        colors = {}
+        for image_hash, r, g, b in data or []:
+            colors[image_hash] = Rgb(r, g, b)
+            self.colors.set(image_hash, colors[image_hash])
+
+        return colors
+
+    async def store(self, colors: dict[str, Rgb]):
+        if not colors:
+            return
+
+        for image_hash, color in colors.items():
+            self.colors.set(image_hash, color)
+
+        await self.bot.db.executemany(
+            """
+            INSERT IGNORE image_color_cache (image_hash, r, g, b, hex)
+                VALUES (%s, %s, %s, %s, %s)
+            """,
+            [
+                (image_hash, color.r, color.g, color.b, util.rgb_to_hex(color))
+                for image_hash, color in colors.items()
+            ],
+        )
+
+    async def flush_usage(self):
+        """Save which images were used recently, for warming up after a restart."""
+        if not self.used:
+            return
+
+        rows = list(self.used.items())
+        self.used.clear()
+        await self.bot.db.executemany(
+            """
+            INSERT INTO image_color_usage (image_hash, used_at)
+                VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE
+                used_at = VALUES(used_at)
+            """,
+            rows,
+        )
+        await self.bot.db.execute(
+            "DELETE FROM image_color_usage WHERE used_at < UTC_TIMESTAMP() - INTERVAL %s DAY",
+            self.USAGE_RETENTION_DAYS,
+        )
+
+
+class ColorIndex:
+    """Nearest color search over a fixed set of images.
+
+    With at most a thousand albums a linear scan over flat channel lists
+    is faster than building a tree for every chart.
+    """
+
+    def __init__(self, colors: dict[str, Rgb]):
+        self.hashes = list(colors)
+        self.reds = [color.r for color in colors.values()]
+        self.greens = [color.g for color in colors.values()]
+        self.blues = [color.b for color in colors.values()]
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def nearest(self, rgb: tuple[int, int, int], amount: int) -> list[str]:
+        """Hashes of the images closest to the given color, closest first."""
+        r, g, b = rgb
+        distances = [
+            (r - red) * (r - red) + (g - green) * (g - green) + (b - blue) * (b - blue)
+            for red, green, blue in zip(self.reds, self.greens, self.blues)
+        ]
+        closest = heapq.nsmallest(
+            amount, range(len(distances)), key=distances.__getitem__
+        )
+        return [self.hashes[i] for i in closest]
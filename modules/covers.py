@@ -0,0 +1,162 @@
+# SPDX-FileCopyrightText: 2018-2025 Joonas Rautiola <mail@joinemm.dev>
+# SPDX-License-Identifier: MPL-2.0
+# https://git.joinemm.dev/miso-bot
+
+import asyncio
+import mmap
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+import aiohttp
+from loguru import logger
+
+from modules.lastfm import LastFmImage
+from modules.misobot import MisoBot
+
+COVER_CACHE_DIR = os.environ.get("COVER_CACHE_DIR", "cache/covers")
+COVER_CACHE_MAX_BYTES = int(os.environ.get("COVER_CACHE_MAX_BYTES", 2 * 1024**3))
+DOWNLOAD_TIMEOUT = aiohttp.ClientTimeout(total=10)
+
+
+def read_mapped(path: Path) -> bytes:
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        return m[:]
+
+
+def write_atomic(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix(".part")
+    temporary.write_bytes(data)
+    os.replace(temporary, path)
+
+
+class CoverCache:
+    """Last.fm cover art on disk, keyed by image hash and resolution.
+
+    When the files take more than `max_bytes`, the least recently used ones
+    are deleted. After a restart, modification times decide the order.
+    Every cluster has its own subdirectory and share of the bytes, so that
+    they never delete files another one still has indexed.
+    """
+
+    def __init__(
+        self,
+        bot: MisoBot,
+        directory: str = COVER_CACHE_DIR,
+        max_bytes: int = COVER_CACHE_MAX_BYTES,
+    ):
+        self.bot = bot
+        self.directory = Path(directory) / f"cluster-{bot.cluster.id}"
+        self.max_bytes = max_bytes // bot.cluster.count
+        # filename -> size in bytes, least recently used first
+        self.files: OrderedDict[str, int] = OrderedDict()
+        self.total_bytes = 0
+        self.downloads: dict[str, asyncio.Task[Path | None]] = {}
+
+    def scan(self) -> list[tuple[str, int]]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entries = [
+            entry
+            for entry in os.scandir(self.directory)
+            # empty files are left out, so they get downloaded again
+            if entry.is_file()
+            and entry.name.endswith(".jpg")
+            and entry.stat().st_size > 0
+        ]
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        return [(entry.name, entry.stat().st_size) for entry in entries]
+
+    async def load(self):
+        """Index the files already on disk."""
+        for filename, size in await asyncio.to_thread(self.scan):
+            self.files[filename] = size
+            self.total_bytes += size
+
+        logger.info(
+            f"Cover cache has {len(self.files)} images "
+            f"({self.total_bytes / 1024**2:.1f} MiB)"
+        )
+
+    @staticmethod
+    def filename(url: str) -> str | None:
+        """`{hash}_{resolution}.jpg` of a Last.fm CDN url, None for other urls."""
+        if not url.startswith(LastFmImage.CDN_BASE_URL):
+            return None
+
+        *resolution, _ = url.removeprefix(LastFmImage.CDN_BASE_URL).split("/")
+        image = LastFmImage.from_url(url)
+        return f"{image.hash}_{''.join(resolution) or 'full'}.jpg"
+
+    async def path(self, url: str) -> Path | None:
+        """Local copy of the image, downloaded first if it's not cached yet."""
+        filename = self.filename(url)
+        if filename is None:
+            return None
+
+        if filename in self.files:
+            self.files.move_to_end(filename)
+            return self.directory / filename
+
+        task = self.downloads.get(filename)
+        if task is None:
+            task = asyncio.create_task(self.download(url, filename))
+            self.downloads[filename] = task
+            task.add_done_callback(lambda _: self.downloads.pop(filename, None))
+
+        return await asyncio.shield(task)
+
+    async def read(self, url: str) -> bytes | None:
+        # a second try downloads the file again if the first one went missing
+        for _ in range(2):
+            path = await self.path(url)
+            if path is None:
+                return None
+
+            try:
+                return await asyncio.to_thread(read_mapped, path)
+            except FileNotFoundError:
+                # evicted or deleted from outside in the meantime
+                self.forget(path.name)
+            except ValueError:
+                # an empty file can't be mapped
+                self.forget(path.name)
+                await asyncio.to_thread(path.unlink, missing_ok=True)
+
+        return None
+
+    async def download(self, url: str, filename: str) -> Path | None:
+        try:
+            async with self.bot.session.get(url, timeout=DOWNLOAD_TIMEOUT) as response:
+                response.raise_for_status()
+                data = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Could not download cover {url}: {e}")
+            return None
+
+        if not data:
+            return None
+
+        path = self.directory / filename
+        await asyncio.to_thread(write_atomic, path, data)
+        self.files[filename] = len(data)
+        self.total_bytes += len(data)
+        await self.evict()
+        return path
+
+    def forget(self, filename: str):
+        size = self.files.pop(filename, None)
+        if size is not None:
+            self.total_bytes -= size
+
+    async def evict(self):
+        evicted = []
+        while self.total_bytes > self.max_bytes and len(self.files) > 1:
+            filename, size = self.files.popitem(last=False)
+            self.total_bytes -= size
+            evicted.append(self.directory / filename)
+
+        if evicted:
+            await asyncio.to_thread(
+                lambda: [path.unlink(missing_ok=True) for path in evicted]
+            )
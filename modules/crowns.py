@@ -0,0 +1,168 @@
+# SPDX-FileCopyrightText: 2018-2025 Joonas Rautiola <mail@joinemm.dev>
+# SPDX-License-Identifier: MPL-2.0
+# https://git.joinemm.dev/miso-bot
+
+from dataclasses import dataclass
+
+from modules import util
+from modules.misobot import MisoBot
+
+
+@dataclass
+class CrownTransfer:
+    guild_id: int
+    artist_name: str
+    user_id: int
+    previous_user_id: int
+
+
+class CrownEngine:
+    """Keeps artist crowns up to date from playcount changes.
+
+    Changes come from whoknows rankings and from the background playcount index.
+    A crown changes hands whenever someone in the guild is seen with more plays
+    than the current holder, so no guild wide recompute is ever needed.
+    The guilds of the users are asked from every cluster, as the index is only
+    run on one of them.
+    """
+
+    def __init__(self, bot: MisoBot):
+        self.bot = bot
+        # lastfm username -> [(artist name, playcount)], waiting to be applied
+        self.pending: dict[str, list[tuple[str, int]]] = {}
+
+    def submit(self, username: str, playcounts: list[tuple[str, int]]):
+        """Queue new artist playcounts of a user to be applied in the background."""
+        self.pending[username] = playcounts
+
+    async def local_mutual_guilds(self, user_ids: list[int]) -> list[list]:
+        """[user id, guild ids] of the users in the guilds of this cluster."""
+        mutual_guilds = []
+        for user_id in user_ids:
+            user = self.bot.get_user(user_id)
+            if user is None or util.user_is_blacklisted(self.bot, user):
+                continue
+
+            mutual_guilds.append([user_id, [guild.id for guild in user.mutual_guilds]])
+
+        return mutual_guilds
+
+    async def flush(self):
+        """Apply the queued playcounts to every guild the users are members of."""
+        pending, self.pending = self.pending, {}
+        if not pending:
+            return
+
+        linked = await self.bot.db.fetch(
+            """
+            SELECT user_id, lastfm_username FROM user_settings
+            WHERE lastfm_username IN %s
+            """,
+            list(pending),
+        )
+        if not linked:
+            return
+
+        guilds_by_user: dict[int, list[int]] = {}
+        for mutual_guilds in await self.bot.ipc.gather(
+            "mutual_guilds", user_ids=[user_id for user_id, _ in linked]
+        ):
+            for user_id, guild_ids in mutual_guilds:
+                guilds_by_user.setdefault(user_id, []).extend(guild_ids)
+
+        playcounts_by_name = {name.casefold(): rows for name, rows in pending.items()}
+        for user_id, lastfm_username in linked:
+            guild_ids = guilds_by_user.get(user_id)
+            if not guild_ids:
+                continue
+
+            blacklisted_in = set(
+                await self.bot.db.fetch_flattened(
+                    """
+                    SELECT guild_id FROM lastfm_blacklist
+                    WHERE user_id = %s AND guild_id IN %s
+                    """,
+                    user_id,
+                    guild_ids,
+                )
+            )
+            await self.update(
+                [
+                    (guild_id, user_id, artist_name, playcount)
+                    for guild_id in guild_ids
+                    if guild_id not in blacklisted_in
+                    for artist_name, playcount in playcounts_by_name.get(
+                        lastfm_username.casefold(), []
+                    )
+                    if playcount > 0
+                ]
+            )
+
+    async def update(
+        self,
+        changes: list[tuple[int, int, str, int]],
+        authoritative: bool = False,
+    ) -> list[CrownTransfer]:
+        """Apply (guild_id, user_id, artist_name, playcount) changes.
+
+        With `authoritative`, the given users are known to be the top listeners
+        and take the crown regardless of the cached playcount.
+        Returns the crowns that changed hands.
+        """
+        if not changes:
+            return []
+
+        # only the top listener of each crown in this batch matters
+        best: dict[tuple[int, str], tuple[int, int, str]] = {}
+        for guild_id, user_id, artist_name, playcount in changes:
+            key = (guild_id, artist_name.casefold())
+            if key not in best or playcount > best[key][0]:
+                best[key] = (playcount, user_id, artist_name)
+
+        current = {
+            (guild_id, artist_name.casefold()): (user_id, cached_playcount)
+            for guild_id, artist_name, user_id, cached_playcount in (
+                await self.bot.db.fetch(
+                    """
+                    SELECT guild_id, artist_name, user_id, cached_playcount
+                    FROM artist_crown
+                    WHERE guild_id IN %s AND artist_name IN %s
+                    """,
+                    list({guild_id for guild_id, _ in best}),
+                    list({artist_name for _, _, artist_name in best.values()}),
+                )
+                or []
+            )
+        }
+
+        upserts = []
+        transfers = []
+        for (guild_id, _), (playcount, user_id, artist_name) in best.items():
+            holder = current.get((guild_id, artist_name.casefold()))
+            if holder is None:
+                upserts.append((guild_id, user_id, artist_name, playcount))
+                continue
+
+            holder_id, cached_playcount = holder
+            if holder_id == user_id:
+                if playcount != cached_playcount:
+                    upserts.append((guild_id, user_id, artist_name, playcount))
+            elif authoritative or playcount > cached_playcount:
+                upserts.append((guild_id, user_id, artist_name, playcount))
+                transfers.append(
+                    CrownTransfer(guild_id, artist_name, user_id, holder_id)
+                )
+
+        if upserts:
+            await self.bot.db.executemany(
+                """
+                INSERT INTO artist_crown (guild_id, user_id, artist_name, cached_playcount)
+                    VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    cached_playcount = VALUES(cached_playcount),
+                    user_id = VALUES(user_id)
+                """,
+                upserts,
+            )
+
+        return transfers
@@ -0,0 +1,163 @@
+# SPDX-FileCopyrightText: 2018-2025 Joonas Rautiola <mail@joinemm.dev>
+# SPDX-License-Identifier: MPL-2.0
+# https://git.joinemm.dev/miso-bot
+
+import asyncio
+import uuid
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
+
+import orjson
+from loguru import logger
+
+if TYPE_CHECKING:
+    from modules.misobot import MisoBot
+
+REQUEST_CHANNEL = "miso:ipc"
+# discord allows one identify per bucket every 5 seconds
+IDENTIFY_INTERVAL_MS = 5500
+
+
+@dataclass
+class ClusterInfo:
+    """Which of the shards this process connects, out of all of them."""
+
+    id: int = 0
+    count: int = 1
+    shard_ids: list[int] | None = None
+    shard_count: int | None = None
+    max_concurrency: int = 1
+
+    @property
+    def is_primary(self) -> bool:
+        return self.id == 0
+
+
+class IPC:
+    """Requests answered by every cluster, over redis pub/sub.
+
+    Handlers are registered by name and return something json serializable.
+    The cluster making the request answers it itself without going through
+    redis, so with a single cluster nothing is published at all.
+    """
+
+    TIMEOUT = 5
+    RESUBSCRIBE_DELAY = 5
+
+    def __init__(self, bot: "MisoBot"):
+        self.bot = bot
+        self.handlers: dict[str, Callable[..., Awaitable[Any]]] = {}
+        # request id -> (replies so far, resolved once every cluster replied)
+        self.pending: dict[str, tuple[list[dict], asyncio.Future[None]]] = {}
+        self.listeners: list[asyncio.Task] = []
+
+    @property
+    def cluster(self) -> ClusterInfo:
+        return self.bot.cluster
+
+    def handle(self, name: str, handler: Callable[..., Awaitable[Any]]):
+        self.handlers[name] = handler
+
+    def remove_handler(self, name: str):
+        self.handlers.pop(name, None)
+
+    def start(self):
+        if self.cluster.count == 1:
+            return
+
+        self.listeners = [
+            asyncio.create_task(self.listen(REQUEST_CHANNEL, self.answer)),
+            asyncio.create_task(
+                self.listen(f"{REQUEST_CHANNEL}:{self.cluster.id}", self.collect)
+            ),
+        ]
+
+    def stop(self):
+        for listener in self.listeners:
+            listener.cancel()
+
+    async def listen(self, channel: str, callback: Callable[[dict], None]):
+        while True:
+            try:
+                async for message in self.bot.redis.subscribe(channel):
+                    callback(orjson.loads(message))
+            except Exception as e:
+                logger.warning(f"Lost the IPC channel {channel}: {e}")
+
+            await asyncio.sleep(self.RESUBSCRIBE_DELAY)
+
+    async def gather(self, name: str, **kwargs) -> list[Any]:
+        """Results of the handler from every cluster that answered in time."""
+        results = [await self.handlers[name](**kwargs)]
+        if self.cluster.count == 1:
+            return results
+
+        request_id = uuid.uuid4().hex
+        replies: list[dict] = []
+        done = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = (replies, done)
+        try:
+            await self.bot.redis.publish(
+                REQUEST_CHANNEL,
+                orjson.dumps(
+                    {
+                        "id": request_id,
+                        "cluster": self.cluster.id,
+                        "name": name,
+                        "kwargs": kwargs,
+                    }
+                ),
+            )
+            await asyncio.wait_for(done, self.TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"IPC {name}: only {len(replies) + 1}/{self.cluster.count} "
+                "clusters answered in time"
+            )
+        finally:
+            self.pending.pop(request_id, None)
+
+        for reply in replies:
+            if "error" in reply:
+                logger.warning(f"IPC {name} failed on cluster {reply['cluster']}")
+            else:
+                results.append(reply["result"])
+
+        return results
+
+    def answer(self, request: dict):
+        if request["cluster"] != self.cluster.id:
+            asyncio.create_task(self.reply(request))
+
+    async def reply(self, request: dict):
+        response: dict[str, Any] = {"id": request["id"], "cluster": self.cluster.id}
+        try:
+            response["result"] = await self.handlers[request["name"]](
+                **request["kwargs"]
+            )
+        except Exception as e:
+            logger.error(f"IPC handler {request['name']} failed: {e}")
+            response["error"] = str(e)
+
+        await self.bot.redis.publish(
+            f"{REQUEST_CHANNEL}:{request['cluster']}", orjson.dumps(response)
+        )
+
+    def collect(self, response: dict):
+        pending = self.pending.get(response["id"])
+        if pending is None:
+            # answered after the request timed out
+            return
+
+        replies, done = pending
+        replies.append(response)
+        if len(replies) == self.cluster.count - 1 and not done.done():
+            done.set_result(None)
+
+    async def wait_for_identify(self, shard_id: int):
+        """Take the identify slot of the shard's bucket, shared by every cluster."""
+        key = f"miso:identify:{shard_id % self.cluster.max_concurrency}"
+        while not await self.bot.redis.claim(
+            key, self.cluster.id, IDENTIFY_INTERVAL_MS
+        ):
+            await asyncio.sleep(0.5)
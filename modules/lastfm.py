@@ -5,19 +5,30 @@
 import asyncio
 import json
 import math
+import os
 import urllib.parse
-from enum import Enum
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import Enum, IntEnum
+from time import monotonic
+from typing import AsyncIterator, Awaitable, Callable, Iterable, TypeVar
 
 import aiohttp
 import arrow
 import orjson
-from bs4 import BeautifulSoup, Tag
+import redis
+from bs4 import BeautifulSoup
 from loguru import logger
 from markdownify import markdownify as md
 
-from modules import exceptions
+from modules import exceptions, scraping
+from modules.lru import LRUCache
 from modules.misobot import MisoBot
 
+T = TypeVar("T")
+R = TypeVar("R")
+
 
 def int_bool(value: bool | None) -> int | None:
     """Turn optional bool into 1 or 0."""
@@ -121,15 +132,145 @@ class Period(Enum):
                 return "Year"
 
 
+class Priority(IntEnum):
+    """Scheduling lane of an api request, lower value goes first."""
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+request_priority: ContextVar[Priority] = ContextVar(
+    "lastfm_request_priority", default=Priority.INTERACTIVE
+)
+
+
+@contextmanager
+def background_priority():
+    """Api requests made inside this block (including tasks created in it)
+    yield to interactive single user commands."""
+    token = request_priority.set(Priority.BACKGROUND)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class RateLimiter:
+    """Token bucket shared by all api requests.
+    When out of tokens, waiting requests are released in priority order."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = monotonic()
+        self.lanes: dict[Priority, deque[asyncio.Future]] = {
+            p: deque() for p in Priority
+        }
+        self.scheduler: asyncio.Task | None = None
+
+    def refill(self):
+        now = monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def queue_depth(self, priority: Priority) -> int:
+        return len(self.lanes[priority])
+
+    def penalize(self, seconds: float):
+        """Stop releasing requests for a while, eg. after getting rate limited."""
+        self.refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+    async def acquire(self, priority: Priority) -> float:
+        """Wait for a token, returns the time spent waiting in seconds."""
+        self.refill()
+        if self.tokens >= 1 and not any(self.lanes.values()):
+            self.tokens -= 1
+            return 0.0
+
+        start = monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self.lanes[priority].append(future)
+        if self.scheduler is None or self.scheduler.done():
+            self.scheduler = asyncio.create_task(self.schedule())
+
+        await future
+        return monotonic() - start
+
+    async def schedule(self):
+        while any(self.lanes.values()):
+            self.refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                continue
+
+            for lane in self.lanes.values():
+                # skip over waiters that were cancelled while in queue
+                while lane and lane[0].done():
+                    lane.popleft()
+                if lane:
+                    lane.popleft().set_result(None)
+                    self.tokens -= 1
+                    break
+
+
+class ResponseCache:
+    """Api response cache stored in redis, or in process memory if redis is not configured."""
+
+    LOCAL_CACHE_SIZE = 4096
+
+    def __init__(self, bot: MisoBot, local_size: int = LOCAL_CACHE_SIZE):
+        self.bot = bot
+        self.local = LRUCache(local_size)
+
+    async def get(self, key: str) -> bytes | None:
+        if not self.bot.redis.enabled:
+            return self.local.get(key)
+
+        try:
+            return await self.bot.redis.get(key)
+        except redis.ConnectionError:
+            logger.warning("Could not get cached content from redis (ConnectionError)")
+            return None
+
+    async def set(self, key: str, value: bytes, expiry: int):
+        if not self.bot.redis.enabled:
+            self.local.set(key, value, expiry)
+            return
+
+        try:
+            await self.bot.redis.set(key, value, expiry)
+        except redis.ConnectionError:
+            logger.warning("Could not save content into redis cache (ConnectionError)")
+
+
 class LastFmApi:
     LASTFM_RED = "b90000"
     API_BASE_URL = "http://ws.audioscrobbler.com/2.0/"
     USER_AGENT = (
         "Mozilla/5.0 (X11; Linux x86_64; rv:148.0) Gecko/20100101 Firefox/148.0"
     )
+    RATE_LIMIT = float(os.environ.get("LASTFM_RATE_LIMIT", 15))
+    RATE_LIMIT_BURST = int(os.environ.get("LASTFM_RATE_LIMIT_BURST", 60))
+    RATE_LIMITED_BACKOFF = 5
+    SCRAPE_CACHE_SIZE = 2048
+    # how long scraped results are used before revalidating them
+    LIBRARY_PAGE_TTL = 60
+    METADATA_PAGE_TTL = 86400
+    ARTIST_IMAGE_LIFETIME = 604800  # 1 week
 
     def __init__(self, bot: MisoBot):
         self.bot = bot
+        self.cache = ResponseCache(bot)
+        self.scrape_cache = LRUCache(self.SCRAPE_CACHE_SIZE)
+        self.artist_images = LRUCache(self.SCRAPE_CACHE_SIZE)
+        self.inflight: dict[str, asyncio.Task[bytes]] = {}
+        # the limit is for the api key, so every cluster gets an equal share of it
+        clusters = bot.cluster.count
+        self.limiter = RateLimiter(
+            self.RATE_LIMIT / clusters, max(1, self.RATE_LIMIT_BURST // clusters)
+        )
 
     async def login(self, username: str, password: str) -> bool:
         """Login to lastfm for authenticated web scraping requests"""
@@ -176,14 +317,99 @@ class LastFmApi:
                 logger.warning(md(textcontent))
             return False
 
+    @staticmethod
+    def cache_ttl(method: str, params: dict) -> int | None:
+        """Seconds the response to given request can be cached for, None if not at all."""
+        match method:
+            case "user.getrecenttracks":
+                return 10
+            case "user.getinfo":
+                return 300
+            case "user.gettopartists" | "user.gettopalbums" | "user.gettoptracks":
+                match params.get("period"):
+                    case Period.WEEK.value:
+                        return 600
+                    case Period.MONTH.value:
+                        return 1800
+                    case _:
+                        return 10800
+            case "artist.getinfo" | "album.getinfo" | "track.getinfo":
+                # userplaycount changes with every scrobble, global metadata rarely
+                return 60 if params.get("username") else 259200
+            case _:
+                return None
+
+    @staticmethod
+    def cache_key(method: str, params: dict) -> str:
+        """Last.fm is case insensitive so the params are casefolded."""
+        normalized = sorted((k, str(v).casefold()) for k, v in params.items())
+        return f"lastfm:{method}:{urllib.parse.urlencode(normalized)}"
+
+    def count_cache_lookup(self, method: str, hit: bool):
+        if prom := self.bot.get_cog("Prometheus"):
+            prom.lastfm_cache_lookups.labels(
+                method=method,
+                result="hit" if hit else "miss",
+            ).inc()  # type: ignore
+
     async def api_request(self, method: str, params: dict) -> dict:
-        """Make a request to the lastfm api, returns json."""
-        # add auth params, remove null values and combine to single dict
+        """Make a request to the lastfm api, returns json.
+        Responses are served from the cache if possible, and concurrent
+        identical requests share a single upstream call."""
+        # remove null values
+        params = {k: v for k, v in params.items() if v is not None}
+
+        ttl = self.cache_ttl(method, params)
+        cache_key = self.cache_key(method, params)
+        if ttl is not None:
+            cached = await self.cache.get(cache_key)
+            self.count_cache_lookup(method, hit=cached is not None)
+            if cached is not None:
+                return orjson.loads(cached)
+
+        task = self.inflight.get(cache_key)
+        if task is None:
+            task = asyncio.create_task(
+                self.fetch_and_cache(cache_key, ttl, method, params)
+            )
+            self.inflight[cache_key] = task
+            task.add_done_callback(lambda t: self.forget_inflight(cache_key, t))
+
+        # shielded so that a cancelled caller doesn't cancel the request for everyone.
+        # every caller decodes their own copy as the response is mutated afterwards
+        return orjson.loads(await asyncio.shield(task))
+
+    async def fetch_and_cache(
+        self, cache_key: str, ttl: int | None, method: str, params: dict
+    ) -> bytes:
+        content = orjson.dumps(await self.fetch(method, params))
+        if ttl is not None:
+            await self.cache.set(cache_key, content, ttl)
+        return content
+
+    def forget_inflight(self, cache_key: str, task: asyncio.Task):
+        self.inflight.pop(cache_key, None)
+        # retrieve the exception in case every caller was cancelled already
+        if not task.cancelled():
+            task.exception()
+
+    async def wait_for_rate_limit(self):
+        priority = request_priority.get()
+        waited = await self.limiter.acquire(priority)
+        if prom := self.bot.get_cog("Prometheus"):
+            queue_wait = prom.lastfm_queue_wait  # type: ignore
+            queue_wait.labels(priority=priority.name.lower()).observe(waited)
+
+    async def fetch(self, method: str, params: dict) -> dict:
+        """Request the lastfm api directly, bypassing the cache."""
+        await self.wait_for_rate_limit()
+
+        # add auth params and combine to single dict
         request_params = {
             "method": method,
             "api_key": self.bot.keychain.LASTFM_API_KEY,
             "format": "json",
-        } | {k: v for k, v in params.items() if v is not None}
+        } | params
 
         if self.bot.debug:
             logger.info(request_params)
@@ -204,6 +430,9 @@ class LastFmApi:
 
             error_code = content.get("error")
             if error_code:
+                if error_code == 29:
+                    logger.warning("Last.fm rate limit exceeded, backing off")
+                    self.limiter.penalize(self.RATE_LIMITED_BACKOFF)
                 raise exceptions.LastFMError(
                     error_code=error_code,
                     message=content.get("message"),
@@ -213,6 +442,46 @@ class LastFmApi:
                 logger.info(json.dumps(content, indent=4))
             return content
 
+    async def map_users(
+        self,
+        fn: Callable[[T], Awaitable[R]],
+        items: Iterable[T],
+        concurrency: int = 30,
+        timeout: float | None = 20,
+        deadline: float | None = None,
+    ) -> AsyncIterator[tuple[T, R | None]]:
+        """Run `fn` for every item (usually a user) with at most `concurrency` running
+        at once, yielding (item, result) pairs as they complete.
+        Items that fail with a Last.fm or connection error, or time out, yield None
+        so that the caller can still use the partial results.
+        After `deadline` seconds the iteration stops, leaving out the slowest items."""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(item: T) -> tuple[T, R | None]:
+            async with semaphore:
+                try:
+                    return item, await asyncio.wait_for(fn(item), timeout)
+                except (
+                    exceptions.LastFMError,
+                    aiohttp.ClientError,
+                    asyncio.TimeoutError,
+                ) as e:
+                    logger.debug(f"Skipping {item} in map_users: {e!r}")
+                    return item, None
+
+        tasks = [asyncio.create_task(run(item)) for item in items]
+        try:
+            for next_done in asyncio.as_completed(tasks, timeout=deadline):
+                try:
+                    result = await next_done
+                except asyncio.TimeoutError:
+                    return
+                yield result
+        finally:
+            # the caller might stop iterating early
+            for task in tasks:
+                task.cancel()
+
     ###############
     # API METHODS #
     ###############
@@ -253,7 +522,8 @@ class LastFmApi:
         data = data["recenttracks"]
 
         if (
-            (
+            data["track"]
+            and (
                 (to_ts is not None and to_ts < int(data["track"][0]["date"]["uts"]))
                 or (page is not None)
             )
@@ -413,65 +683,91 @@ class LastFmApi:
         """For some reason Last.fm URLs are percent-encoded twice..."""
         return urllib.parse.quote_plus(urllib.parse.quote_plus(text))
 
-    async def scrape_page(self, page_url: str, params: dict | None = None):
-        """Scrapes the given url returning a Soup."""
+    async def scrape(
+        self,
+        parser: Callable[[str], T],
+        page_url: str,
+        params: dict | None = None,
+        ttl: float = METADATA_PAGE_TTL,
+    ) -> T:
+        """Scrapes the given url, returning the parsed result.
+        Results are cached and revalidated with the page's ETag or Last-Modified
+        date once they are older than `ttl` seconds."""
+        key = (page_url, tuple(sorted((params or {}).items())))
+        cached: scraping.ScrapedPage | None = self.scrape_cache.get(key)
+        if cached is not None and cached.fresh_until > monotonic():
+            self.count_cache_lookup("scrape", True)
+            return cached.result
+
         async with self.bot.session.get(
             page_url,
             params=params,
             headers={
                 "User-Agent": self.USER_AGENT,
+                **(cached.revalidation_headers() if cached else {}),
             },
         ) as response:
             if self.bot.debug:
                 logger.info(f"Scraping page {response.url}")
-            response.raise_for_status()
-            content = await response.text()
-            soup = BeautifulSoup(content, "lxml")
-            return soup
 
-    @staticmethod
-    def get_library_playcounts(soup: BeautifulSoup | Tag) -> list[tuple[int, str]]:
-        """Scrape a listing page for playcounts."""
-        results = []
-        for row in soup.select(".chartlist-row"):
-            name = row.select_one(".chartlist-name a")
-            playcount = row.select_one(".chartlist-count-bar-value")
-            if name and playcount:
-                results.append(
-                    (
-                        int(playcount.get_text().split()[0].replace(",", "")),
-                        name.text,
-                    )
-                )
+            if response.status == 304 and cached is not None:
+                self.count_cache_lookup("scrape", True)
+                cached.fresh_until = monotonic() + ttl
+                self.scrape_cache.set(key, cached)
+                return cached.result
 
-        return results
+            self.count_cache_lookup("scrape", False)
+            response.raise_for_status()
+            content = await response.text()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
 
-    async def get_additional_library_pages(self, soup: BeautifulSoup, url: str) -> list:
-        """Check for pagination on listing page and fetch all the remaining pages."""
-        pages = soup.select(".pagination-page")
-        if not pages:
-            return []
+        result = await scraping.parse(parser, content)
+        self.scrape_cache.set(
+            key,
+            scraping.ScrapedPage(result, monotonic() + ttl, etag, last_modified),
+        )
+        return result
+
+    async def scrape_library_page(
+        self, page_url: str, params: dict | None = None
+    ) -> scraping.LibraryPage:
+        """Scrapes a library listing page of a user."""
+        return await self.scrape(
+            scraping.parse_library_page, page_url, params, ttl=self.LIBRARY_PAGE_TTL
+        )
 
-        page_count = int(pages[-1].get_text())
+    async def get_additional_library_pages(
+        self, page: scraping.LibraryPage, url: str
+    ) -> tuple[list[tuple[int, str]], int]:
+        """Fetch the playcounts of all the remaining pages of a listing page.
+        Also returns how many of the pages could not be fetched."""
 
         async def get_additional_page(n):
-            new_url = url + f"&page={n}"
-            soup = await self.scrape_page(new_url)
-            return self.get_library_playcounts(soup)
+            new_page = await self.scrape_library_page(url + f"&page={n}")
+            return new_page.rows
 
-        tasks = []
-        if page_count > 1:
-            for i in range(2, page_count + 1):
-                tasks.append(get_additional_page(i))
+        page_results = {}
+        failed = 0
+        async for n, result in self.map_users(
+            get_additional_page, range(2, page.page_count + 1)
+        ):
+            if result is None:
+                failed += 1
+            else:
+                page_results[n] = result
 
         results = []
-        for result in await asyncio.gather(*tasks):
-            results += result
+        for n in sorted(page_results):
+            results += page_results[n]
 
-        return results
+        return results, failed
 
     async def get_artist_image(self, artist_name: str):
-        IMAGE_LIFETIME = 604800  # 1 week
+        image_hash = self.artist_images.get(artist_name)
+        if image_hash is not None:
+            return LastFmImage(image_hash)
+
         cached = await self.bot.db.fetch_row(
             "SELECT image_hash, scrape_date FROM artist_image_cache WHERE artist_name = %s",
             artist_name,
@@ -480,13 +776,18 @@ class LastFmApi:
         if cached:
             image_hash, scrape_date = cached
             lifetime = arrow.now().timestamp() - scrape_date.timestamp()
-            if lifetime < IMAGE_LIFETIME:
+            if lifetime < self.ARTIST_IMAGE_LIFETIME:
+                self.artist_images.set(
+                    artist_name, image_hash, self.ARTIST_IMAGE_LIFETIME - lifetime
+                )
                 return LastFmImage(image_hash)
 
         image = await self.scrape_artist_image(artist_name)
         if image is None or image.is_missing():
             return None
 
+        self.artist_images.set(artist_name, image.hash, self.ARTIST_IMAGE_LIFETIME)
+
         await self.bot.db.execute(
             """
             INSERT INTO artist_image_cache (artist_name, image_hash, scrape_date)
@@ -505,30 +806,20 @@ class LastFmApi:
         """Get artist's top image."""
         url = f"https://www.last.fm/music/{self.double_encode(artist)}/+images"
         try:
-            soup = await self.scrape_page(url)
+            image = await self.scrape(scraping.parse_artist_image, url)
         except aiohttp.ClientResponseError:
             return None
-        image = soup.select_one(".image-list-item-wrapper a img")
-        return LastFmImage.from_url(image.attrs["src"]) if image else None
+        return LastFmImage.from_url(image) if image else None
 
     async def scrape_track_image(self, url: str) -> LastFmImage | None:
         """Get track's top album image."""
-        soup = await self.scrape_page(f"{url}/+albums")
-        image = soup.select_one(".cover-art img")
-        return LastFmImage.from_url(image.attrs["src"]) if image else None
+        image = await self.scrape(scraping.parse_cover_image, f"{url}/+albums")
+        return LastFmImage.from_url(image) if image else None
 
     async def scrape_album_metadata(self, artist: str, album: str) -> dict | None:
         """Get more info about an album."""
         url = f"https://www.last.fm/music/{self.double_encode(artist)}/{self.double_encode(album)}"
-        soup = await self.scrape_page(url)
-        metadata_headings = soup.select(".catalogue-metadata-heading")
-        metadata_values = soup.select(".catalogue-metadata-description")
-        metadata = dict(
-            zip(
-                [h.text.strip() for h in metadata_headings],
-                [v.text.strip() for v in metadata_values],
-            )
-        )
+        metadata = await self.scrape(scraping.parse_catalogue_metadata, url)
         if metadata:
             release_date = None
             if metadata.get("Release Date"):
@@ -552,18 +843,24 @@ class LastFmApi:
     ) -> list[LastFmImage]:
         """Get image hashes for user's top n artists"""
         url: str = f"https://www.last.fm/user/{username}/library/artists?date_preset={period.web_format()}"
-        tasks = []
-        for i in range(1, math.ceil(amount / 50) + 1):
-            params = {"page": str(i)} if i > 1 else None
-            tasks.append(self.scrape_page(url, params))
+
+        async def get_page(i):
+            return await self.scrape_library_page(
+                url, {"page": str(i)} if i > 1 else None
+            )
+
+        pages = {}
+        async for i, page in self.map_users(
+            get_page, range(1, math.ceil(amount / 50) + 1)
+        ):
+            pages[i] = page
 
         images = []
-        soup: BeautifulSoup
-        for soup in await asyncio.gather(*tasks):
-            if len(images) >= amount:
+        for i in sorted(pages):
+            page = pages[i]
+            if page is None or len(images) >= amount:
                 break
 
-            imagedivs = soup.select(".chartlist-image .avatar img")
-            images += [LastFmImage.from_url(div.attrs["src"]) for div in imagedivs]
+            images += [LastFmImage.from_url(src) for src in page.avatar_images]
 
         return images
@@ -0,0 +1,56 @@
+# SPDX-FileCopyrightText: 2018-2025 Joonas Rautiola <mail@joinemm.dev>
+# SPDX-License-Identifier: MPL-2.0
+# https://git.joinemm.dev/miso-bot
+
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Hashable
+
+
+class LRUCache:
+    """Bounded in-process key-value store with optional per-key expiry.
+
+    Least recently used keys are evicted once `maxsize` is reached.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.data: OrderedDict[Hashable, tuple[float | None, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            expires_at, value = self.data[key]
+        except KeyError:
+            return default
+
+        if expires_at is not None and expires_at < monotonic():
+            del self.data[key]
+            return default
+
+        self.data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, expiry: float | None = None):
+        expires_at = monotonic() + expiry if expiry is not None else None
+        self.data[key] = (expires_at, value)
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            return self.data.pop(key)[1]
+        except KeyError:
+            return default
+
+    def clear(self):
+        self.data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+_MISSING = object()
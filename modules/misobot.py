@@ -16,11 +16,13 @@ from discord.errors import Forbidden
 from discord.ext import commands
 from loguru import logger
 
-from modules import cache, maria, util
+from modules import cache, collage, colorpool, maria, util
 from modules.help import EmbedHelpCommand
+from modules.ipc import IPC, ClusterInfo
 from modules.keychain import Keychain
 from modules.reddit import Reddit
 from modules.redis import Redis
+from modules.renderer import RenderClient
 
 
 @dataclass
@@ -48,8 +50,16 @@ class MisoContext(commands.Context):
 
 class MisoBot(commands.AutoShardedBot):
     def __init__(
-        self, extensions: list[str], default_prefix: str, **kwargs: dict[str, Any]
+        self,
+        extensions: list[str],
+        default_prefix: str,
+        cluster: ClusterInfo | None = None,
+        **kwargs: dict[str, Any],
     ):
+        cluster = cluster or ClusterInfo()
+        if cluster.shard_ids is not None:
+            kwargs["shard_ids"] = cluster.shard_ids  # type: ignore
+            kwargs["shard_count"] = cluster.shard_count  # type: ignore
         super().__init__(
             help_command=EmbedHelpCommand(),
             activity=Activity(type=ActivityType.playing, name="Booting up..."),
@@ -84,6 +94,9 @@ class MisoBot(commands.AutoShardedBot):
             ),
             **kwargs,
         )
+        self.cluster = cluster
+        # every cluster has its own pool, they shouldn't add up to more than the cores
+        colorpool.pool.resize(colorpool.default_workers(cluster.count))
         self.default_prefix = default_prefix
         self.extensions_to_load = extensions
         self.start_time = time()
@@ -101,6 +114,9 @@ class MisoBot(commands.AutoShardedBot):
         self.trace_config = aiohttp.TraceConfig
         self.session: aiohttp.ClientSession
         self.reddit_client = Reddit(self)
+        self.renderer = RenderClient(self)
+        self.ipc = IPC(self)
+        self.ipc.handle("counts", self.local_counts)
         self.donator_cache = {}
         self.register_hooks()
 
@@ -134,17 +150,25 @@ class MisoBot(commands.AutoShardedBot):
             timeout=aiohttp.ClientTimeout(total=60),
             trace_configs=[self.trace_config],
         )
+        await self.renderer.start()
         await self.redis.start()
+        self.cache.start_listening()
+        self.ipc.start()
         await self.db.initialize_pool()
+        # the cogs don't need the settings to load, so both can happen at once
+        await asyncio.gather(
+            self.initialize_settings_cache(),
+            self.load_all_extensions(),
+        )
+        boot_up_time = time() - self.start_time
+        logger.info(f"Setup hook done in {util.stringfromtime(boot_up_time)}")
+
+    async def initialize_settings_cache(self):
         try:
             await self.cache.initialize_settings_cache()
         except Exception as e:
             logger.error(e)
 
-        await self.load_all_extensions()
-        boot_up_time = time() - self.start_time
-        logger.info(f"Setup hook done in {util.stringfromtime(boot_up_time)}")
-
     def register_hooks(self):
         """Register event hooks to the bot"""
         self.before_invoke(self.before_any_command)
@@ -156,9 +180,10 @@ class MisoBot(commands.AutoShardedBot):
         tasks = []
 
         async def load(extension):
+            start = time()
             try:
                 await self.load_extension(extension)
-                logger.info(f"Loaded [ {extension} ]")
+                logger.info(f"Loaded [ {extension} ] in {time() - start:.2f}s")
             except Exception as error:
                 logger.error(f"Error loading [ {extension} ]")
                 traceback.print_exception(type(error), error, error.__traceback__)
@@ -174,10 +199,23 @@ class MisoBot(commands.AutoShardedBot):
 
     async def close(self):
         """Overrides built-in close()"""
+        self.cache.stop_listening()
+        self.ipc.stop()
         await self.session.close()
+        await self.renderer.close()
+        await self.redis.close()
         await self.db.cleanup()
+        colorpool.pool.shutdown()
+        collage.pool.shutdown()
         await super().close()
 
+    async def before_identify_hook(self, shard_id: int | None, *, initial=False):
+        """With several clusters, identifying is rate limited across all of them."""
+        if self.cluster.count == 1 or shard_id is None:
+            return await super().before_identify_hook(shard_id, initial=initial)
+
+        await self.ipc.wait_for_identify(shard_id)
+
     async def on_message(self, message: discord.Message):
         """Overrides built-in on_message()"""
         await super().on_message(message)
@@ -189,6 +227,8 @@ class MisoBot(commands.AutoShardedBot):
             self.boot_up_time = time() - self.start_time
         logger.info(f"Connected in {util.stringfromtime(self.boot_up_time)}")
         logger.info(f"Loading complete | running {len(latencies)} shards")
+        if self.cluster.count > 1:
+            logger.info(f"This is cluster {self.cluster.id + 1}/{self.cluster.count}")
 
     @staticmethod
     async def before_any_command(ctx: MisoContext):
@@ -228,3 +268,25 @@ class MisoBot(commands.AutoShardedBot):
     @property
     def guild_count(self) -> int:
         return len(self.guilds)
+
+    def owns_guild(self, guild_id: int | None) -> bool:
+        """Whether the guild belongs to one of the shards of this cluster.
+
+        Anything not tied to a guild is handled by the primary cluster.
+        """
+        if guild_id is None or self.cluster.shard_ids is None:
+            return self.cluster.is_primary
+
+        shard_id = (guild_id >> 22) % (self.cluster.shard_count or 1)
+        return shard_id in self.cluster.shard_ids
+
+    async def local_counts(self) -> list[int]:
+        return [self.guild_count, self.member_count]
+
+    async def cluster_counts(self) -> tuple[int, int]:
+        """Guild and member counts of every cluster combined."""
+        counts = await self.ipc.gather("counts")
+        return (
+            sum(guilds for guilds, _ in counts),
+            sum(members for _, members in counts),
+        )
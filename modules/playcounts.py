@@ -0,0 +1,232 @@
+# SPDX-FileCopyrightText: 2018-2025 Joonas Rautiola <mail@joinemm.dev>
+# SPDX-License-Identifier: MPL-2.0
+# https://git.joinemm.dev/miso-bot
+
+from typing import Literal
+
+from loguru import logger
+
+from modules.lastfm import LastFmApi, Period, background_priority, non_empty
+from modules.misobot import MisoBot
+
+IndexKind = Literal["artist", "album", "track"]
+
+
+class PlaycountIndex:
+    """Per user alltime playcounts of artists, albums and tracks.
+
+    Filled in the background from the users' top artist/album/track pages,
+    so whoknows can rank a whole server with a single query
+    instead of an api call per member.
+    """
+
+    PAGE_SIZE = 1000
+    MAX_PAGES = 2
+    REFRESH_INTERVAL_HOURS = 24
+
+    # table and the columns identifying one entity, in order
+    TABLES: dict[IndexKind, tuple[str, tuple[str, ...]]] = {
+        "artist": ("lastfm_artist_playcount", ("artist_name",)),
+        "album": ("lastfm_album_playcount", ("artist_name", "album_name")),
+        "track": ("lastfm_track_playcount", ("artist_name", "track_name")),
+    }
+
+    def __init__(self, bot: MisoBot, api: LastFmApi):
+        self.bot = bot
+        self.api = api
+
+    async def request(self, usernames: list[str]):
+        """Queue users to be indexed if they aren't already."""
+        if not usernames:
+            return
+
+        await self.bot.db.executemany(
+            "INSERT IGNORE lastfm_playcount_index_state (lastfm_username) VALUES (%s)",
+            [(username,) for username in usernames],
+        )
+
+    async def cutoffs(self, kind: IndexKind, usernames: list[str]) -> dict[str, int]:
+        """Casefolded username -> lowest indexed playcount, for the given users
+        that have been indexed at least once. Zero if their whole list fit."""
+        if not usernames:
+            return {}
+
+        data = await self.bot.db.fetch(
+            f"""
+            SELECT lastfm_username, {kind}_cutoff FROM lastfm_playcount_index_state
+            WHERE lastfm_username IN %s AND indexed_at IS NOT NULL
+            """,
+            usernames,
+        )
+        return {username.casefold(): cutoff for username, cutoff in data or []}
+
+    async def users_to_refresh(self, amount: int) -> list[str]:
+        """Never indexed users first, then the ones with the oldest index."""
+        return await self.bot.db.fetch_flattened(
+            """
+            SELECT lastfm_username FROM lastfm_playcount_index_state
+            WHERE indexed_at IS NULL
+                OR indexed_at < UTC_TIMESTAMP() - INTERVAL %s HOUR
+            ORDER BY indexed_at IS NOT NULL, indexed_at
+            LIMIT %s
+            """,
+            self.REFRESH_INTERVAL_HOURS,
+            amount,
+        )
+
+    async def refresh(self, username: str) -> list[tuple[str, int]]:
+        """Re-index the user's top artists, albums and tracks.
+        Returns the new artist playcounts."""
+        with background_priority():
+            artists, artist_cutoff = await self.top_pages("artist", username)
+            albums, album_cutoff = await self.top_pages("album", username)
+            tracks, track_cutoff = await self.top_pages("track", username)
+
+        artist_playcounts = [
+            (artist["name"], int(artist["playcount"])) for artist in artists
+        ]
+        await self.store_user(
+            "artist",
+            username,
+            [((name,), playcount) for name, playcount in artist_playcounts],
+        )
+        await self.store_user(
+            "album",
+            username,
+            [
+                ((album["artist"]["name"], album["name"]), int(album["playcount"]))
+                for album in albums
+            ],
+        )
+        await self.store_user(
+            "track",
+            username,
+            [
+                ((track["artist"]["name"], track["name"]), int(track["playcount"]))
+                for track in tracks
+            ],
+        )
+        await self.mark_indexed(username, artist_cutoff, album_cutoff, track_cutoff)
+        logger.info(
+            f"Indexed playcounts of {username}: "
+            f"{len(artists)} artists, {len(albums)} albums, {len(tracks)} tracks"
+        )
+        return artist_playcounts
+
+    async def mark_indexed(
+        self,
+        username: str,
+        artist_cutoff: int = 0,
+        album_cutoff: int = 0,
+        track_cutoff: int = 0,
+    ):
+        await self.bot.db.execute(
+            """
+            INSERT INTO lastfm_playcount_index_state (
+                lastfm_username, indexed_at, artist_cutoff, album_cutoff, track_cutoff
+            )
+                VALUES (%s, UTC_TIMESTAMP(), %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                indexed_at = VALUES(indexed_at),
+                artist_cutoff = VALUES(artist_cutoff),
+                album_cutoff = VALUES(album_cutoff),
+                track_cutoff = VALUES(track_cutoff)
+            """,
+            username,
+            artist_cutoff,
+            album_cutoff,
+            track_cutoff,
+        )
+
+    async def top_pages(self, kind: IndexKind, username: str) -> tuple[list[dict], int]:
+        """The user's top list up to MAX_PAGES, and the playcount it was cut at.
+        The cutoff is zero when the whole list fit.
+        These pages are too big to be worth caching, so the cache is bypassed."""
+        results = []
+        for page in range(1, self.MAX_PAGES + 1):
+            data = await self.api.fetch(
+                f"user.gettop{kind}s",
+                {
+                    "user": username,
+                    "period": Period.OVERALL.value,
+                    "limit": self.PAGE_SIZE,
+                    "page": page,
+                },
+            )
+            data = non_empty(data[f"top{kind}s"])
+            results += data[kind]
+            if page >= int(data["@attr"]["totalPages"]):
+                return results, 0
+
+        # anything not on these pages has been played at most this many times
+        return results, int(results[-1]["playcount"]) if results else 0
+
+    async def store_user(
+        self,
+        kind: IndexKind,
+        username: str,
+        rows: list[tuple[tuple[str, ...], int]],
+    ):
+        """Replace the playcounts of one user, given as (entity key, playcount) pairs.
+        Entities that are no longer in the list are removed."""
+        table, columns = self.TABLES[kind]
+        keys = [key if len(key) > 1 else key[0] for key, _ in rows]
+        if keys:
+            await self.bot.db.execute(
+                f"""
+                DELETE FROM {table}
+                WHERE lastfm_username = %s AND ({", ".join(columns)}) NOT IN %s
+                """,
+                username,
+                keys,
+            )
+        else:
+            await self.bot.db.execute(
+                f"DELETE FROM {table} WHERE lastfm_username = %s", username
+            )
+
+        await self.upsert(
+            kind, [(username, *key, playcount) for key, playcount in rows]
+        )
+
+    async def store_entity(
+        self, kind: IndexKind, key: tuple[str, ...], rows: list[tuple[str, int]]
+    ):
+        """Upsert the playcounts of one entity, given as (username, playcount) pairs."""
+        await self.upsert(
+            kind, [(username, *key, playcount) for username, playcount in rows]
+        )
+
+    async def upsert(self, kind: IndexKind, rows: list[tuple]):
+        if not rows:
+            return
+
+        table, columns = self.TABLES[kind]
+        await self.bot.db.executemany(
+            f"""
+            INSERT INTO {table} (lastfm_username, {", ".join(columns)}, playcount)
+                VALUES (%s, {", ".join("%s" for _ in columns)}, %s)
+            ON DUPLICATE KEY UPDATE
+                playcount = VALUES(playcount)
+            """,
+            rows,
+        )
+
+    async def lookup(
+        self, kind: IndexKind, key: tuple[str, ...], usernames: list[str]
+    ) -> dict[str, int]:
+        """Casefolded username -> playcount of the entity, for the given users."""
+        if not usernames:
+            return {}
+
+        table, columns = self.TABLES[kind]
+        data = await self.bot.db.fetch(
+            f"""
+            SELECT lastfm_username, playcount FROM {table}
+            WHERE {" AND ".join(f"{column} = %s" for column in columns)}
+                AND lastfm_username IN %s
+            """,
+            *key,
+            usernames,
+        )
+        return {username.casefold(): playcount for username, playcount in data or []}
@@ -2,9 +2,33 @@
 # SPDX-License-Identifier: MPL-2.0
 # https://git.joinemm.dev/miso-bot
 
+import asyncio
 import os
+from typing import AsyncIterator
 
 import redis.asyncio as redis
+from loguru import logger
+from redis.exceptions import RedisError
+
+
+class LocalBus:
+    """In-process stand-in for redis pub/sub, used when redis is not configured."""
+
+    def __init__(self) -> None:
+        self.subscribers: dict[str, set[asyncio.Queue[bytes]]] = {}
+
+    async def publish(self, channel: str, message: bytes):
+        for queue in self.subscribers.get(channel, ()):
+            queue.put_nowait(message)
+
+    async def subscribe(self, channel: str) -> AsyncIterator[bytes]:
+        queue: asyncio.Queue[bytes] = asyncio.Queue()
+        self.subscribers.setdefault(channel, set()).add(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.subscribers[channel].discard(queue)
 
 
 class Redis:
@@ -12,6 +36,7 @@ class Redis:
         self.url = os.environ.get("REDIS_URL")
         self.enabled = self.url is not None
         self.pool: redis.Redis
+        self.local_bus = LocalBus()
 
     async def start(self):
         if self.enabled:
@@ -29,6 +54,38 @@ class Redis:
 
         return await self.pool.get(key)
 
+    async def claim(self, key, value, milliseconds: int) -> bool:
+        """Set the key unless someone else already holds it."""
+        if not self.enabled:
+            return True
+
+        return bool(await self.pool.set(key, value, px=milliseconds, nx=True))
+
+    async def publish(self, channel: str, message: bytes):
+        if not self.enabled:
+            return await self.local_bus.publish(channel, message)
+
+        try:
+            await self.pool.publish(channel, message)
+        except RedisError as e:
+            logger.warning(f"Could not publish to {channel}: {e}")
+
+    async def subscribe(self, channel: str) -> AsyncIterator[bytes]:
+        """Messages published to the channel, until the connection is lost."""
+        if not self.enabled:
+            async for message in self.local_bus.subscribe(channel):
+                yield message
+            return
+
+        pubsub = self.pool.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(channel)
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    yield message["data"]
+        finally:
+            await pubsub.aclose()
+
     async def close(self):
         if self.enabled:
             await self.pool.close()
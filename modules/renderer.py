@@ -0,0 +1,114 @@
+# SPDX-FileCopyrightText: 2018-2025 Joonas Rautiola <mail@joinemm.dev>
+# SPDX-License-Identifier: MPL-2.0
+# https://git.joinemm.dev/miso-bot
+
+import asyncio
+import io
+import os
+import random
+from time import monotonic
+from typing import TYPE_CHECKING
+
+import aiohttp
+import orjson
+from loguru import logger
+
+from modules import exceptions
+
+if TYPE_CHECKING:
+    from modules.misobot import MisoBot
+
+IMAGE_SERVER_HOST = os.environ.get("IMAGE_SERVER_HOST")
+
+
+class RendererUnavailable(exceptions.RendererError):
+    """The render failed in a way that is worth retrying."""
+
+
+class RenderClient:
+    """Client for the html rendering server.
+
+    Requests beyond what the renderer can handle at once queue here instead
+    of piling up on the server. Failed renders are retried with jittered
+    exponential backoff, while still holding their place.
+    """
+
+    URL = f"http://{IMAGE_SERVER_HOST}:3000/template"
+    CONCURRENCY = int(os.environ.get("RENDERER_CONCURRENCY", 4))
+    TIMEOUT = aiohttp.ClientTimeout(total=30, connect=5)
+    KEEPALIVE_TIMEOUT = 60
+    MAX_ATTEMPTS = 3
+    RETRY_DELAY = 0.5
+
+    def __init__(self, bot: "MisoBot"):
+        self.bot = bot
+        self.session: aiohttp.ClientSession | None = None
+        self.semaphore = asyncio.Semaphore(self.CONCURRENCY)
+        self.waiting = 0
+        self.running = 0
+
+    async def start(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=self.CONCURRENCY,
+                limit_per_host=self.CONCURRENCY,
+                keepalive_timeout=self.KEEPALIVE_TIMEOUT,
+            ),
+            json_serialize=lambda x: orjson.dumps(x).decode(),
+            timeout=self.TIMEOUT,
+            trace_configs=[self.bot.trace_config],
+        )
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    async def render(self, template: str, context: dict) -> io.BytesIO:
+        queued_at = monotonic()
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        if prom := self.bot.get_cog("Prometheus"):
+            prom.render_queue_wait.observe(monotonic() - queued_at)  # type: ignore
+
+        self.running += 1
+        try:
+            return await self.render_with_retries(template, context)
+        finally:
+            self.running -= 1
+            self.semaphore.release()
+
+    async def render_with_retries(self, template: str, context: dict) -> io.BytesIO:
+        for attempt in range(self.MAX_ATTEMPTS):
+            try:
+                return await self.post(template, context)
+            except RendererUnavailable as e:
+                if attempt + 1 == self.MAX_ATTEMPTS:
+                    raise
+
+                delay = self.RETRY_DELAY * 2**attempt * random.uniform(0.5, 1.5)
+                logger.warning(f"Render failed ({e}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+        raise exceptions.RendererError("Rendering failed")
+
+    async def post(self, template: str, context: dict) -> io.BytesIO:
+        assert self.session is not None
+        try:
+            async with self.session.post(
+                self.URL, json=context, params={"template": template}
+            ) as response:
+                if response.status == 200:
+                    return io.BytesIO(await response.read())
+
+                error = f"{response.status} : {await response.text()}"
+                if response.status >= 500:
+                    raise RendererUnavailable(error)
+                raise exceptions.RendererError(error)
+        except aiohttp.ClientConnectionError:
+            raise RendererUnavailable("Unable to connect to the HTML Rendering server")
+        except asyncio.TimeoutError:
+            raise RendererUnavailable("The HTML Rendering server timed out")
@@ -0,0 +1,143 @@
+# SPDX-FileCopyrightText: 2018-2025 Joonas Rautiola <mail@joinemm.dev>
+# SPDX-License-Identifier: MPL-2.0
+# https://git.joinemm.dev/miso-bot
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, TypeVar
+
+import lxml.html
+from lxml.html import HtmlElement
+
+T = TypeVar("T")
+
+# lxml releases the GIL while parsing, so a few threads keep up with the scrapers
+parser_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="html-parser")
+
+
+async def parse(parser: Callable[[str], T], content: str) -> T:
+    """Run a page parser in the parser threads, keeping the event loop free."""
+    return await asyncio.get_running_loop().run_in_executor(
+        parser_pool, parser, content
+    )
+
+
+def has_class(name: str) -> str:
+    """XPath predicate equivalent to the css selector `.name`"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def first_attribute(root: HtmlElement, xpath: str, attribute: str) -> str | None:
+    for element in root.xpath(xpath):
+        return element.get(attribute)
+    return None
+
+
+def text_of(element: HtmlElement) -> str:
+    return element.text_content()
+
+
+@dataclass
+class ScrapedPage:
+    """Parsed result of a page, with the validators needed to revalidate it."""
+
+    result: Any
+    fresh_until: float
+    etag: str | None = None
+    last_modified: str | None = None
+
+    def revalidation_headers(self) -> dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+@dataclass
+class LibraryPage:
+    """The parts of a Last.fm library listing page that are used by the bot."""
+
+    # (playcount, name) of every row on the page
+    rows: list[tuple[int, str]] = field(default_factory=list)
+    # rows of each chartlist separately, in page order
+    chartlists: list[list[tuple[int, str]]] = field(default_factory=list)
+    page_count: int = 1
+    cover_image: str | None = None
+    header_image: str | None = None
+    avatar_images: list[str] = field(default_factory=list)
+    metadata: list[str] = field(default_factory=list)
+
+
+def chartlist_rows(root: HtmlElement) -> list[tuple[int, str]]:
+    results = []
+    for row in root.xpath(f".//*[{has_class('chartlist-row')}]"):
+        name = row.xpath(f".//*[{has_class('chartlist-name')}]//a")
+        playcount = row.xpath(f".//*[{has_class('chartlist-count-bar-value')}]")
+        if name and playcount:
+            results.append(
+                (
+                    int(text_of(playcount[0]).split()[0].replace(",", "")),
+                    text_of(name[0]),
+                )
+            )
+
+    return results
+
+
+def parse_library_page(content: str) -> LibraryPage:
+    root = lxml.html.document_fromstring(content)
+    page = LibraryPage(
+        rows=chartlist_rows(root),
+        chartlists=[
+            chartlist_rows(chartlist)
+            for chartlist in root.xpath(f"//*[{has_class('chartlist')}]")
+        ],
+        cover_image=first_attribute(
+            root,
+            f"//*[{has_class('chartlist-image')}]//*[{has_class('cover-art')}]//img",
+            "src",
+        ),
+        header_image=first_attribute(
+            root, f"//span[{has_class('library-header-image')}]//img", "src"
+        ),
+        avatar_images=[
+            img.get("src")
+            for img in root.xpath(
+                f"//*[{has_class('chartlist-image')}]//*[{has_class('avatar')}]//img"
+            )
+        ],
+        metadata=[
+            text_of(item)
+            for item in root.xpath(f"//*[{has_class('metadata-display')}]")
+        ],
+    )
+    pages = root.xpath(f"//*[{has_class('pagination-page')}]")
+    if pages:
+        page.page_count = int(text_of(pages[-1]).strip())
+
+    return page
+
+
+def parse_artist_image(content: str) -> str | None:
+    root = lxml.html.document_fromstring(content)
+    return first_attribute(
+        root, f"//*[{has_class('image-list-item-wrapper')}]//a//img", "src"
+    )
+
+
+def parse_cover_image(content: str) -> str | None:
+    root = lxml.html.document_fromstring(content)
+    return first_attribute(root, f"//*[{has_class('cover-art')}]//img", "src")
+
+
+def parse_catalogue_metadata(content: str) -> dict[str, str]:
+    root = lxml.html.document_fromstring(content)
+    headings = root.xpath(f"//*[{has_class('catalogue-metadata-heading')}]")
+    values = root.xpath(f"//*[{has_class('catalogue-metadata-description')}]")
+    return {
+        text_of(heading).strip(): text_of(value).strip()
+        for heading, value in zip(headings, values)
+    }
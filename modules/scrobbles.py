@@ -0,0 +1,179 @@
+# SPDX-FileCopyrightText: 2018-2025 Joonas Rautiola <mail@joinemm.dev>
+# SPDX-License-Identifier: MPL-2.0
+# https://git.joinemm.dev/miso-bot
+
+from datetime import datetime
+
+import arrow
+from loguru import logger
+
+from modules.lastfm import LastFmApi, background_priority
+from modules.misobot import MisoBot
+
+
+class ScrobbleStore:
+    """Local copy of linked users' scrobble history.
+
+    History is synced oldest page first, within a time window fixed when the sync
+    starts, using the timestamp up to which everything is stored as a watermark.
+    The stored rows are always a complete prefix of the user's history and a sync
+    can stop and resume at any page.
+    """
+
+    PAGE_SIZE = 200
+    MAX_PAGES_PER_SYNC = 10
+    RESYNC_INTERVAL_MINUTES = 10
+
+    def __init__(self, bot: MisoBot, api: LastFmApi):
+        self.bot = bot
+        self.api = api
+        self.active_users: dict[str, datetime] = {}
+
+    def mark_active(self, username: str):
+        """Remember that this user ran a command, synced in priority."""
+        self.active_users[username] = arrow.utcnow().datetime
+
+    async def flush_activity(self):
+        if not self.active_users:
+            return
+
+        rows = list(self.active_users.items())
+        self.active_users.clear()
+        await self.bot.db.executemany(
+            """
+            INSERT INTO lastfm_sync_state (lastfm_username, last_active)
+                VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE
+                last_active = VALUES(last_active)
+            """,
+            rows,
+        )
+
+    async def users_to_sync(self, amount: int) -> list[tuple[str, int]]:
+        """Most recently active users that have not been synced in a while."""
+        data = await self.bot.db.fetch(
+            """
+            SELECT lastfm_username, synced_until FROM lastfm_sync_state
+            WHERE last_synced IS NULL
+                OR last_synced < UTC_TIMESTAMP() - INTERVAL %s MINUTE
+            ORDER BY last_active DESC
+            LIMIT %s
+            """,
+            self.RESYNC_INTERVAL_MINUTES,
+            amount,
+        )
+        return data or []
+
+    async def sync(self, username: str, synced_until: int) -> int:
+        """Store scrobbles newer than the watermark, returns the amount stored."""
+        try:
+            stored = await self.sync_pages(username, synced_until)
+        finally:
+            # failed syncs are also marked so that they don't block the queue
+            await self.bot.db.execute(
+                """
+                UPDATE lastfm_sync_state SET last_synced = UTC_TIMESTAMP()
+                WHERE lastfm_username = %s
+                """,
+                username,
+            )
+
+        if stored:
+            logger.info(f"Synced {stored} scrobbles for Last.fm user {username}")
+
+        return stored
+
+    async def sync_pages(self, username: str, synced_until: int) -> int:
+        # the window is closed at the start, so that scrobbles arriving during
+        # the sync don't shift the page boundaries under us
+        until = arrow.utcnow().int_timestamp
+        with background_priority():
+            first_page = await self.api.user_get_recent_tracks(
+                username,
+                limit=self.PAGE_SIZE,
+                page=1,
+                from_ts=synced_until + 1,
+                to_ts=until,
+            )
+            total_pages = int(first_page["@attr"]["totalPages"])
+
+            stored = 0
+            # pages are ordered newest first, so walk backwards from the last page
+            for page in range(
+                total_pages, max(total_pages - self.MAX_PAGES_PER_SYNC, 0), -1
+            ):
+                if page == 1:
+                    data = first_page
+                else:
+                    data = await self.api.user_get_recent_tracks(
+                        username,
+                        limit=self.PAGE_SIZE,
+                        page=page,
+                        from_ts=synced_until + 1,
+                        to_ts=until,
+                    )
+
+                rows = [
+                    (
+                        username,
+                        int(track["date"]["uts"]),
+                        track["artist"]["#text"],
+                        track["album"]["#text"],
+                        track["name"],
+                    )
+                    for track in data["track"]
+                    if track.get("date")
+                ]
+                if not rows:
+                    continue
+
+                await self.bot.db.executemany(
+                    """
+                    INSERT IGNORE lastfm_scrobble
+                        (lastfm_username, played_at, artist_name, album_name, track_name)
+                    VALUES (%s, %s, %s, %s, %s)
+                    """,
+                    rows,
+                )
+                stored += len(rows)
+                # advance the watermark after every page so progress is never lost.
+                # the next page can continue from the same second, so the newest
+                # second is only counted as synced once the whole window is done
+                await self.set_watermark(
+                    username, max(synced_until, *(row[1] - 1 for row in rows))
+                )
+
+            if total_pages <= self.MAX_PAGES_PER_SYNC:
+                await self.set_watermark(username, max(synced_until, until - 1))
+
+        return stored
+
+    async def set_watermark(self, username: str, synced_until: int):
+        await self.bot.db.execute(
+            """
+            INSERT INTO lastfm_sync_state (lastfm_username, synced_until)
+                VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE
+                synced_until = VALUES(synced_until)
+            """,
+            username,
+            synced_until,
+        )
+
+    ###########
+    # QUERIES #
+    ###########
+
+    async def nth_scrobble(self, username: str, n: int) -> tuple[str, str] | None:
+        """Track name and artist name of the user's n:th scrobble, if stored."""
+        row = await self.bot.db.fetch_row(
+            """
+            SELECT track_name, artist_name FROM lastfm_scrobble
+            WHERE lastfm_username = %s
+            ORDER BY played_at
+            LIMIT 1 OFFSET %s
+            """,
+            username,
+            n - 1,
+        )
+        return (row[0], row[1]) if row else None
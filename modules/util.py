@@ -6,7 +6,6 @@ import asyncio
 import copy
 import io
 import math
-import os
 import re
 from collections import namedtuple
 from time import time
@@ -14,7 +13,6 @@ from typing import TYPE_CHECKING, Callable, Optional
 
 import aiohttp
 import arrow
-import colorgram
 import discord
 import regex
 from discord.ext import commands
@@ -24,14 +22,12 @@ from PIL import Image, UnidentifiedImageError
 from random_user_agent.params import HardwareType
 from random_user_agent.user_agent import UserAgent
 
-from modules import emoji_literals, emojis, exceptions, queries
+from modules import colorpool, emoji_literals, emojis, exceptions, queries
 from modules.ui import RowPaginator
 
 if TYPE_CHECKING:
     from modules.misobot import MisoBot
 
-IMAGE_SERVER_HOST = os.environ.get("IMAGE_SERVER_HOST")
-
 Rgb = namedtuple("Rgb", ("r", "g", "b"))
 
 
@@ -178,37 +174,35 @@ async def find_user(bot: "MisoBot", user_id: int) -> discord.User | None:
 async def determine_prefix(bot, message: discord.Message):
     """Get the prefix used in the invocation context"""
     if message.guild:
-        prefix = bot.cache.prefixes.get(str(message.guild.id), bot.default_prefix)
+        prefix = bot.cache.prefixes.get(message.guild.id, bot.default_prefix)
         return commands.when_mentioned_or(prefix)(bot, message)
     return commands.when_mentioned_or(bot.default_prefix)(bot, message)
 
 
 def user_is_blacklisted(bot: "MisoBot", user: discord.User | discord.Member) -> bool:
-    return user.id in bot.cache.blacklist["global"]["user"]
+    return user.id in bot.cache.blacklisted_users
 
 
 async def is_blacklisted(ctx: commands.Context) -> bool:
     """Check command invocation context for blacklist triggers"""
-    if ctx.author.id in ctx.bot.cache.blacklist["global"]["user"]:
+    if ctx.author.id in ctx.bot.cache.blacklisted_users:
         raise exceptions.BlacklistedUser()
 
     if ctx.guild is None or ctx.command is None:
         return True
 
-    if ctx.guild.id in ctx.bot.cache.blacklist["global"]["guild"]:
+    if ctx.guild.id in ctx.bot.cache.blacklisted_guilds:
         raise exceptions.BlacklistedGuild()
 
-    if ctx.channel.id in ctx.bot.cache.blacklist["global"]["channel"]:
+    if ctx.channel.id in ctx.bot.cache.blacklisted_channels:
         raise exceptions.BlacklistedChannel()
 
-    if ctx.bot.cache.blacklist.get(str(ctx.guild.id)) is not None:
-        if ctx.author.id in ctx.bot.cache.blacklist[str(ctx.guild.id)]["member"]:
+    guild_blacklist = ctx.bot.cache.guild_blacklists.get(ctx.guild.id)
+    if guild_blacklist is not None:
+        if ctx.author.id in guild_blacklist.members:
             raise exceptions.BlacklistedMember()
 
-        if (
-            ctx.command.qualified_name.lower()
-            in ctx.bot.cache.blacklist[str(ctx.guild.id)]["command"]
-        ):
+        if ctx.command.qualified_name.lower() in guild_blacklist.commands:
             raise exceptions.BlacklistedCommand()
 
     return True
@@ -728,13 +722,10 @@ async def color_from_image_url(
         return fallback
     try:
         async with session.get(url) as response:
-            image = Image.open(io.BytesIO(await response.read()))
-            if size_limit and sum(image.size) > 2048:
-                raise ValueError("Image is too large")
-            colors = await asyncio.get_running_loop().run_in_executor(
-                None, lambda: colorgram.extract(image, 1)
-            )
-            dominant_color: Rgb = colors[0].rgb
+            data = await response.read()
+        dominant_color = Rgb(
+            *await colorpool.pool.extract(data, 2048 if size_limit else None)
+        )
     except Exception as e:
         if ignore_errors:
             return fallback
@@ -743,19 +734,6 @@ async def color_from_image_url(
     return rgb_to_hex(dominant_color)
 
 
-async def rgb_from_image_url(session: aiohttp.ClientSession, url: str) -> Rgb | None:
-    try:
-        async with session.get(url) as response:
-            response.raise_for_status()
-            image = Image.open(io.BytesIO(await response.read()))
-            colors = await asyncio.get_running_loop().run_in_executor(
-                None, lambda: colorgram.extract(image, 1)
-            )
-            return colors[0].rgb
-    except aiohttp.ClientError:
-        return None
-
-
 def find_unicode_emojis(text):
     """Finds and returns all unicode emojis from a string"""
     emoji_list = set()
@@ -973,20 +951,6 @@ def format_html(template, replacements):
     return re.sub(r"\$(\S*?)\$", dictsub, template)
 
 
-async def render_html_template(bot, params, context):
-    try:
-        url = f"http://{IMAGE_SERVER_HOST}:3000/template"
-        async with bot.session.post(url, json=context, params=params) as response:
-            print(response.status)
-            if response.status == 200:
-                return io.BytesIO(await response.read())
-            raise exceptions.RendererError(
-                f"{response.status} : {await response.text()}"
-            )
-    except aiohttp.ClientConnectionError:
-        raise exceptions.RendererError("Unable to connect to the HTML Rendering server")
-
-
 def ordinal(n):
     """Return number with ordinal suffix eg. 1st, 2nd, 3rd, 4th..."""
     return str(n) + {1: "st", 2: "nd", 3: "rd"}.get(
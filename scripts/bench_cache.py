@@ -0,0 +1,123 @@
+# SPDX-FileCopyrightText: 2018-2025 Joonas Rautiola <mail@joinemm.dev>
+# SPDX-License-Identifier: MPL-2.0
+# https://git.joinemm.dev/miso-bot
+
+"""Memory use and lookup speed of the settings cache on synthetic data.
+
+    python -m scripts.bench_cache [guilds]
+
+Compares the old layout (str keys, list and dict rows) with the current one
+(int keys, named tuples and slots dataclasses). Every guild gets a prefix,
+starboard, logging, auto-embed and blacklist entry.
+"""
+
+import gc
+import random
+import sys
+import timeit
+import tracemalloc
+
+from modules.cache import (
+    GuildBlacklist,
+    LoggingSettings,
+    MediaAutoEmbed,
+    StarboardSettings,
+)
+
+
+def guild_ids(count: int) -> list[int]:
+    rng = random.Random(0)
+    return [rng.randrange(10**17, 10**19) for _ in range(count)]
+
+
+def old_layout(ids: list[int]) -> dict:
+    blacklist: dict = {"global": {"user": set(), "guild": set(), "channel": set()}}
+    cache = {
+        "prefixes": {},
+        "starboard_settings": {},
+        "logging_settings": {},
+        "media_auto_embed": {},
+        "blacklist": blacklist,
+    }
+    for guild_id in ids:
+        key = str(guild_id)
+        cache["prefixes"][key] = "!"
+        cache["starboard_settings"][key] = [
+            True,
+            guild_id + 1,
+            3,
+            "star",
+            None,
+            "unicode",
+            None,
+        ]
+        cache["logging_settings"][key] = {
+            "member_log_channel_id": guild_id + 2,
+            "ban_log_channel_id": None,
+            "message_log_channel_id": guild_id + 3,
+        }
+        cache["media_auto_embed"][key] = {
+            "instagram": True,
+            "twitter": False,
+            "tiktok": True,
+            "reddit": False,
+        }
+        blacklist[key] = {"member": {guild_id + 4}, "command": {"fm"}}
+
+    return cache
+
+
+def new_layout(ids: list[int]) -> dict:
+    cache = {
+        "prefixes": {},
+        "starboard_settings": {},
+        "logging_settings": {},
+        "media_auto_embed": {},
+        "guild_blacklists": {},
+    }
+    for guild_id in ids:
+        cache["prefixes"][guild_id] = "!"
+        cache["starboard_settings"][guild_id] = StarboardSettings(
+            True, guild_id + 1, 3, "star", None, "unicode", None
+        )
+        cache["logging_settings"][guild_id] = LoggingSettings(
+            guild_id + 2, None, guild_id + 3
+        )
+        cache["media_auto_embed"][guild_id] = MediaAutoEmbed(True, False, True, False)
+        cache["guild_blacklists"][guild_id] = GuildBlacklist({guild_id + 4}, {"fm"})
+
+    return cache
+
+
+def measure(name: str, build, ids: list[int], key):
+    gc.collect()
+    tracemalloc.start()
+    cache = build(ids)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    prefixes = cache["prefixes"]
+    # guild ids arrive as ints from discord, the old layout had to convert them
+    lookups = random.Random(1).choices(ids, k=1000)
+    number = 200
+    seconds = min(
+        timeit.repeat(
+            lambda: [prefixes.get(key(guild_id)) for guild_id in lookups],
+            number=number,
+            repeat=5,
+        )
+    )
+    per_lookup = seconds / (number * len(lookups)) * 1e9
+    print(f"{name:>4}: {size / 1e6:7.1f} MB, {per_lookup:5.0f} ns per prefix lookup")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    ids = guild_ids(count)
+    print(f"{count} guilds")
+    measure("old", old_layout, ids, key=lambda guild_id: str(guild_id))
+    measure("new", new_layout, ids, key=lambda guild_id: guild_id)
+
+
+if __name__ == "__main__":
+    main()
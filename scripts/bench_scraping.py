@@ -0,0 +1,132 @@
+# SPDX-FileCopyrightText: 2018-2025 Joonas Rautiola <mail@joinemm.dev>
+# SPDX-License-Identifier: MPL-2.0
+# https://git.joinemm.dev/miso-bot
+
+"""Parse time of a Last.fm library page, BeautifulSoup against plain lxml.
+
+    python -m scripts.bench_scraping [rows]
+
+The sample page is a trimmed down copy of the structure of a real library
+listing, with the given amount of chartlist rows (50 like Last.fm by default).
+"""
+
+import sys
+import timeit
+
+from bs4 import BeautifulSoup
+
+from modules import scraping
+
+ROW = """
+<tr class="chartlist-row chartlist-row--with-artist">
+  <td class="chartlist-index">{n}</td>
+  <td class="chartlist-image">
+    <a href="/music/Artist+{n}" class="cover-art">
+      <span class="avatar"><img src="https://lastfm.freetls.fastly.net/i/u/64s/{n:032x}.jpg" alt="Artist {n}" loading="lazy"></span>
+    </a>
+  </td>
+  <td class="chartlist-loved"><div class="chartlist-loved-button"></div></td>
+  <td class="chartlist-name"><a href="/music/Artist+{n}" title="Artist {n}">Artist {n}</a></td>
+  <td class="chartlist-bar">
+    <span class="chartlist-count-bar">
+      <a class="chartlist-count-bar-link" href="/user/someone/library/music/Artist+{n}">
+        <span class="chartlist-count-bar-slug" style="width:{width}%;"></span>
+        <span class="chartlist-count-bar-value">{playcount:,}<span class="stat-name"> scrobbles</span></span>
+      </a>
+    </span>
+  </td>
+</tr>
+"""
+
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head><title>Library | Last.fm</title>{scripts}</head>
+<body>
+  <nav class="masthead">{nav}</nav>
+  <header class="header--library">
+    <span class="library-header-image"><img src="https://lastfm.freetls.fastly.net/i/u/avatar170s/header.jpg"></span>
+    <ul class="metadata-list">
+      <li class="metadata-item"><p class="metadata-display">12,345</p></li>
+      <li class="metadata-item"><p class="metadata-display">678</p></li>
+    </ul>
+  </header>
+  <section>
+    <table class="chartlist chartlist--with-index chartlist--with-image">
+      <tbody>{rows}</tbody>
+    </table>
+    <ul class="pagination-list">
+      <li class="pagination-page"><a href="?page=1">1</a></li>
+      <li class="pagination-page"><a href="?page=2">2</a></li>
+      <li class="pagination-page"><a href="?page=14">14</a></li>
+    </ul>
+  </section>
+  <footer>{nav}</footer>
+</body>
+</html>
+"""
+
+
+def sample_page(rows: int) -> str:
+    return PAGE.format(
+        scripts="<script>var config = {};</script>" * 20,
+        nav="".join(
+            f'<a class="nav-link" href="/link/{i}">Link {i}</a>' for i in range(40)
+        ),
+        rows="".join(
+            ROW.format(n=n, width=100 - n % 100, playcount=100_000 // (n + 1))
+            for n in range(1, rows + 1)
+        ),
+    )
+
+
+def parse_with_soup(content: str) -> scraping.LibraryPage:
+    """How the pages were parsed before modules.scraping."""
+    soup = BeautifulSoup(content, "lxml")
+    rows = []
+    for row in soup.select(".chartlist-row"):
+        name = row.select_one(".chartlist-name a")
+        playcount = row.select_one(".chartlist-count-bar-value")
+        if name and playcount:
+            rows.append(
+                (int(playcount.get_text().split()[0].replace(",", "")), name.text)
+            )
+
+    cover = soup.select_one(".chartlist-image .cover-art img")
+    header = soup.select_one("span.library-header-image img")
+    pages = soup.select(".pagination-page")
+    return scraping.LibraryPage(
+        rows=rows,
+        page_count=int(pages[-1].get_text()) if pages else 1,
+        cover_image=str(cover.attrs["src"]) if cover else None,
+        header_image=str(header.attrs["src"]) if header else None,
+        avatar_images=[
+            str(img.attrs["src"]) for img in soup.select(".chartlist-image .avatar img")
+        ],
+        metadata=[item.get_text() for item in soup.select(".metadata-display")],
+    )
+
+
+def main():
+    content = sample_page(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
+    old = parse_with_soup(content)
+    new = scraping.parse_library_page(content)
+    assert (old.rows, old.page_count, old.cover_image, old.header_image) == (
+        new.rows,
+        new.page_count,
+        new.cover_image,
+        new.header_image,
+    )
+    assert (old.avatar_images, old.metadata) == (new.avatar_images, new.metadata)
+
+    print(f"{len(content) / 1000:.0f} kB page, {len(new.rows)} rows")
+    for name, parser in (
+        ("beautifulsoup", parse_with_soup),
+        ("lxml", scraping.parse_library_page),
+    ):
+        number = 50
+        seconds = min(timeit.repeat(lambda: parser(content), number=number, repeat=5))
+        print(f"{name:>13}: {seconds / number * 1000:6.2f} ms per page")
+
+
+if __name__ == "__main__":
+    main()
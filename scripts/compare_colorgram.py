@@ -0,0 +1,87 @@
+# SPDX-FileCopyrightText: 2018-2025 Joonas Rautiola <mail@joinemm.dev>
+# SPDX-License-Identifier: MPL-2.0
+# https://git.joinemm.dev/miso-bot
+
+"""Check that the dominant color extraction still agrees with colorgram.
+
+    pip install colorgram.py
+    python -m scripts.compare_colorgram [images]
+
+Generates random test images (blocks of color, gradients and noise), runs
+both on them and fails if any channel differs by more than TOLERANCE.
+"""
+
+import random
+import sys
+import time
+
+import colorgram
+from PIL import Image, ImageDraw
+
+from modules.colorpool import THUMBNAIL_SIZE, most_common_color
+
+# a handful of colors land exactly on a luminance bucket edge, where colorgram's
+# double precision math and PIL's float32 math can disagree by a pixel's worth
+TOLERANCE = 1
+
+
+def random_color(rng: random.Random) -> tuple[int, int, int]:
+    return rng.randrange(256), rng.randrange(256), rng.randrange(256)
+
+
+def test_image(rng: random.Random) -> Image.Image:
+    image = Image.new("RGB", THUMBNAIL_SIZE, random_color(rng))
+    draw = ImageDraw.Draw(image)
+    width, height = THUMBNAIL_SIZE
+    for _ in range(rng.randrange(1, 8)):
+        x0, y0 = rng.randrange(width), rng.randrange(height)
+        x1, y1 = rng.randrange(x0, width + 1), rng.randrange(y0, height + 1)
+        draw.rectangle((x0, y0, x1, y1), fill=random_color(rng))
+
+    if rng.random() < 0.5:
+        start, end = random_color(rng), random_color(rng)
+        for x in range(width):
+            t = x / (width - 1)
+            color = tuple(round(a + (b - a) * t) for a, b in zip(start, end))
+            draw.line((x, 0, x, height // 3), fill=color)
+
+    if rng.random() < 0.5:
+        noise = Image.effect_noise(THUMBNAIL_SIZE, rng.randrange(10, 60))
+        image = Image.blend(image, noise.convert("RGB"), 0.3)
+
+    return image
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rng = random.Random(0)
+    images = [test_image(rng) for _ in range(count)]
+
+    start = time.perf_counter()
+    expected = [colorgram.extract(image, 1)[0].rgb for image in images]
+    colorgram_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = [most_common_color(image) for image in images]
+    pil_time = time.perf_counter() - start
+
+    worst = 0
+    mismatches = 0
+    for i, (want, got) in enumerate(zip(expected, results)):
+        difference = max(abs(a - b) for a, b in zip(want, got))
+        worst = max(worst, difference)
+        if difference > TOLERANCE:
+            mismatches += 1
+            print(f"image {i}: colorgram {tuple(want)}, pil {got}")
+
+    print(
+        f"{count} images, largest difference {worst} per channel\n"
+        f"colorgram {colorgram_time / count * 1000:.2f} ms per image, "
+        f"pil {pil_time / count * 1000:.2f} ms per image"
+    )
+    if mismatches:
+        sys.exit(f"{mismatches} images differ by more than {TOLERANCE}")
+
+
+if __name__ == "__main__":
+    main()
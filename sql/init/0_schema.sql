@@ -52,6 +52,60 @@ CREATE TABLE IF NOT EXISTS lastfm_blacklist (
 );
 
 -- user data
+CREATE TABLE IF NOT EXISTS lastfm_scrobble (
+    lastfm_username VARCHAR(64),
+    played_at INT UNSIGNED,
+    artist_name VARCHAR(256),
+    album_name VARCHAR(256),
+    track_name VARCHAR(256),
+    PRIMARY KEY (lastfm_username, played_at, artist_name, track_name),
+    KEY (lastfm_username, artist_name)
+);
+
+CREATE TABLE IF NOT EXISTS lastfm_sync_state (
+    lastfm_username VARCHAR(64),
+    synced_until INT UNSIGNED DEFAULT 0,
+    last_active DATETIME DEFAULT NULL,
+    last_synced DATETIME DEFAULT NULL,
+    PRIMARY KEY (lastfm_username)
+);
+
+CREATE TABLE IF NOT EXISTS lastfm_playcount_index_state (
+    lastfm_username VARCHAR(64),
+    indexed_at DATETIME DEFAULT NULL,
+    -- lowest indexed playcount when the top list was cut off, 0 if it was not
+    artist_cutoff INT DEFAULT 0,
+    album_cutoff INT DEFAULT 0,
+    track_cutoff INT DEFAULT 0,
+    PRIMARY KEY (lastfm_username)
+);
+
+CREATE TABLE IF NOT EXISTS lastfm_artist_playcount (
+    lastfm_username VARCHAR(64),
+    artist_name VARCHAR(256),
+    playcount INT UNSIGNED NOT NULL,
+    PRIMARY KEY (lastfm_username, artist_name),
+    KEY (artist_name)
+);
+
+CREATE TABLE IF NOT EXISTS lastfm_album_playcount (
+    lastfm_username VARCHAR(64),
+    artist_name VARCHAR(256),
+    album_name VARCHAR(256),
+    playcount INT UNSIGNED NOT NULL,
+    PRIMARY KEY (lastfm_username, artist_name, album_name),
+    KEY (artist_name, album_name)
+);
+
+CREATE TABLE IF NOT EXISTS lastfm_track_playcount (
+    lastfm_username VARCHAR(64),
+    artist_name VARCHAR(256),
+    track_name VARCHAR(256),
+    playcount INT UNSIGNED NOT NULL,
+    PRIMARY KEY (lastfm_username, artist_name, track_name),
+    KEY (artist_name, track_name)
+);
+
 CREATE TABLE IF NOT EXISTS notification (
     guild_id BIGINT,
     user_id BIGINT,
@@ -353,6 +407,13 @@ CREATE TABLE IF NOT EXISTS image_color_cache (
     PRIMARY KEY (image_hash)
 );
 
+CREATE TABLE IF NOT EXISTS image_color_usage (
+    image_hash VARCHAR(32),
+    used_at DATETIME NOT NULL,
+    PRIMARY KEY (image_hash),
+    KEY (used_at)
+);
+
 CREATE TABLE IF NOT EXISTS artist_image_cache (
     artist_name VARCHAR(255),
     image_hash VARCHAR(32),
@@ -368,6 +429,17 @@ CREATE TABLE IF NOT EXISTS album_image_cache (
     PRIMARY KEY (artist_name, album_name)
 );
 
+CREATE TABLE IF NOT EXISTS album_metadata (
+    artist_name VARCHAR(255),
+    album_name VARCHAR(255),
+    release_date DATE DEFAULT NULL,
+    length VARCHAR(32) DEFAULT NULL,
+    image_hash VARCHAR(32) DEFAULT NULL,
+    hex VARCHAR(6) DEFAULT NULL,
+    scrape_date DATETIME,
+    PRIMARY KEY (artist_name, album_name)
+);
+
 CREATE TABLE IF NOT EXISTS marriage (
     first_user_id BIGINT UNIQUE,
     second_user_id BIGINT UNIQUE,